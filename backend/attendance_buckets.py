@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Bucketed attendance storage (ATTENDANCE_STORAGE=buckets).
+
+Instead of one document per mark, each attendance window keeps its marks in a
+fixed number of bucket documents in attendance_buckets, _id
+"<window_id>:<n>" with n a stable hash of the student id modulo
+ATTENDANCE_BUCKETS_PER_WINDOW. A mark is one upsert guarded by
+students: {$ne: student_id}, so duplicates still fail atomically with
+DuplicateKeyError. BucketedRecords exposes the record-shaped subset of the
+collection API the handlers use (find/sort/limit/to_list, async iteration,
+find_one, count_documents, aggregate, insert_one); reads unwind the buckets
+back into records after an indexed bucket-level prefilter.
+
+Usage:
+    python attendance_buckets.py migrate [--drop-records]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import InsertOneResult
+
+BUCKET_COLLECTION = "attendance_buckets"
+STORAGE_MODES = ("records", "buckets")
+MIGRATE_CHUNK = 500
+
+
+def bucket_of(student_id: str, buckets: int) -> int:
+    # hash() is salted per process; buckets must agree across workers and restarts
+    return int.from_bytes(hashlib.blake2b(student_id.encode(), digest_size=4).digest(), "big") % buckets
+
+
+def bucket_id(window_id: str, student_id: str, buckets: int) -> str:
+    return f"{window_id}:{bucket_of(student_id, buckets)}"
+
+
+# Record fields that have a bucket-level counterpart usable as a prefilter
+_ARRAY_FIELDS = {"student_id": "students", "batch_id": "batch_ids", "hall_id": "hall_ids"}
+
+
+def bucket_filter(query: dict) -> dict:
+    """Conservative bucket-level filter: every bucket holding a matching record matches it."""
+    clauses = []
+    for key, condition in query.items():
+        if key == "$and":
+            clauses.extend(clause for clause in map(bucket_filter, condition) if clause)
+        elif key == "attendance_window_id" or key in _ARRAY_FIELDS:
+            target = _ARRAY_FIELDS.get(key, key)
+            if not isinstance(condition, dict):
+                clauses.append({target: condition})
+            elif set(condition) <= {"$eq", "$in"}:
+                clauses.append({target: condition})
+        elif key == "marked_at":
+            if not isinstance(condition, dict):
+                condition = {"$gte": condition, "$lte": condition}
+            lower = condition.get("$gte", condition.get("$gt"))
+            upper = condition.get("$lte", condition.get("$lt"))
+            if lower is not None:
+                clauses.append({"last_marked_at": {"$gte": lower}})
+            if upper is not None:
+                clauses.append({"first_marked_at": {"$lte": upper}})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def unwind_stages(query: Optional[dict] = None) -> list:
+    stages = []
+    prefilter = bucket_filter(query or {})
+    if prefilter:
+        stages.append({"$match": prefilter})
+    stages += [{"$unwind": "$marks"}, {"$replaceRoot": {"newRoot": "$marks"}}]
+    if query:
+        stages.append({"$match": query})
+    return stages
+
+
+class BucketCursor:
+    """Lazily built aggregation standing in for a Motor find() cursor."""
+
+    def __init__(self, collection, query: dict, projection: Optional[dict]):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = None
+
+    def sort(self, keys, direction=None):
+        self._sort = [(keys, direction or 1)] if isinstance(keys, str) else list(keys)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int):
+        self._batch_size = size
+        return self
+
+    def _pipeline(self) -> list:
+        pipeline = unwind_stages(self.query)
+        if self._sort:
+            pipeline.append({"$sort": dict(self._sort)})
+        if self._skip:
+            pipeline.append({"$skip": self._skip})
+        if self._limit:
+            pipeline.append({"$limit": self._limit})
+        if self.projection:
+            pipeline.append({"$project": self.projection})
+        return pipeline
+
+    def _aggregate(self):
+        options = {"allowDiskUse": True}
+        if self._batch_size:
+            options["batchSize"] = self._batch_size
+        return self.collection.aggregate(self._pipeline(), **options)
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        return await self._aggregate().to_list(length)
+
+    def __aiter__(self):
+        return self._aggregate().__aiter__()
+
+
+class BucketedRecords:
+    def __init__(self, db, buckets_per_window: int = 4):
+        self.collection = db[BUCKET_COLLECTION]
+        self.buckets_per_window = buckets_per_window
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> BucketCursor:
+        return BucketCursor(self.collection, query or {}, projection)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> Optional[dict]:
+        docs = await self.find(query, projection).limit(1).to_list(1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, query: dict) -> int:
+        pipeline = unwind_stages(query) + [{"$count": "n"}]
+        result = await self.collection.aggregate(pipeline).to_list(1)
+        return result[0]["n"] if result else 0
+
+    def aggregate(self, pipeline: list, **kwargs):
+        return self.collection.aggregate(unwind_stages() + list(pipeline), **kwargs)
+
+    async def insert_one(self, record: dict) -> InsertOneResult:
+        """Add a mark to its bucket; raises DuplicateKeyError if the student already marked."""
+        student_id, marked_at = record["student_id"], record["marked_at"]
+        _id = bucket_id(record["attendance_window_id"], student_id, self.buckets_per_window)
+        update = {
+            "$push": {"marks": record},
+            "$addToSet": {"students": student_id, "batch_ids": record["batch_id"], "hall_ids": record["hall_id"]},
+            "$inc": {"count": 1},
+            "$min": {"first_marked_at": marked_at},
+            "$max": {"last_marked_at": marked_at},
+            "$setOnInsert": {"attendance_window_id": record["attendance_window_id"]},
+        }
+        for _ in range(2):
+            try:
+                await self.collection.update_one({"_id": _id, "students": {"$ne": student_id}}, update, upsert=True)
+                return InsertOneResult(_id, True)
+            except DuplicateKeyError:
+                # Either the student is already in the bucket, or a concurrent first
+                # mark created the bucket between our filter and our insert
+                if await self.collection.find_one({"_id": _id, "students": student_id}, {"_id": 1}):
+                    raise
+        raise DuplicateKeyError(f"Could not add mark to bucket {_id}")
+
+
+def attendance_source(db, mode: Optional[str] = None, buckets_per_window: Optional[int] = None):
+    """Record-shaped attendance collection for the configured ATTENDANCE_STORAGE."""
+    mode = mode or os.environ.get('ATTENDANCE_STORAGE', 'records')
+    if mode == "buckets":
+        return BucketedRecords(
+            db, buckets_per_window or int(os.environ.get('ATTENDANCE_BUCKETS_PER_WINDOW', '4'))
+        )
+    if mode != "records":
+        raise ValueError(f"Unknown ATTENDANCE_STORAGE {mode!r}; expected one of {', '.join(STORAGE_MODES)}")
+    return db.attendance_records
+
+
+def bucket_doc(window_id: str, marks: list) -> dict:
+    marks = sorted(marks, key=lambda mark: mark["marked_at"])
+    return {
+        "attendance_window_id": window_id,
+        "marks": marks,
+        "students": [mark["student_id"] for mark in marks],
+        "batch_ids": sorted({mark["batch_id"] for mark in marks}),
+        "hall_ids": sorted({mark["hall_id"] for mark in marks}),
+        "count": len(marks),
+        "first_marked_at": marks[0]["marked_at"],
+        "last_marked_at": marks[-1]["marked_at"],
+    }
+
+
+async def migrate(db, buckets_per_window: int, drop_records: bool = False) -> dict:
+    """Copy attendance_records into buckets, merging with marks already bucketed."""
+    buckets = db[BUCKET_COLLECTION]
+    started = time.perf_counter()
+    migrated = windows = written = 0
+    writes = []
+
+    async def flush_window(window_id: str, records: list):
+        nonlocal written
+        marks, old_ids = {}, set()
+        async for bucket in buckets.find({"attendance_window_id": window_id}, {"marks": 1}):
+            old_ids.add(bucket["_id"])
+            marks.update((mark["student_id"], mark) for mark in bucket["marks"])
+        for record in records:
+            marks.setdefault(record["student_id"], record)
+        by_bucket = defaultdict(list)
+        for student_id, mark in marks.items():
+            by_bucket[bucket_id(window_id, student_id, buckets_per_window)].append(mark)
+        for _id, bucket_marks in by_bucket.items():
+            writes.append(ReplaceOne({"_id": _id}, bucket_doc(window_id, bucket_marks), upsert=True))
+        # Buckets left over from a different ATTENDANCE_BUCKETS_PER_WINDOW
+        writes.extend(DeleteOne({"_id": _id}) for _id in old_ids - set(by_bucket))
+        if len(writes) >= MIGRATE_CHUNK:
+            await buckets.bulk_write(writes, ordered=False)
+            written += len(writes)
+            writes.clear()
+
+    current, records = None, []
+    async for record in db.attendance_records.find({}, {"_id": 0}).sort("attendance_window_id", 1):
+        if record["attendance_window_id"] != current:
+            if records:
+                await flush_window(current, records)
+                windows += 1
+            current, records = record["attendance_window_id"], []
+        records.append(record)
+        migrated += 1
+    if records:
+        await flush_window(current, records)
+        windows += 1
+    if writes:
+        await buckets.bulk_write(writes, ordered=False)
+        written += len(writes)
+
+    bucketed = await BucketedRecords(db, buckets_per_window).count_documents({})
+    dropped = False
+    if drop_records and bucketed >= migrated:
+        await db.attendance_records.drop()
+        dropped = True
+    return {
+        "records": migrated,
+        "windows": windows,
+        "buckets_written": written,
+        "marks_in_buckets": bucketed,
+        "records_dropped": dropped,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def main(args):
+    from storage import open_storage
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client, db = open_storage()
+    buckets_per_window = args.buckets or int(os.environ.get('ATTENDANCE_BUCKETS_PER_WINDOW', '4'))
+    report = await migrate(db, buckets_per_window, drop_records=args.drop_records)
+    client.close()
+
+    print(f"✅ Migrated {report['records']} records from {report['windows']} windows into "
+          f"{report['buckets_written']} buckets in {report['elapsed_seconds']}s "
+          f"({report['marks_in_buckets']} marks now bucketed)")
+    if args.drop_records:
+        print("🗑️  Dropped attendance_records" if report["records_dropped"]
+              else "⚠️  Kept attendance_records: bucket count is lower than the record count")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bucketed attendance storage")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser("migrate", help="convert attendance_records into buckets")
+    migrate_parser.add_argument("--buckets", type=int, default=None,
+                                help="buckets per window (default: ATTENDANCE_BUCKETS_PER_WINDOW or 4)")
+    migrate_parser.add_argument("--drop-records", action="store_true",
+                                help="drop attendance_records once every record is bucketed")
+    asyncio.run(main(parser.parse_args()))
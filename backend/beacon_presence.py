@@ -0,0 +1,178 @@
+"""
+BLE beacon proximity for attendance marking.
+
+Clients buffer iBeacon scans (major, minor, rssi, timestamp) and upload them
+in batches. HallBeaconMap resolves (major, minor) to a hall id from an
+in-memory dict built from db.halls, reloaded after a local hall write or once
+its TTL elapses. PresenceTracker smooths each upload with NumPy: scans are
+weighted by recency, averaged per hall, and a hall counts as present when the
+smoothed RSSI and the number of scans clear their thresholds. Presence is held
+in process memory per student until it expires, so marking attendance checks
+it without a database read.
+
+With several workers the scan upload and the mark can land on different
+processes, so presence can also be shared through a collection: one upsert
+per upload that found the student present, expired by a TTL index on
+expires_at, and read only when the local copy has no live entry.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+PRESENCE_COLLECTION = "beacon_presence"
+
+
+class HallBeaconMap:
+    def __init__(self, collection, ttl_seconds: float = 60):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._halls: Dict[Tuple[int, int], str] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    async def refresh(self):
+        halls = await self.collection.find(
+            {"beacon_major": {"$ne": None}, "beacon_minor": {"$ne": None}},
+            {"_id": 0, "id": 1, "beacon_major": 1, "beacon_minor": 1},
+        ).to_list(None)
+        self._halls = {(hall["beacon_major"], hall["beacon_minor"]): hall["id"] for hall in halls}
+        self._loaded_at = time.monotonic()
+
+    async def resolver(self) -> Dict[Tuple[int, int], str]:
+        if self._is_stale():
+            async with self._lock:
+                if self._is_stale():
+                    await self.refresh()
+        return self._halls
+
+    def __len__(self):
+        return len(self._halls)
+
+
+def _epoch(timestamp: datetime) -> float:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+class PresenceTracker:
+    def __init__(self, rssi_threshold: float = -75, min_scans: int = 3, scan_window_seconds: float = 30,
+                 half_life_seconds: float = 10, presence_ttl_seconds: float = 120, collection=None):
+        self.rssi_threshold = rssi_threshold
+        self.min_scans = min_scans
+        self.scan_window_seconds = scan_window_seconds
+        self.decay = np.log(2) / half_life_seconds
+        self.presence_ttl_seconds = presence_ttl_seconds
+        # student_id -> {hall_id: (smoothed_rssi, expires_at)}
+        self._present: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        self._ingested = 0
+        self.collection = collection
+        self._shared_reads = 0
+
+    async def ingest(self, student_id: str, scans: List[dict], halls: Dict[Tuple[int, int], str],
+                     now: Optional[float] = None) -> dict:
+        """Smooth one upload of scans and record the halls the student is present in."""
+        now = time.time() if now is None else now
+        code_of: Dict[str, int] = {}
+        codes, rssi, stamps = [], [], []
+        unknown = 0
+        for scan in scans:
+            hall_id = halls.get((scan["major"], scan["minor"]))
+            if hall_id is None:
+                unknown += 1
+                continue
+            codes.append(code_of.setdefault(hall_id, len(code_of)))
+            rssi.append(scan["rssi"])
+            stamps.append(_epoch(scan["timestamp"]))
+
+        present = {}
+        if codes:
+            hall_ids = list(code_of)
+            codes = np.asarray(codes)
+            rssi = np.asarray(rssi, dtype=np.float64)
+            # Future timestamps (client clock skew) count as "now"
+            age = now - np.minimum(np.asarray(stamps), now)
+            recent = age <= self.scan_window_seconds
+            weights = np.exp(-self.decay * age) * recent
+
+            counts = np.bincount(codes, weights=recent, minlength=len(hall_ids))
+            weight_sums = np.bincount(codes, weights=weights, minlength=len(hall_ids))
+            rssi_sums = np.bincount(codes, weights=weights * rssi, minlength=len(hall_ids))
+            smoothed = np.divide(rssi_sums, weight_sums, out=np.full(len(hall_ids), -np.inf), where=weight_sums > 0)
+            newest = np.full(len(hall_ids), -np.inf)
+            np.maximum.at(newest, codes[recent], now - age[recent])
+
+            qualifies = (counts >= self.min_scans) & (smoothed >= self.rssi_threshold)
+            for code in np.flatnonzero(qualifies):
+                present[hall_ids[code]] = (round(float(smoothed[code]), 1), float(newest[code]) + self.presence_ttl_seconds)
+
+        if present:
+            self._present.setdefault(student_id, {}).update(present)
+            if self.collection is not None:
+                await self._share(student_id, present)
+        self._ingested += 1
+        if self._ingested % 1000 == 0:
+            self.prune(now)
+        return {
+            "accepted": len(codes),
+            "unknown": unknown,
+            "present_in": sorted(present),
+        }
+
+    async def _share(self, student_id: str, present: Dict[str, Tuple[float, float]]):
+        await self.collection.update_one(
+            {"_id": student_id},
+            {
+                "$set": {
+                    f"halls.{hall_id}": {"rssi": rssi, "expires_at": datetime.utcfromtimestamp(expires_at)}
+                    for hall_id, (rssi, expires_at) in present.items()
+                },
+                "$max": {"expires_at": datetime.utcfromtimestamp(max(entry[1] for entry in present.values()))},
+            },
+            upsert=True,
+        )
+
+    async def presence(self, student_id: str, hall_id: str, now: Optional[float] = None) -> Optional[float]:
+        """Smoothed RSSI if the student is currently present in hall_id, else None."""
+        now = time.time() if now is None else now
+        entry = self._present.get(student_id, {}).get(hall_id)
+        if (entry is None or entry[1] < now) and self.collection is not None:
+            # The upload may have been handled by another worker
+            self._shared_reads += 1
+            doc = await self.collection.find_one({"_id": student_id}, {"_id": 0, f"halls.{hall_id}": 1})
+            shared = (doc or {}).get("halls", {}).get(hall_id)
+            if shared is not None:
+                entry = (shared["rssi"], _epoch(shared["expires_at"]))
+                self._present.setdefault(student_id, {})[hall_id] = entry
+        if entry is None or entry[1] < now:
+            return None
+        return entry[0]
+
+    def prune(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        for student_id in list(self._present):
+            halls = {hall: entry for hall, entry in self._present[student_id].items() if entry[1] >= now}
+            if halls:
+                self._present[student_id] = halls
+            else:
+                del self._present[student_id]
+
+    def stats(self) -> dict:
+        return {
+            "students_tracked": len(self._present),
+            "uploads": self._ingested,
+            "rssi_threshold": self.rssi_threshold,
+            "min_scans": self.min_scans,
+            "shared": self.collection is not None,
+            "shared_reads": self._shared_reads,
+        }
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Class-start load benchmark for AttendanceSync.
+
+Simulates N students logging in, polling /student/attendance-windows and
+calling /student/mark-attendance within the same minute. The FastAPI app is
+driven in-process (default) or over HTTP against a running uvicorn. Reports
+throughput and p50/p95/p99 latency per route and saves the results as JSON
+so runs can be compared between commits.
+
+The benchmark database (--db-name) is dropped and reseeded before each run;
+when using --base-url, start the server with the same DB_NAME.
+
+Usage:
+    python bench_class_start.py --students 500 --batches 5 --concurrency 100
+    python bench_class_start.py --storage memory --students 2000
+    python bench_class_start.py --base-url http://localhost:8001 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+PASSWORD = "bench-password"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client, route: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - started)
+        self.statuses[route][response.status_code] += 1
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        for route, samples in self.latencies.items():
+            ms = np.array(samples) * 1000
+            routes[route] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+                "max_ms": round(float(ms.max()), 3),
+                "status_codes": {str(code): count for code, count in sorted(self.statuses[route].items())},
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {"elapsed_seconds": round(elapsed, 3), "total_requests": total,
+                "throughput_rps": round(total / elapsed, 2), "routes": routes}
+
+
+async def seed(db, students: int, batches: int) -> list:
+    """Create batches, a hall, one open window per batch and the student accounts."""
+    from password_hashing import hash_password
+
+    now = datetime.utcnow()
+    hashed = hash_password(PASSWORD)
+    batch_ids = [f"bench-batch-{i}" for i in range(batches)]
+    await db.halls.insert_one({
+        "id": "bench-hall", "name": "Bench Hall", "code": "BH", "mac_address": "00:00:00:00:00:00",
+        "beacon_major": 1, "beacon_minor": 1, "capacity": students, "created_at": now,
+    })
+    await db.batches.insert_many([
+        {"id": batch_id, "name": batch_id, "code": batch_id, "students": [], "created_at": now}
+        for batch_id in batch_ids
+    ])
+    await db.attendance_windows.insert_many([{
+        "id": f"bench-window-{batch_id}", "hall_id": "bench-hall", "batch_id": batch_id,
+        "start_time": now - timedelta(minutes=1), "end_time": now + timedelta(hours=1),
+        "is_active": True, "created_by": "bench", "created_at": now,
+    } for batch_id in batch_ids])
+
+    emails = [f"bench{i:06d}@iiitdm.ac.in" for i in range(students)]
+    await db.users.insert_many([{
+        "id": str(uuid.uuid4()), "email": email, "hashed_password": hashed, "role": "student",
+        "full_name": f"Bench Student {i}", "batch": batch_ids[i % batches], "department": None,
+        "is_active": True, "created_at": now,
+    } for i, email in enumerate(emails)], ordered=False)
+    return emails
+
+
+async def student_session(client, recorder: Recorder, email: str, polls: int, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        response = await recorder.call(client, "POST /auth/login", "POST", "/api/auth/login",
+                                       json={"email": email, "password": PASSWORD})
+        if response.status_code != 200:
+            return
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        windows = []
+        for _ in range(polls):
+            response = await recorder.call(client, "GET /student/attendance-windows", "GET",
+                                           "/api/student/attendance-windows", headers=headers)
+            if response.status_code == 200:
+                windows = response.json()
+        if not windows:
+            return
+
+        window = windows[0]
+        await recorder.call(client, "POST /student/mark-attendance", "POST", "/api/student/mark-attendance",
+                            headers=headers, params={"hall_id": window["hall_id"], "attendance_window_id": window["id"]})
+
+
+async def run(args) -> dict:
+    from storage import open_storage
+
+    mongo, db = open_storage()
+    await mongo.drop_database(os.environ['DB_NAME'])
+    emails = await seed(db, args.students, args.batches)
+
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async def drive(client):
+        started = time.perf_counter()
+        await asyncio.gather(*[student_session(client, recorder, email, args.polls, semaphore) for email in emails])
+        return time.perf_counter() - started
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+            elapsed = await drive(client)
+    else:
+        from server import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                elapsed = await drive(client)
+
+    if not args.keep_data:
+        await mongo.drop_database(os.environ['DB_NAME'])
+    mongo.close()
+    return recorder.summary(elapsed)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Class-start load benchmark")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--batches", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=3, help="window polls per student before marking")
+    parser.add_argument("--base-url", default=None, help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--storage", choices=["mongo", "memory"], default=None,
+                        help="storage backend for the in-process app (default: STORAGE_BACKEND or mongo)")
+    parser.add_argument("--db-name", default="attendance_bench", help="database to seed (dropped before the run)")
+    parser.add_argument("--keep-data", action="store_true", help="do not drop the benchmark database afterwards")
+    parser.add_argument("--output", default=None, help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    load_dotenv(ROOT_DIR / '.env')
+    os.environ['DB_NAME'] = args.db_name
+    # In-process, every simulated student shares one client IP
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+    if args.storage:
+        if args.base_url and args.storage == "memory":
+            parser.error("--storage memory only applies to the in-process app")
+        os.environ['STORAGE_BACKEND'] = args.storage
+
+    summary = asyncio.run(run(args))
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        **summary,
+    }
+
+    print(f"\n📊 {result['total_requests']} requests in {result['elapsed_seconds']}s "
+          f"({result['throughput_rps']} req/s) @ {result['commit']}")
+    for route, stats in result["routes"].items():
+        print(f"   {route:36} {stats['requests']:6} req  {stats['throughput_rps']:8} req/s  "
+              f"p50 {stats['p50_ms']:8} ms  p95 {stats['p95_ms']:8} ms  p99 {stats['p99_ms']:8} ms  "
+              f"{stats['status_codes']}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+        print(f"\n💾 Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
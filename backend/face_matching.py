@@ -0,0 +1,154 @@
+"""
+Server-side face verification against enrolled reference embeddings.
+
+Each student has one reference embedding in face_embeddings. Per batch, the
+references are kept in memory as a row-normalised float32 matrix, so matching
+a probe is one matrix-vector product (cosine similarity against every student
+of the batch) and a batch of probes is one matrix-matrix product. A batch's
+matrix is rebuilt after a local enrollment invalidates it, or once the TTL
+elapses so several workers converge.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+EMBEDDING_COLLECTION = "face_embeddings"
+
+
+class EmbeddingError(ValueError):
+    pass
+
+
+def normalize(vectors) -> np.ndarray:
+    """L2-normalise rows of a (n, dim) array (or a single vector)."""
+    try:
+        array = np.asarray(vectors, dtype=np.float32)
+    except ValueError:
+        raise EmbeddingError("Embeddings must all have the same length")
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    if not np.all(np.isfinite(array)) or np.any(norms == 0):
+        raise EmbeddingError("Embeddings must be finite and non-zero")
+    return array / norms
+
+
+class BatchMatrix:
+    __slots__ = ("student_ids", "rows", "matrix", "loaded_at")
+
+    def __init__(self, student_ids: List[str], matrix: np.ndarray):
+        self.student_ids = student_ids
+        self.rows = {student_id: row for row, student_id in enumerate(student_ids)}
+        self.matrix = matrix
+        self.loaded_at = time.monotonic()
+
+
+class FaceMatcher:
+    def __init__(self, db, dim: int = 128, threshold: float = 0.6, ttl_seconds: float = 300):
+        self.collection = db[EMBEDDING_COLLECTION]
+        self.dim = dim
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._batches: Dict[str, BatchMatrix] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _check_dim(self, array: np.ndarray):
+        if array.shape[-1] != self.dim:
+            raise EmbeddingError(f"Embeddings must have {self.dim} dimensions")
+
+    def invalidate(self, batch_id: Optional[str] = None):
+        if batch_id is None:
+            self._batches.clear()
+        else:
+            self._batches.pop(batch_id, None)
+
+    def _is_fresh(self, entry: Optional[BatchMatrix]) -> bool:
+        return entry is not None and time.monotonic() - entry.loaded_at <= self.ttl_seconds
+
+    async def _load(self, batch_id: str) -> BatchMatrix:
+        docs = await self.collection.find(
+            {"batch_id": batch_id}, {"_id": 0, "student_id": 1, "embedding": 1}
+        ).to_list(None)
+        docs = [doc for doc in docs if len(doc["embedding"]) == self.dim]
+        if docs:
+            matrix = normalize([doc["embedding"] for doc in docs])
+        else:
+            matrix = np.empty((0, self.dim), dtype=np.float32)
+        return BatchMatrix([doc["student_id"] for doc in docs], matrix)
+
+    async def matrix_for(self, batch_id: str) -> BatchMatrix:
+        entry = self._batches.get(batch_id)
+        if self._is_fresh(entry):
+            return entry
+        lock = self._locks.setdefault(batch_id, asyncio.Lock())
+        async with lock:
+            entry = self._batches.get(batch_id)
+            if not self._is_fresh(entry):
+                entry = await self._load(batch_id)
+                self._batches[batch_id] = entry
+        return entry
+
+    async def enroll(self, student_id: str, batch_id: str, embedding: Sequence[float]):
+        vector = normalize(embedding)
+        self._check_dim(vector)
+        previous = await self.collection.find_one_and_update(
+            {"student_id": student_id},
+            {"$set": {"batch_id": batch_id, "embedding": vector.tolist(), "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "batch_id": 1},
+            upsert=True,
+        )
+        self.invalidate(batch_id)
+        if previous and previous.get("batch_id") != batch_id:
+            self.invalidate(previous.get("batch_id"))
+
+    async def verify(self, batch_id: str, student_id: str, probe: Sequence[float]) -> dict:
+        """Score a probe against the student's reference.
+
+        The probe is compared with the whole batch in one pass; it only
+        verifies if the student's own reference clears the threshold and no
+        classmate's reference is a closer match.
+        """
+        vector = normalize(probe)
+        self._check_dim(vector)
+        entry = await self.matrix_for(batch_id)
+        row = entry.rows.get(student_id)
+        if row is None:
+            return {"enrolled": False, "verified": False, "confidence": None}
+        scores = entry.matrix @ vector
+        confidence = float(scores[row])
+        best = int(np.argmax(scores))
+        return {
+            "enrolled": True,
+            "verified": confidence >= self.threshold and scores[best] <= confidence,
+            "confidence": round(confidence, 4),
+        }
+
+    async def match_many(self, batch_id: str, probes: Sequence[Sequence[float]]) -> List[dict]:
+        """Best-matching enrolled student for each probe, or None below the threshold."""
+        if not probes:
+            return []
+        vectors = normalize(probes)
+        self._check_dim(vectors)
+        entry = await self.matrix_for(batch_id)
+        if not entry.student_ids:
+            return [{"student_id": None, "confidence": None} for _ in probes]
+        scores = vectors @ entry.matrix.T
+        best = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(best)), best]
+        return [
+            {
+                "student_id": entry.student_ids[row] if confidence >= self.threshold else None,
+                "confidence": round(float(confidence), 4),
+            }
+            for row, confidence in zip(best.tolist(), confidences.tolist())
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "batches_cached": len(self._batches),
+            "embeddings_cached": sum(len(entry.student_ids) for entry in self._batches.values()),
+            "threshold": self.threshold,
+            "dim": self.dim,
+        }
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Window-close finalization.
+
+WindowFinalizer runs in the background and, once an attendance window has
+ended (plus a grace period for buffered marks), writes its final summary to
+attendance_summaries: roster size, present and absent student ids. Windows
+are processed in chunks: one $in query loads the rosters of every batch in
+the chunk, one $in query loads every mark of the chunk's windows, absentees
+are a set difference per window, and the summaries go out in one unordered
+bulk write before the windows are stamped with finalized_at.
+
+Summaries are replaced by window id and windows are only stamped after their
+summary is written, so a run interrupted half way (or two workers finalizing
+the same slot) simply recomputes the same result.
+
+Absentees are computed against today's batch rosters, so only windows that
+end after `since` (FINALIZE_SINCE, the rollout time) are finalized in the
+background; summaries for older windows would count students who joined the
+batch later. Backfilling history is an explicit, one-off command.
+
+Usage:
+    python finalization.py --since 2026-01-05T00:00   # finalize windows ended since then
+    python finalization.py --all                      # every window, current rosters
+"""
+
+import argparse
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLLECTION = "attendance_summaries"
+
+
+class WindowFinalizer:
+    def __init__(self, db, source, grace_seconds: float = 60, chunk_size: int = 200, interval_seconds: float = 60,
+                 since: Optional[datetime] = None):
+        self.db = db
+        self.source = source
+        # Windows that ended before this are left alone; None finalizes all of history
+        self.since = since
+        self.grace = timedelta(seconds=grace_seconds)
+        self.chunk_size = chunk_size
+        self.interval_seconds = interval_seconds
+        self.last_run: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def finalize(self, windows: list, now: datetime) -> int:
+        """Write the summaries of the given windows and stamp them; returns the absentee count."""
+        batch_ids = sorted({window["batch_id"] for window in windows})
+        rosters = defaultdict(set)
+        async for student in self.db.users.find(
+            {"role": "student", "batch": {"$in": batch_ids}},
+            {"_id": 0, "id": 1, "batch": 1},
+        ):
+            rosters[student["batch"]].add(student["id"])
+
+        window_ids = [window["id"] for window in windows]
+        present = defaultdict(set)
+        async for mark in self.source.find(
+            {"attendance_window_id": {"$in": window_ids}},
+            {"_id": 0, "attendance_window_id": 1, "student_id": 1},
+        ):
+            present[mark["attendance_window_id"]].add(mark["student_id"])
+
+        writes, absentees = [], 0
+        for window in windows:
+            roster = rosters[window["batch_id"]]
+            attended = present[window["id"]]
+            absent = roster - attended
+            absentees += len(absent)
+            writes.append(ReplaceOne({"_id": window["id"]}, {
+                "window_id": window["id"],
+                "batch_id": window["batch_id"],
+                "hall_id": window["hall_id"],
+                "start_time": window["start_time"],
+                "end_time": window["end_time"],
+                "roster_size": len(roster),
+                "present_count": len(attended),
+                "absent_count": len(absent),
+                "present": sorted(attended),
+                "absent": sorted(absent),
+                "finalized_at": now,
+            }, upsert=True))
+        await self.db[SUMMARY_COLLECTION].bulk_write(writes, ordered=False)
+        await self.db.attendance_windows.update_many(
+            {"id": {"$in": window_ids}},
+            {"$set": {"finalized_at": now}},
+        )
+        return absentees
+
+    async def run_once(self, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.utcnow()
+        cutoff = now - self.grace
+        end_time = {"$lt": cutoff}
+        if self.since is not None:
+            end_time["$gte"] = self.since
+        finalized = absentees = 0
+        while True:
+            windows = await self.db.attendance_windows.find(
+                {"finalized_at": None, "end_time": end_time},
+                {"_id": 0, "id": 1, "batch_id": 1, "hall_id": 1, "start_time": 1, "end_time": 1},
+            ).limit(self.chunk_size).to_list(None)
+            if not windows:
+                break
+            absentees += await self.finalize(windows, now)
+            finalized += len(windows)
+
+        self.last_run = {"ran_at": now, "windows_finalized": finalized, "absentees": absentees}
+        return self.last_run
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Window finalization run failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval_seconds,
+            "grace_seconds": self.grace.total_seconds(),
+            "since": self.since,
+            **(self.last_run or {}),
+        }
+
+
+async def main(args):
+    from attendance_buckets import attendance_source
+    from storage import open_storage
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client, db = open_storage()
+    finalizer = WindowFinalizer(db, attendance_source(db), grace_seconds=0, since=args.since)
+    result = await finalizer.run_once()
+    client.close()
+
+    print(f"✅ Finalized {result['windows_finalized']} windows ({result['absentees']} absentees)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Finalize ended attendance windows against current rosters")
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument("--since", type=datetime.fromisoformat, help="only windows that ended at or after this UTC time")
+    scope.add_argument("--all", action="store_true", help="every unfinalized window, however old")
+    asyncio.run(main(parser.parse_args()))
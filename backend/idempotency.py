@@ -0,0 +1,126 @@
+"""
+Idempotency-Key support for retried writes.
+
+The first request with a given key claims it by inserting a pending document
+into idempotency_keys (the unique _id makes the claim atomic), runs the
+handler and stores the final status code and body. Repeats are answered from
+that document without running the handler again; concurrent repeats on the
+same worker wait for the first request instead of racing it, and a repeat
+that arrives while another worker still holds the claim gets 409.
+
+A pending claim is only a short lease: if its worker crashed before
+finishing, a retry after lease_seconds takes the claim over. Only successes
+and errors the caller marks as permanent are stored; anything else (server
+errors, transient 4xx such as a stale window check) releases the claim so
+the client can retry. Documents expire through a TTL index on expires_at.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+MAX_KEY_LENGTH = 255
+
+Outcome = Tuple[int, dict]
+
+
+class IdempotencyConflict(Exception):
+    pass
+
+
+class IdempotencyStore:
+    def __init__(self, db, ttl_seconds: float = 86400, lease_seconds: float = 30):
+        self.collection = db[IDEMPOTENCY_COLLECTION]
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lease = timedelta(seconds=lease_seconds)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.replayed = 0
+        self.taken_over = 0
+
+    async def _claim(self, key: str) -> Optional[Outcome]:
+        """Claim the key; returns the stored outcome instead if it already has one."""
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({"_id": key, "state": "pending", "expires_at": now + self.lease})
+            return None
+        except DuplicateKeyError:
+            pass
+        doc = await self.collection.find_one({"_id": key}, {"_id": 0, "state": 1, "status_code": 1, "body": 1})
+        if doc is not None and doc["state"] == "done":
+            return doc["status_code"], doc["body"]
+        # Take over a claim whose lease ran out (or that was released in the meantime)
+        taken = await self.collection.find_one_and_update(
+            {"_id": key, "state": "pending", "expires_at": {"$lt": now}},
+            {"$set": {"expires_at": now + self.lease}},
+        )
+        if taken is not None:
+            self.taken_over += 1
+            return None
+        if doc is None:
+            try:
+                await self.collection.insert_one({"_id": key, "state": "pending", "expires_at": now + self.lease})
+                return None
+            except DuplicateKeyError:
+                pass
+        raise IdempotencyConflict(key)
+
+    async def run(
+        self,
+        key: str,
+        handler: Callable[[], Awaitable[dict]],
+        permanent: Callable[[HTTPException], bool] = lambda exc: False,
+    ) -> Tuple[Outcome, bool]:
+        """Run handler once per key; returns ((status_code, body), replayed).
+
+        permanent decides which 4xx errors are final enough to replay.
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.replayed += 1
+            return await asyncio.shield(pending), True
+
+        stored = await self._claim(key)
+        if stored is not None:
+            self.replayed += 1
+            return stored, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            cacheable = True
+            try:
+                outcome = (200, await handler())
+            except HTTPException as exc:
+                if exc.status_code >= 500:
+                    raise
+                outcome = (exc.status_code, {"detail": exc.detail})
+                cacheable = permanent(exc)
+            if cacheable:
+                await self.collection.update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "state": "done",
+                        "status_code": outcome[0],
+                        "body": outcome[1],
+                        "expires_at": datetime.utcnow() + self.ttl,
+                    }},
+                )
+            else:
+                await self.collection.delete_one({"_id": key, "state": "pending"})
+            future.set_result(outcome)
+            return outcome, False
+        except BaseException as exc:
+            await asyncio.shield(self.collection.delete_one({"_id": key, "state": "pending"}))
+            future.set_exception(exc)
+            # Waiters re-raise it; mark retrieved so an unawaited future is not logged
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "replayed": self.replayed, "taken_over": self.taken_over}
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Index management for the AttendanceSync collections.
+
+Declares the indexes every API query relies on, creates them idempotently
+and checks the hot query shapes with explain() so any shape that still
+falls back to a collection scan is reported.
+
+Usage:
+    python indexes.py            # create indexes, then verify query plans
+    python indexes.py --verify   # only verify query plans
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Without a reachable server every create_indexes call would wait out the
+# driver's 30s server selection timeout in turn
+PING_TIMEOUT_SECONDS = 5
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="uniq_email"),
+        IndexModel([("id", ASCENDING)], unique=True, name="uniq_id"),
+        IndexModel([("role", ASCENDING), ("batch", ASCENDING), ("email", ASCENDING)], name="role_batch_email"),
+    ],
+    "batches": [
+        IndexModel([("id", ASCENDING)], unique=True, name="uniq_id"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "halls": [
+        IndexModel([("id", ASCENDING)], unique=True, name="uniq_id"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "attendance_windows": [
+        IndexModel([("id", ASCENDING)], unique=True, name="uniq_id"),
+        IndexModel(
+            [("batch_id", ASCENDING), ("is_active", ASCENDING), ("start_time", ASCENDING), ("end_time", ASCENDING)],
+            name="batch_active_time",
+        ),
+        IndexModel([("is_active", ASCENDING), ("end_time", ASCENDING)], name="active_end_time"),
+        IndexModel([("timetable_id", ASCENDING), ("start_time", ASCENDING)], name="timetable_start_time"),
+        IndexModel([("finalized_at", ASCENDING), ("end_time", ASCENDING)], name="finalized_end_time"),
+    ],
+    "timetable": [
+        IndexModel([("id", ASCENDING)], unique=True, name="uniq_id"),
+        IndexModel([("is_active", ASCENDING), ("batch_id", ASCENDING), ("weekday", ASCENDING)], name="active_batch_weekday"),
+    ],
+    "attendance_records": [
+        IndexModel(
+            [("attendance_window_id", ASCENDING), ("student_id", ASCENDING)],
+            unique=True,
+            name="uniq_window_student",
+        ),
+        IndexModel([("student_id", ASCENDING), ("marked_at", DESCENDING)], name="student_marked_at"),
+        IndexModel([("marked_at", ASCENDING), ("id", ASCENDING)], name="marked_at_id"),
+        IndexModel([("batch_id", ASCENDING), ("marked_at", ASCENDING)], name="batch_marked_at"),
+    ],
+    "attendance_buckets": [
+        IndexModel([("attendance_window_id", ASCENDING)], name="window_id"),
+        IndexModel([("last_marked_at", ASCENDING), ("first_marked_at", ASCENDING)], name="marked_at_range"),
+        IndexModel([("batch_ids", ASCENDING), ("last_marked_at", ASCENDING)], name="batch_ids_marked_at"),
+        IndexModel([("students", ASCENDING)], name="students"),
+    ],
+    "attendance_rollups": [
+        IndexModel([("scope", ASCENDING), ("batch_id", ASCENDING)], name="scope_batch"),
+    ],
+    "face_embeddings": [
+        IndexModel([("student_id", ASCENDING)], unique=True, name="uniq_student_id"),
+        IndexModel([("batch_id", ASCENDING)], name="batch_id"),
+    ],
+    "refresh_tokens": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="ttl_expires_at"),
+        IndexModel([("family", ASCENDING)], name="family"),
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+    "idempotency_keys": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="ttl_expires_at"),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="ttl_expires_at"),
+    ],
+    "beacon_presence": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="ttl_expires_at"),
+    ],
+    "status_checks": [
+        IndexModel([("timestamp", ASCENDING), ("id", ASCENDING)], name="timestamp_id"),
+    ],
+}
+
+
+def hot_query_shapes():
+    """Representative (collection, filter, sort) shapes issued by the API."""
+    now = datetime.utcnow()
+    start_of_day = datetime.combine(now.date(), datetime.min.time())
+    end_of_day = start_of_day + timedelta(days=1)
+    return [
+        ("users", {"email": "probe@iiitdm.ac.in"}, None),
+        ("users", {"role": "student", "batch": "probe-batch"}, None),
+        ("attendance_windows", {"is_active": True, "end_time": {"$gte": now}}, None),
+        ("attendance_windows", {
+            "batch_id": "probe-batch",
+            "is_active": True,
+            "start_time": {"$lte": now},
+            "end_time": {"$gte": now},
+        }, None),
+        ("attendance_windows", {"finalized_at": None, "end_time": {"$lt": now}}, None),
+        ("attendance_records", {"student_id": "probe-student", "attendance_window_id": "probe-window"}, None),
+        ("attendance_records", {"student_id": "probe-student"}, [("marked_at", DESCENDING)]),
+        ("attendance_records", {"marked_at": {"$gte": start_of_day, "$lte": end_of_day}}, None),
+        ("attendance_records", {"batch_id": "probe-batch", "marked_at": {"$gte": start_of_day}}, None),
+        ("face_embeddings", {"batch_id": "probe-batch"}, None),
+        ("attendance_buckets", {"last_marked_at": {"$gte": start_of_day}, "first_marked_at": {"$lte": end_of_day}}, None),
+    ]
+
+
+async def has_unique_index(collection, fields) -> bool:
+    """True if collection has a unique index on exactly these fields, in order."""
+    info = await collection.index_information()
+    return any(
+        index.get("unique") and tuple(field for field, _ in index["key"]) == tuple(fields)
+        for index in info.values()
+    )
+
+
+def status_check_ttl_seconds() -> int:
+    return int(os.environ.get('STATUS_CHECK_TTL_SECONDS', str(30 * 24 * 3600)))
+
+
+async def ensure_ttl_index(db, collection: str, field: str, seconds: int, name: str) -> str:
+    """Create a TTL index or retune an existing one in place; seconds <= 0 leaves it alone."""
+    if seconds <= 0:
+        return "disabled"
+    info = await db[collection].index_information()
+    if name not in info:
+        await db[collection].create_index([(field, ASCENDING)], name=name, expireAfterSeconds=seconds)
+        return "created"
+    if info[name].get("expireAfterSeconds") != seconds:
+        await db.command({"collMod": collection, "index": {"name": name, "expireAfterSeconds": seconds}})
+        return "updated"
+    return "unchanged"
+
+
+async def ensure_indexes(db, ping_timeout: float = PING_TIMEOUT_SECONDS) -> dict:
+    """Create all declared indexes; returns created and failed index names per collection.
+
+    Pings the server first and skips every index if it does not answer within ping_timeout.
+    """
+    try:
+        await asyncio.wait_for(db.command("ping"), ping_timeout)
+    except asyncio.TimeoutError:
+        error = f"Database unreachable: no reply to ping within {ping_timeout}s"
+    except Exception as exc:
+        error = f"Database unreachable: {exc}"
+    else:
+        error = None
+    if error:
+        logger.error("Skipping index creation: %s", error)
+        report = {collection: {"created": [], "failed": {model.document["name"]: error for model in models}}
+                  for collection, models in INDEXES.items()}
+        report["status_checks"]["failed"]["ttl_timestamp"] = error
+        return report
+
+    report = {}
+    for collection, models in INDEXES.items():
+        created, failed = [], {}
+        for model in models:
+            name = model.document["name"]
+            try:
+                await db[collection].create_indexes([model])
+                created.append(name)
+            except Exception as exc:
+                failed[name] = str(exc)
+                logger.error("Could not create index %s.%s: %s", collection, name, exc)
+        report[collection] = {"created": created, "failed": failed}
+
+    # STATUS_CHECK_TTL_SECONDS is read at call time so it can be retuned without a code change
+    try:
+        state = await ensure_ttl_index(db, "status_checks", "timestamp", status_check_ttl_seconds(), "ttl_timestamp")
+        if state in ("created", "updated"):
+            report["status_checks"]["created"].append("ttl_timestamp")
+    except Exception as exc:
+        report["status_checks"]["failed"]["ttl_timestamp"] = str(exc)
+        logger.error("Could not create index status_checks.ttl_timestamp: %s", exc)
+    return report
+
+
+def _plan_stages(plan) -> list:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key in ("inputStage", "queryPlan"):
+            stages.extend(_plan_stages(plan.get(key)))
+        for child in plan.get("inputStages", []):
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+async def verify_query_plans(db) -> list:
+    """Run explain() on each hot query shape and flag collection scans."""
+    results = []
+    for collection, query, sort in hot_query_shapes():
+        cursor = db[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+        collscan = "COLLSCAN" in stages
+        if collscan:
+            logger.warning("Query on %s still uses COLLSCAN: %s", collection, query)
+        results.append({
+            "collection": collection,
+            "filter": sorted(query),
+            "sort": [field for field, _ in sort] if sort else [],
+            "stages": stages,
+            "collscan": collscan,
+        })
+    return results
+
+
+async def main(verify_only: bool = False):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    if not verify_only:
+        report = await ensure_indexes(db)
+        for collection, result in report.items():
+            print(f"✅ {collection}: {', '.join(result['created']) or '-'}")
+            for name, error in result["failed"].items():
+                print(f"❌ {collection}.{name}: {error}")
+
+    collscans = 0
+    for result in await verify_query_plans(db):
+        marker = "❌ COLLSCAN" if result["collscan"] else "✅"
+        print(f"{marker} {result['collection']} {result['filter']} -> {' > '.join(result['stages'])}")
+        collscans += result["collscan"]
+
+    client.close()
+    return 1 if collscans else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and verify AttendanceSync indexes")
+    parser.add_argument("--verify", action="store_true", help="only verify query plans")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(verify_only=args.verify)))
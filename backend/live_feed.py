@@ -0,0 +1,112 @@
+"""
+Live attendance feed for the admin panel.
+
+Newly marked records are fanned out in-process to subscribed faculty as
+Server-Sent Events, filtered by batch or window. Each subscriber gets a
+bounded queue; a consumer that falls behind is evicted instead of slowing
+down mark_attendance. For multi-worker deployments the feed can be fed from
+a Mongo change stream on attendance_records instead of local publishes.
+"""
+
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional, Set
+
+from pagination import json_default
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, batch_id: Optional[str], window_id: Optional[str], max_queue: int):
+        self.batch_id = batch_id
+        self.window_id = window_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.evicted = False
+
+    def matches(self, record: dict) -> bool:
+        if self.batch_id and record.get("batch_id") != self.batch_id:
+            return False
+        if self.window_id and record.get("attendance_window_id") != self.window_id:
+            return False
+        return True
+
+
+class AttendanceFeed:
+    """In-process pub/sub of attendance records with slow-consumer eviction."""
+
+    def __init__(self, max_queue: int = 256, heartbeat_seconds: float = 15):
+        self.max_queue = max_queue
+        self.heartbeat_seconds = heartbeat_seconds
+        self._subscribers: Set[Subscription] = set()
+        self._watcher: Optional[asyncio.Task] = None
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self, batch_id: Optional[str] = None, window_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(batch_id, window_id, self.max_queue)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, record: dict):
+        record = {key: value for key, value in record.items() if key != "_id"}
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if not subscription.matches(record):
+                continue
+            try:
+                subscription.queue.put_nowait(record)
+            except asyncio.QueueFull:
+                subscription.evicted = True
+                self._subscribers.discard(subscription)
+                self.evictions += 1
+
+    async def events(self, subscription: Subscription) -> AsyncIterator[str]:
+        """Yield SSE frames for a subscription until it is evicted or cancelled."""
+        try:
+            yield "retry: 5000\n\n"
+            while not subscription.evicted:
+                try:
+                    record = await asyncio.wait_for(subscription.queue.get(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: attendance\ndata: {json.dumps(record, default=json_default)}\n\n"
+            yield 'event: evicted\ndata: {"reason": "slow consumer"}\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+    async def _watch(self, collection):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with collection.watch(pipeline) as stream:
+                    async for change in stream:
+                        self.publish(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Attendance change stream failed; retrying")
+                await asyncio.sleep(5)
+
+    def start_change_stream(self, collection):
+        if self._watcher is None:
+            self._watcher = asyncio.ensure_future(self._watch(collection))
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "evictions": self.evictions,
+            "change_stream": self._watcher is not None,
+        }
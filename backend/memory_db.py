@@ -0,0 +1,942 @@
+"""
+Indexed in-memory storage engine with a Motor-compatible API.
+
+MemoryCollection implements the subset of AsyncIOMotorCollection the API
+uses (find/find_one/insert/update/bulk_write/delete/count/distinct/aggregate
+and index management), so handlers run unchanged without a Mongo server.
+
+Indexes declared through create_index(es) are kept as sorted lists of
+(key tuple, sequence) entries. Equality lookups on a prefix of an index and
+one trailing range are answered with bisect, unique indexes are enforced on
+every write, and explain() reports IXSCAN or COLLSCAN like Mongo does. All
+matching is still re-checked against the full filter, so an index only ever
+narrows the candidate set. There are no multikey indexes: an index that has
+seen an array value is kept up to date but no longer used to plan queries.
+
+As in BSON, datetimes are stored and compared at millisecond precision. TTL
+indexes are applied the way Mongo's TTL monitor does it, at most once every
+TTL_MONITOR_SECONDS per collection, checked on the next read or write.
+"""
+
+import bisect
+import itertools
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+DUPLICATE_KEY_ERROR = 11000
+# Mongo's ttlMonitorSleepSecs default
+TTL_MONITOR_SECONDS = 60
+_MISSING = object()
+
+
+class _Extreme:
+    """Sentinel that sorts below (or above) every other index key component."""
+
+    def __init__(self, sign: int):
+        self.sign = sign
+
+    def __lt__(self, other):
+        return self.sign < 0 and other is not self
+
+    def __gt__(self, other):
+        return self.sign > 0 and other is not self
+
+    def __le__(self, other):
+        return self.sign < 0 or other is self
+
+    def __ge__(self, other):
+        return self.sign > 0 or other is self
+
+    def __eq__(self, other):
+        return other is self
+
+    def __hash__(self):
+        return id(self)
+
+
+_MIN = _Extreme(-1)
+_MAX = _Extreme(1)
+
+
+def sort_key(value) -> tuple:
+    """Total order over BSON-like values (null < numbers < strings < objects < arrays < bool < dates)."""
+    if value is None or value is _MISSING:
+        return (1,)
+    if isinstance(value, bool):
+        return (8, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    if isinstance(value, dict):
+        return (4, str(sorted(value.items(), key=lambda kv: kv[0])))
+    if isinstance(value, (list, tuple)):
+        return (5, tuple(sort_key(v) for v in value))
+    if isinstance(value, ObjectId):
+        return (7, str(value))
+    if isinstance(value, datetime):
+        return (9, _to_millis(value))
+    return (10, str(value))
+
+
+def _to_millis(value: datetime) -> datetime:
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def _clone(value):
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    if isinstance(value, datetime):
+        return _to_millis(value)
+    return value
+
+
+def get_path(doc, path: str):
+    """Resolve a dotted path; arrays of sub-documents yield a list of values."""
+    current = doc
+    for part in path.split("."):
+        if isinstance(current, dict):
+            current = current.get(part, _MISSING)
+        elif isinstance(current, list):
+            values = [item.get(part, _MISSING) for item in current if isinstance(item, dict)]
+            current = [v for v in values if v is not _MISSING]
+        else:
+            return _MISSING
+        if current is _MISSING:
+            return _MISSING
+    return current
+
+
+def _candidates(value) -> list:
+    """Values a field condition is tested against (array fields match element-wise)."""
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _compare(value, op: str, operand) -> bool:
+    left, right = sort_key(value), sort_key(operand)
+    if left[0] != right[0]:
+        return False
+    if op == "$gt":
+        return left > right
+    if op == "$gte":
+        return left >= right
+    if op == "$lt":
+        return left < right
+    return left <= right
+
+
+def _match_condition(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$eq":
+                if not _match_condition(value, operand):
+                    return False
+            elif op == "$ne":
+                if _match_condition(value, operand):
+                    return False
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is _MISSING or not any(_compare(v, op, operand) for v in _candidates(value)):
+                    return False
+            elif op == "$in":
+                if not any(_match_condition(value, item) for item in operand):
+                    return False
+            elif op == "$nin":
+                if any(_match_condition(value, item) for item in operand):
+                    return False
+            elif op == "$exists":
+                if (value is not _MISSING) != bool(operand):
+                    return False
+            elif op == "$size":
+                if not isinstance(value, list) or len(value) != operand:
+                    return False
+            elif op == "$elemMatch":
+                if not isinstance(value, list) or not any(
+                    matches(item, operand) if isinstance(item, dict) else _match_condition(item, operand)
+                    for item in value
+                ):
+                    return False
+            else:
+                raise OperationFailure(f"Unsupported query operator {op}")
+        return True
+    if value is _MISSING:
+        return condition is None
+    return any(sort_key(v) == sort_key(condition) for v in _candidates(value))
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(get_path(doc, key), condition):
+            return False
+    return True
+
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return _clone(doc)
+    included = [k for k, v in projection.items() if v and k != "_id"]
+    if included:
+        result = {}
+        if projection.get("_id", 1):
+            result["_id"] = doc.get("_id")
+        for key in included:
+            # Dotted paths keep their embedded-document nesting, as in MongoDB
+            value = get_path(doc, key)
+            if value is not _MISSING:
+                _set_path(result, key, _clone(value))
+        return result
+    excluded = {k for k, v in projection.items() if not v}
+    return {k: _clone(v) for k, v in doc.items() if k not in excluded}
+
+
+def _set_path(doc: dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _each(value) -> list:
+    if isinstance(value, dict) and "$each" in value:
+        return list(value["$each"])
+    return [value]
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            current = get_path(doc, path)
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                _set_path(doc, path, _clone(value))
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op in ("$max", "$min"):
+                if current is _MISSING or current is None:
+                    _set_path(doc, path, _clone(value))
+                elif op == "$max" and sort_key(value) > sort_key(current):
+                    _set_path(doc, path, _clone(value))
+                elif op == "$min" and sort_key(value) < sort_key(current):
+                    _set_path(doc, path, _clone(value))
+            elif op in ("$push", "$addToSet"):
+                items = [] if current is _MISSING else list(current)
+                for item in _each(value):
+                    if op == "$push" or all(sort_key(item) != sort_key(existing) for existing in items):
+                        items.append(_clone(item))
+                _set_path(doc, path, items)
+            elif op == "$pull":
+                if isinstance(current, list):
+                    _set_path(doc, path, [item for item in current if not _match_condition(item, value)])
+            else:
+                raise OperationFailure(f"Unsupported update operator {op}")
+
+
+def _upsert_seed(query: dict) -> dict:
+    seed = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            if "$eq" in condition:
+                _set_path(seed, key, _clone(condition["$eq"]))
+            continue
+        _set_path(seed, key, _clone(condition))
+    return seed
+
+
+class _Index:
+    def __init__(self, name: str, keys: List[Tuple[str, int]], unique: bool = False,
+                 sparse: bool = False, expire_after_seconds: Optional[int] = None,
+                 partial_filter: Optional[dict] = None):
+        self.name = name
+        self.keys = keys
+        self.fields = [field for field, _ in keys]
+        self.unique = unique
+        self.sparse = sparse
+        self.expire_after_seconds = expire_after_seconds
+        self.partial_filter = partial_filter
+        self.multikey = False
+        self.entries: List[tuple] = []
+
+    def covers(self, doc: dict) -> bool:
+        if self.partial_filter and not matches(doc, self.partial_filter):
+            return False
+        if self.sparse and all(get_path(doc, f) is _MISSING for f in self.fields):
+            return False
+        return True
+
+    def key(self, doc: dict) -> tuple:
+        return tuple(sort_key(get_path(doc, field)) for field in self.fields)
+
+    def add(self, doc: dict, seq: int):
+        if self.covers(doc):
+            if not self.multikey and any(isinstance(get_path(doc, f), list) for f in self.fields):
+                self.multikey = True
+            bisect.insort(self.entries, self.key(doc) + (seq,))
+
+    def remove(self, doc: dict, seq: int):
+        if not self.covers(doc):
+            return
+        entry = self.key(doc) + (seq,)
+        position = bisect.bisect_left(self.entries, entry)
+        if position < len(self.entries) and self.entries[position] == entry:
+            del self.entries[position]
+
+    def conflicts(self, doc: dict, seq: Optional[int]) -> bool:
+        if not self.unique or not self.covers(doc):
+            return False
+        key = self.key(doc)
+        position = bisect.bisect_left(self.entries, key)
+        while position < len(self.entries) and self.entries[position][:-1] == key:
+            if self.entries[position][-1] != seq:
+                return True
+            position += 1
+        return False
+
+    def plan(self, query: dict):
+        """Return (score, key ranges) for the filter, or None if the index cannot help."""
+        prefixes = [()]
+        score = 0
+        for field in self.fields:
+            condition = query.get(field, _MISSING)
+            if condition is _MISSING:
+                break
+            operators = isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition)
+            if not operators:
+                if isinstance(condition, (list, dict)):
+                    break
+                prefixes = [p + (sort_key(condition),) for p in prefixes]
+                score += 2
+                continue
+            if "$eq" in condition and len(condition) == 1:
+                prefixes = [p + (sort_key(condition["$eq"]),) for p in prefixes]
+                score += 2
+                continue
+            if "$in" in condition and len(condition) == 1 and len(prefixes) * len(condition["$in"]) <= 256:
+                values = sorted({sort_key(v) for v in condition["$in"]})
+                prefixes = [p + (v,) for p in prefixes for v in values]
+                score += 2
+                continue
+            bounds = {op: v for op, v in condition.items() if op in ("$gt", "$gte", "$lt", "$lte")}
+            if bounds and len(bounds) == len(condition):
+                score += 1
+                return score, [self._range(p, bounds) for p in prefixes]
+            break
+        if score == 0:
+            return None
+        return score, [(p + (_MIN,), p + (_MAX,)) for p in prefixes]
+
+    @staticmethod
+    def _range(prefix: tuple, bounds: dict):
+        low, high = prefix + (_MIN,), prefix + (_MAX,)
+        if "$gte" in bounds:
+            low = prefix + (sort_key(bounds["$gte"]), _MIN)
+        if "$gt" in bounds:
+            low = prefix + (sort_key(bounds["$gt"]), _MAX)
+        if "$lte" in bounds:
+            high = prefix + (sort_key(bounds["$lte"]), _MAX)
+        if "$lt" in bounds:
+            high = prefix + (sort_key(bounds["$lt"]), _MIN)
+        return low, high
+
+    def scan(self, ranges) -> List[int]:
+        seqs = []
+        for low, high in ranges:
+            start = bisect.bisect_left(self.entries, low)
+            end = bisect.bisect_right(self.entries, high)
+            seqs.extend(entry[-1] for entry in self.entries[start:end])
+        return seqs
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query: Optional[dict], projection: Optional[dict]):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[dict]] = None
+
+    def sort(self, key_or_list, direction: int = 1):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def _evaluate(self) -> List[dict]:
+        if self._results is None:
+            docs = self._collection._select(self._query)
+            for field, direction in reversed(self._sort):
+                docs.sort(key=lambda d: sort_key(get_path(d, field)), reverse=direction < 0)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = [project(doc, self._projection) for doc in docs]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        docs = self._evaluate()
+        return docs[:length] if length else list(docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._evaluate():
+            yield doc
+
+    async def explain(self) -> dict:
+        plan = self._collection._plan(self._query)
+        if plan is None:
+            winning = {"stage": "COLLSCAN", "filter": self._query}
+        else:
+            scans = [{"stage": "IXSCAN", "indexName": index.name, "keyPattern": dict(index.keys)}
+                     for index, _ in plan[1]]
+            inner = scans[0] if len(scans) == 1 else {"stage": "OR", "inputStages": scans}
+            winning = {"stage": "FETCH", "inputStage": inner}
+        return {"queryPlanner": {"namespace": self._collection.name, "winningPlan": winning}}
+
+
+class MemoryCommandCursor:
+    def __init__(self, docs: List[dict]):
+        self._docs = docs
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        return self._docs[:length] if length else list(self._docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+
+def _expression(doc: dict, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_path(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            op, args = next(iter(expression.items()))
+            if op == "$concat":
+                parts = [_expression(doc, arg) for arg in args]
+                return None if any(p is None for p in parts) else "".join(str(p) for p in parts)
+            if op == "$size":
+                value = _expression(doc, args)
+                return len(value) if isinstance(value, list) else 0
+            if op == "$ifNull":
+                value = _expression(doc, args[0])
+                return _expression(doc, args[1]) if value is None else value
+        return {key: _expression(doc, value) for key, value in expression.items()}
+    return expression
+
+
+def _group(docs: Iterable[dict], spec: dict) -> List[dict]:
+    groups: Dict[Any, dict] = {}
+    for doc in docs:
+        group_id = _expression(doc, spec["_id"])
+        group_key = sort_key(group_id)
+        state = groups.get(group_key)
+        if state is None:
+            state = groups[group_key] = {"_id": group_id}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            op, argument = next(iter(accumulator.items()))
+            value = _expression(doc, argument)
+            if op == "$sum":
+                state[field] = state.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif op == "$first":
+                state.setdefault(field, value)
+            elif op == "$last":
+                state[field] = value
+            elif op in ("$max", "$min"):
+                current = state.get(field)
+                if value is not None and (current is None or (
+                        sort_key(value) > sort_key(current) if op == "$max" else sort_key(value) < sort_key(current))):
+                    state[field] = value
+                else:
+                    state.setdefault(field, current)
+            elif op == "$push":
+                state.setdefault(field, []).append(value)
+            elif op == "$addToSet":
+                items = state.setdefault(field, [])
+                if all(sort_key(value) != sort_key(item) for item in items):
+                    items.append(value)
+            else:
+                raise OperationFailure(f"Unsupported accumulator {op}")
+    return list(groups.values())
+
+
+def run_pipeline(docs: List[dict], pipeline: List[dict]) -> List[dict]:
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif op == "$group":
+            docs = _group(docs, spec)
+        elif op == "$sort":
+            for field, direction in reversed(list(spec.items())):
+                docs.sort(key=lambda d: sort_key(get_path(d, field)), reverse=direction < 0)
+        elif op == "$skip":
+            docs = docs[spec:]
+        elif op == "$limit":
+            docs = docs[:spec]
+        elif op == "$project":
+            if all(v in (0, 1, True, False) for v in spec.values()):
+                docs = [project(doc, spec) for doc in docs]
+            else:
+                docs = [{key: (doc.get(key) if value in (1, True) else _expression(doc, value))
+                         for key, value in spec.items() if value not in (0, False)} for doc in docs]
+        elif op == "$addFields" or op == "$set":
+            docs = [{**doc, **{key: _expression(doc, value) for key, value in spec.items()}} for doc in docs]
+        elif op == "$unwind":
+            path = spec if isinstance(spec, str) else spec["path"]
+            field = path[1:]
+            unwound = []
+            for doc in docs:
+                for item in get_path(doc, field) or []:
+                    copy = dict(doc)
+                    _set_path(copy, field, item)
+                    unwound.append(copy)
+            docs = unwound
+        elif op == "$replaceRoot":
+            docs = [_expression(doc, spec["newRoot"]) for doc in docs]
+        elif op == "$count":
+            docs = [{spec: len(docs)}]
+        else:
+            raise OperationFailure(f"Unsupported aggregation stage {op}")
+    return docs
+
+
+class MemoryCollection:
+    ttl_monitor_seconds = TTL_MONITOR_SECONDS
+
+    def __init__(self, name: str, database: Optional["MemoryDatabase"] = None):
+        self.name = name
+        self._database = database
+        self._reset()
+
+    def _reset(self):
+        self._docs: Dict[int, dict] = {}
+        self._seq = itertools.count()
+        self._indexes: Dict[str, _Index] = {"_id_": _Index("_id_", [("_id", 1)], unique=True)}
+        self._next_expiry = 0.0
+
+    # Query planning -------------------------------------------------------
+
+    def _plan(self, query: dict):
+        """Best (score, [(index, key ranges), ...]) for the filter, or None for a full scan."""
+        best = None
+        for index in self._indexes.values():
+            if index.sparse or index.partial_filter or index.multikey:
+                continue
+            plan = index.plan(query)
+            if plan and (best is None or plan[0] > best[0]):
+                best = (plan[0], [(index, plan[1])])
+        for clause in query.get("$and", []):
+            plan = self._plan(clause)
+            if plan and (best is None or plan[0] > best[0]):
+                best = plan
+        branches = query.get("$or")
+        if branches:
+            plans = [self._plan(branch) for branch in branches]
+            if all(plans):
+                score = min(plan[0] for plan in plans)
+                if best is None or score > best[0]:
+                    best = (score, [scan for plan in plans for scan in plan[1]])
+        return best
+
+    def _candidate_seqs(self, query: dict) -> List[int]:
+        plan = self._plan(query)
+        if plan is None:
+            return list(self._docs)
+        seqs = set()
+        for index, ranges in plan[1]:
+            seqs.update(index.scan(ranges))
+        return sorted(seqs)
+
+    def _select(self, query: dict) -> List[dict]:
+        return [self._docs[seq] for seq in self._select_seqs(query)]
+
+    def _select_seqs(self, query: dict, limit: int = 0) -> List[int]:
+        self._expire_due()
+        found = []
+        for seq in self._candidate_seqs(query):
+            if matches(self._docs[seq], query):
+                found.append(seq)
+                if limit and len(found) >= limit:
+                    break
+        return found
+
+    # Writes ---------------------------------------------------------------
+
+    def _check_unique(self, doc: dict, seq: Optional[int]):
+        for index in self._indexes.values():
+            if index.conflicts(doc, seq):
+                key = {field: get_path(doc, field) for field in index.fields}
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {index.name} dup key: {key}",
+                    DUPLICATE_KEY_ERROR,
+                    {"keyPattern": dict(index.keys), "keyValue": key},
+                )
+
+    def _insert(self, doc: dict):
+        self._expire_due()
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        stored = _clone(doc)
+        self._check_unique(stored, None)
+        seq = next(self._seq)
+        self._docs[seq] = stored
+        for index in self._indexes.values():
+            index.add(stored, seq)
+        return doc["_id"]
+
+    def _replace(self, seq: int, new_doc: dict):
+        old = self._docs[seq]
+        self._check_unique(new_doc, seq)
+        for index in self._indexes.values():
+            index.remove(old, seq)
+        self._docs[seq] = new_doc
+        for index in self._indexes.values():
+            index.add(new_doc, seq)
+
+    def _update(self, query: dict, update: dict, upsert: bool, multi: bool, replacement: bool = False) -> dict:
+        seqs = self._select_seqs(query, limit=0 if multi else 1)
+        modified = 0
+        for seq in seqs:
+            old = self._docs[seq]
+            if replacement:
+                new_doc = _clone(update)
+                new_doc["_id"] = old["_id"]
+            else:
+                new_doc = _clone(old)
+                apply_update(new_doc, update)
+            if new_doc != old:
+                self._replace(seq, new_doc)
+                modified += 1
+        result = {"n": len(seqs), "nModified": modified, "ok": 1.0}
+        if not seqs and upsert:
+            doc = _upsert_seed(query)
+            if replacement:
+                doc.update(_clone(update))
+            else:
+                apply_update(doc, update, inserting=True)
+            result["upserted"] = self._insert(doc)
+            result["n"] = 1
+        return result
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents: Iterable[dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        inserted, errors = [], []
+        for i, document in enumerate(documents):
+            try:
+                inserted.append(self._insert(document))
+            except DuplicateKeyError as exc:
+                errors.append({"index": i, "code": DUPLICATE_KEY_ERROR, "errmsg": str(exc), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted),
+                                  "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []})
+        return InsertManyResult(inserted, True)
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, multi=False), True)
+
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, multi=True), True)
+
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, replacement, upsert, multi=False, replacement=True), True)
+
+    async def find_one_and_update(self, filter: dict, update: dict, projection=None, upsert: bool = False,
+                                  return_document: bool = False, **kwargs) -> Optional[dict]:
+        seqs = self._select_seqs(filter, limit=1)
+        before = project(self._docs[seqs[0]], projection) if seqs else None
+        result = self._update(filter, update, upsert, multi=False)
+        if not return_document:
+            return before
+        if seqs:
+            return project(self._docs[seqs[0]], projection)
+        if "upserted" in result:
+            return await self.find_one({"_id": result["upserted"]}, projection)
+        return None
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        return DeleteResult({"n": self._delete(filter, limit=1), "ok": 1.0}, True)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        return DeleteResult({"n": self._delete(filter), "ok": 1.0}, True)
+
+    def _delete(self, query: dict, limit: int = 0) -> int:
+        seqs = self._select_seqs(query, limit=limit)
+        for seq in seqs:
+            doc = self._docs.pop(seq)
+            for index in self._indexes.values():
+                index.remove(doc, seq)
+        return len(seqs)
+
+    async def bulk_write(self, requests: list, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        totals = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []}
+        errors = []
+        for i, request in enumerate(requests):
+            kind = type(request).__name__
+            try:
+                if kind == "InsertOne":
+                    self._insert(request._doc)
+                    totals["nInserted"] += 1
+                elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                    result = self._update(request._filter, request._doc, bool(request._upsert),
+                                          multi=kind == "UpdateMany", replacement=kind == "ReplaceOne")
+                    if "upserted" in result:
+                        totals["nUpserted"] += 1
+                        totals["upserted"].append({"index": i, "_id": result["upserted"]})
+                    else:
+                        totals["nMatched"] += result["n"]
+                        totals["nModified"] += result["nModified"]
+                elif kind in ("DeleteOne", "DeleteMany"):
+                    totals["nRemoved"] += self._delete(request._filter, limit=1 if kind == "DeleteOne" else 0)
+                else:
+                    raise OperationFailure(f"Unsupported bulk operation {kind}")
+            except DuplicateKeyError as exc:
+                errors.append({"index": i, "code": DUPLICATE_KEY_ERROR, "errmsg": str(exc)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({**totals, "writeErrors": errors, "writeConcernErrors": []})
+        return BulkWriteResult(totals, True)
+
+    # Reads ----------------------------------------------------------------
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> MemoryCursor:
+        return MemoryCursor(self, filter, projection)
+
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        seqs = self._select_seqs(filter or {}, limit=1)
+        return project(self._docs[seqs[0]], projection) if seqs else None
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        return len(self._select_seqs(filter))
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        self._expire_due()
+        return len(self._docs)
+
+    async def distinct(self, key: str, filter: Optional[dict] = None, **kwargs) -> list:
+        values, seen = [], set()
+        for doc in self._select(filter or {}):
+            value = get_path(doc, key)
+            for item in (value if isinstance(value, list) else [value]):
+                marker = sort_key(item)
+                if item is not _MISSING and marker not in seen:
+                    seen.add(marker)
+                    values.append(item)
+        return values
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> MemoryCommandCursor:
+        self._expire_due()
+        docs = self._select(pipeline[0]["$match"]) if pipeline and "$match" in pipeline[0] else list(self._docs.values())
+        docs = [_clone(doc) for doc in docs]
+        return MemoryCommandCursor(run_pipeline(docs, pipeline[1:] if pipeline and "$match" in pipeline[0] else pipeline))
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("Change streams are not supported by the in-memory storage engine")
+
+    # Index management -----------------------------------------------------
+
+    async def create_index(self, keys, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        keys = list(keys)
+        name = kwargs.get("name") or "_".join(f"{field}_{direction}" for field, direction in keys)
+        existing = self._indexes.get(name)
+        if existing is not None:
+            if existing.keys != keys or existing.unique != bool(kwargs.get("unique")):
+                raise OperationFailure(f"Index with name: {name} already exists with different options", 85)
+            return name
+        index = _Index(name, keys, unique=bool(kwargs.get("unique")), sparse=bool(kwargs.get("sparse")),
+                       expire_after_seconds=kwargs.get("expireAfterSeconds"),
+                       partial_filter=kwargs.get("partialFilterExpression"))
+        for seq, doc in self._docs.items():
+            if index.conflicts(doc, seq):
+                raise DuplicateKeyError(f"E11000 duplicate key error building index {name}", DUPLICATE_KEY_ERROR)
+            index.add(doc, seq)
+        self._indexes[name] = index
+        return name
+
+    async def create_indexes(self, indexes: list, **kwargs) -> List[str]:
+        names = []
+        for model in indexes:
+            document = dict(model.document)
+            keys = list(document.pop("key").items())
+            names.append(await self.create_index(keys, **document))
+        return names
+
+    async def index_information(self) -> dict:
+        info = {}
+        for name, index in self._indexes.items():
+            entry = {"key": list(index.keys), "v": 2}
+            if index.unique and name != "_id_":
+                entry["unique"] = True
+            if index.expire_after_seconds is not None:
+                entry["expireAfterSeconds"] = index.expire_after_seconds
+            info[name] = entry
+        return info
+
+    async def drop_index(self, name: str):
+        if name == "_id_" or name not in self._indexes:
+            raise OperationFailure(f"index not found with name [{name}]", 27)
+        del self._indexes[name]
+
+    async def drop(self):
+        self._docs.clear()
+        for index in self._indexes.values():
+            index.entries.clear()
+
+    async def rename(self, new_name: str, dropTarget: bool = False, **kwargs):
+        """Move documents and indexes to new_name; handles address collections by name, as with Motor."""
+        target = self._database[new_name]
+        if (target._docs or len(target._indexes) > 1) and not dropTarget:
+            raise OperationFailure(f"target namespace exists: {new_name}", 48)
+        target._docs, target._seq, target._indexes = self._docs, self._seq, self._indexes
+        target._next_expiry = 0.0
+        self._reset()
+
+    def _expire_due(self):
+        now = time.monotonic()
+        if now >= self._next_expiry:
+            self._next_expiry = now + self.ttl_monitor_seconds
+            self.expire(datetime.utcnow())
+
+    def expire(self, now: datetime) -> int:
+        """Apply TTL indexes (the Mongo TTL monitor does this in the background)."""
+        removed = 0
+        for index in list(self._indexes.values()):
+            if index.expire_after_seconds is None:
+                continue
+            field = index.fields[0]
+            cutoff = now.timestamp() - index.expire_after_seconds
+            expired = [seq for seq, doc in self._docs.items()
+                       if isinstance(doc.get(field), datetime) and doc[field].timestamp() <= cutoff]
+            for seq in expired:
+                doc = self._docs.pop(seq)
+                for other in self._indexes.values():
+                    other.remove(doc, seq)
+            removed += len(expired)
+        return removed
+
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(name, self)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str) -> MemoryCollection:
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    async def drop_collection(self, name: str):
+        self._collections.pop(name, None)
+
+    async def command(self, command, *args, **kwargs) -> dict:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        if name == "collMod" and "index" in command:
+            spec = command["index"]
+            index = self[command["collMod"]]._indexes.get(spec.get("name"))
+            if index is None:
+                raise OperationFailure(f"index not found: {spec.get('name')}")
+            if "expireAfterSeconds" in spec:
+                index.expire_after_seconds = spec["expireAfterSeconds"]
+            return {"ok": 1.0}
+        raise OperationFailure(f"Unsupported command {name}")
+
+
+class MemoryClient:
+    """Process-wide registry of in-memory databases, shaped like AsyncIOMotorClient."""
+
+    _databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = MemoryDatabase(name)
+        return database
+
+    def get_database(self, name: str) -> MemoryDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self["admin"]
+
+    async def drop_database(self, name):
+        # Existing handles stay usable after a drop, as with Motor
+        database = self._databases.get(getattr(name, "name", name))
+        if database is not None:
+            database._collections.clear()
+
+    def close(self):
+        pass
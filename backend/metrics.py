@@ -0,0 +1,206 @@
+"""
+Request and Mongo command metrics in Prometheus text format.
+
+MetricsMiddleware records per-route latency histograms, in-flight requests
+and status codes. MongoCommandTimer is a pymongo CommandListener that times
+every command by collection and operation, and remembers the query shapes
+issued while handling a request so slow requests can be logged with them.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Mongo commands issued on behalf of the current request: [(shape, seconds)]
+_request_commands: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_commands", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.request_status: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.in_flight: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.mongo_latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.mongo_failures: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._gauge_sources: List[Tuple[str, Callable[[], dict]]] = []
+
+    def observe_mongo(self, collection: str, command: str, seconds: float, failed: bool = False):
+        # Command listeners run on Motor's executor threads
+        with self._lock:
+            self.mongo_latency[(collection, command)].observe(seconds)
+            if failed:
+                self.mongo_failures[(collection, command)] += 1
+
+    def add_gauge_source(self, prefix: str, source: Callable[[], dict]):
+        """Expose every numeric value of source() as attendance_<prefix>_<key>."""
+        self._gauge_sources.append((prefix, source))
+
+    def _histogram_lines(self, name: str, series: Dict[tuple, Histogram], label_names: Tuple[str, ...]) -> List[str]:
+        lines = []
+        for key, histogram in sorted(series.items()):
+            labels = dict(zip(label_names, key))
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.total}")
+            lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(**labels)} {histogram.total}")
+        return lines
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            lines += self._histogram_lines("http_request_duration_seconds", self.request_latency, ("method", "route"))
+            lines += ["# HELP http_requests_total Requests by route and status code",
+                      "# TYPE http_requests_total counter"]
+            for (method, route, status), count in sorted(self.request_status.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+            lines += ["# HELP http_requests_in_flight Requests currently being handled",
+                      "# TYPE http_requests_in_flight gauge"]
+            for (method, route), count in sorted(self.in_flight.items()):
+                lines.append(f"http_requests_in_flight{_labels(method=method, route=route)} {count}")
+            lines += ["# HELP mongo_command_duration_seconds Mongo command latency by collection and operation",
+                      "# TYPE mongo_command_duration_seconds histogram"]
+            lines += self._histogram_lines("mongo_command_duration_seconds", self.mongo_latency, ("collection", "command"))
+            lines += ["# HELP mongo_command_failures_total Failed Mongo commands",
+                      "# TYPE mongo_command_failures_total counter"]
+            for (collection, command), count in sorted(self.mongo_failures.items()):
+                lines.append(f"mongo_command_failures_total{_labels(collection=collection, command=command)} {count}")
+
+        for prefix, source in self._gauge_sources:
+            for key, value in source().items():
+                if isinstance(value, (int, float)):
+                    name = f"attendance_{prefix}_{key}"
+                    lines += [f"# TYPE {name} gauge", f"{name} {float(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def query_shape(command_name: str, command: dict) -> str:
+    """Collection, operation and filter keys of a command, without the values."""
+    collection = command.get(command_name)
+    if not isinstance(collection, str):
+        collection = command.get("collection", "?")
+    query = command.get("filter") or command.get("query") or {}
+    if command_name in ("update", "delete") and command.get(f"{command_name}s"):
+        query = command[f"{command_name}s"][0].get("q", {})
+    return f"{command_name} {collection} {sorted(query)}"
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._started: Dict[tuple, tuple] = {}
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = command.get("collection", "admin")
+        shape = query_shape(event.command_name, command) if _request_commands.get() is not None else None
+        self._started[(event.request_id, event.connection_id)] = (collection, shape, _request_commands.get())
+
+    def _finish(self, event, failed: bool):
+        entry = self._started.pop((event.request_id, event.connection_id), None)
+        if entry is None:
+            return
+        collection, shape, commands = entry
+        seconds = event.duration_micros / 1e6
+        self.registry.observe_mongo(collection, event.command_name, seconds, failed)
+        if commands is not None:
+            commands.append((shape, seconds))
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+def route_template(router, scope) -> str:
+    """Route template (e.g. /api/admin/analytics/batches/{batch_id}) to keep label cardinality bounded."""
+    for route in getattr(router, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status codes and in-flight requests per route."""
+
+    def __init__(self, app, registry: MetricsRegistry, router=None, slow_request_seconds: Optional[float] = None):
+        self.app = app
+        self.registry = registry
+        self.router = router
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        commands = []
+        token = _request_commands.set(commands)
+        started = time.perf_counter()
+        route = route_template(self.router, scope)
+        self.registry.in_flight[(method, route)] += 1
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_commands.reset(token)
+            self.registry.in_flight[(method, route)] -= 1
+            with self.registry._lock:
+                self.registry.request_latency[(method, route)].observe(elapsed)
+                self.registry.request_status[(method, route, status)] += 1
+            if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+                shapes = "; ".join(f"{shape} {seconds * 1000:.1f}ms" for shape, seconds in commands) or "no queries"
+                logger.warning("Slow request %s %s %d took %.1fms: %s", method, route, status, elapsed * 1000, shapes)
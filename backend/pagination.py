@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination and NDJSON streaming for list endpoints.
+
+Pages are ordered by a stable, unique sort key and the next page starts
+strictly after the last row returned, so every row is reachable without
+skip() and without loading more than one page into memory. The opaque
+cursor handed to clients is the sort-key values of that last row.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+import orjson
+from fastapi import HTTPException
+
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def fields_projection(fields: Sequence[str]) -> dict:
+    """Mongo projection returning exactly these fields and no _id."""
+    projection = {"_id": 0}
+    projection.update((field, 1) for field in fields)
+    return projection
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(doc: dict, sort_keys: Sequence[str]) -> str:
+    payload = json.dumps([_encode_value(doc.get(key)) for key in sort_keys], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_keys: Sequence[str]) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [_decode_value(value) for value in values]
+
+
+def keyset_filter(query: dict, sort_keys: Sequence[str], cursor: Optional[str]) -> dict:
+    """Restrict query to rows sorting strictly after the cursor position."""
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, sort_keys)
+    branches = []
+    for i, key in enumerate(sort_keys):
+        branch = {sort_keys[j]: values[j] for j in range(i)}
+        branch[key] = {"$gt": values[i]}
+        branches.append(branch)
+    after = {"$or": branches}
+    return {"$and": [query, after]} if query else after
+
+
+def sorted_find(collection, query: dict, sort_keys: Sequence[str], cursor: Optional[str], projection=None):
+    return collection.find(
+        keyset_filter(query, sort_keys, cursor),
+        projection if projection is not None else {"_id": 0},
+    ).sort([(key, 1) for key in sort_keys])
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    sort_keys: Sequence[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    projection=None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Return one page of documents and the cursor for the next page (or None)."""
+    docs = await sorted_find(collection, query, sort_keys, cursor, projection).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1], sort_keys)
+    return docs, None
+
+
+async def ndjson_rows(cursor, transform=None) -> AsyncIterator[bytes]:
+    """Serialize rows from a Motor cursor one line at a time."""
+    async for doc in cursor:
+        if transform is not None:
+            doc = transform(doc)
+        yield orjson.dumps(doc, default=json_default, option=orjson.OPT_APPEND_NEWLINE)
@@ -0,0 +1,142 @@
+"""
+bcrypt hashing and verification off the event loop.
+
+Each bcrypt call costs tens of milliseconds of CPU, so running it inline in
+async handlers stalls every other request. PasswordHasher runs the work in a
+thread or process pool, caps concurrency at the pool size and rejects new
+work once the wait queue is full so callers can answer 503 + Retry-After.
+Process pools use the spawn start method: forking a worker that already runs
+an event loop and driver threads is not safe.
+
+Bulk work (roster imports) goes through hash_many, which hashes in small
+chunks with at most one chunk per worker in flight, so single hashes and
+verifications still get a turn in between.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List
+
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing pool saturated")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Bounded executor for bcrypt work with timing counters."""
+
+    def __init__(self, executor: str = "thread", workers: int = 4, max_queue: int = 64):
+        self.executor_kind = executor
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._semaphore = None
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._executor
+
+    def _retry_after(self) -> int:
+        avg_run = self.total_run_seconds / self.completed if self.completed else 0.1
+        return max(1, math.ceil(avg_run * (self.waiting + self.running) / self.workers))
+
+    async def _run(self, fn, *args, bounded: bool = True):
+        executor = self._get_executor()
+        if bounded and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HashingPoolSaturated(self._retry_after())
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        wait = started_at - queued_at
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def hash_many(self, passwords: List[str], chunk_size: int = 16) -> List[str]:
+        """Hash a batch in order; never rejected, but never holds more than one chunk per worker."""
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        results = [None] * len(chunks)
+        pending = iter(range(len(chunks)))
+
+        async def drain():
+            for index in pending:
+                results[index] = await self._run(hash_passwords, chunks[index], bounded=False)
+
+        await asyncio.gather(*(drain() for _ in range(min(self.workers, len(chunks)))))
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(check_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": 1000 * self.total_wait_seconds / self.completed if self.completed else 0.0,
+            "avg_run_ms": 1000 * self.total_run_seconds / self.completed if self.completed else 0.0,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+        }
@@ -0,0 +1,239 @@
+"""
+Admission control for the API.
+
+AdmissionMiddleware applies per-route token buckets keyed by student (the
+bearer token subject) and/or client IP, answering 429 with Retry-After when a
+bucket is empty, and caps concurrently executing write requests with a
+bounded wait queue, answering 503 with Retry-After once the queue is full or
+the wait times out. Requests are rejected before any handler or database work.
+Routes whose work is already bounded elsewhere (logins and imports, by their
+hashing pools) are exempt from the write cap, so a login storm stalled on
+bcrypt cannot hold every slot while attendance marks queue behind it.
+
+Limits keyed by something only the request body carries (the email a login
+is attempted for) are "identifier" rules; the handler checks them with
+identifier_wait once the body is parsed, still before any expensive work.
+
+Buckets live in process memory (MemoryBuckets) or, for multi-worker
+deployments, in a shared Mongo collection (MongoBuckets).
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from starlette.responses import JSONResponse
+
+from metrics import route_template
+
+RATE_LIMIT_COLLECTION = "rate_limits"
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class MemoryBuckets:
+    """Token buckets in process memory, least recently used keys evicted past max_keys."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Take one token; returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class MongoBuckets:
+    """Shared limits for several workers.
+
+    Approximates a token bucket with fixed windows of burst / rate seconds
+    allowing burst requests each: one atomic upsert per request, expired by a
+    TTL index on expires_at.
+    """
+
+    def __init__(self, db):
+        self.collection = db[RATE_LIMIT_COLLECTION]
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        period = burst / rate
+        now = time.time()
+        window_start = now - now % period
+        doc = await self.collection.find_one_and_update(
+            {"_id": f"{key}:{int(window_start)}"},
+            {
+                "$inc": {"count": 1},
+                "$setOnInsert": {"expires_at": datetime.utcnow() + timedelta(seconds=period)},
+            },
+            upsert=True,
+            return_document=True,
+        )
+        if doc["count"] <= burst:
+            return 0.0
+        return window_start + period - now
+
+
+def bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token if scheme.lower() == "bearer" and token else None
+    return None
+
+
+def client_ip(scope, trust_forwarded: bool = False) -> str:
+    if trust_forwarded:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionControl:
+    """Per-route rate limits and a global write concurrency cap.
+
+    limits maps "METHOD /route/template" to {"student": {"rate", "burst"},
+    "ip": {"rate", "burst"}, "identifier": {"rate", "burst"}}; rate is tokens
+    per second. identify maps a bearer token to its subject (or None) without
+    touching the database. write_exempt lists "METHOD /route/template" keys
+    that skip the write concurrency cap.
+    """
+
+    def __init__(
+        self,
+        buckets,
+        limits: Dict[str, dict],
+        identify: Callable[[str], Optional[str]],
+        write_concurrency: int = 0,
+        write_queue: int = 0,
+        write_queue_timeout: float = 5.0,
+        write_exempt: Iterable[str] = (),
+        trust_forwarded: bool = False,
+    ):
+        self.buckets = buckets
+        self.limits = limits
+        self.identify = identify
+        self.trust_forwarded = trust_forwarded
+        self.write_concurrency = write_concurrency
+        self.write_queue = write_queue
+        self.write_queue_timeout = write_queue_timeout
+        self.write_exempt = frozenset(write_exempt)
+        self._write_slots = asyncio.Semaphore(write_concurrency) if write_concurrency > 0 else None
+        # Writes running or queued; counted synchronously so the queue bound is exact
+        self._admitted = 0
+        self.rejected = {"rate_limited": 0, "write_queue_full": 0, "write_queue_timeout": 0}
+
+    async def rate_limit_wait(self, scope, method: str, route: str) -> float:
+        """Seconds until the request would be allowed; 0 if it is admitted now."""
+        rule = self.limits.get(f"{method} {route}")
+        if not rule:
+            return 0.0
+        wait = 0.0
+        if "student" in rule:
+            token = bearer_token(scope)
+            subject = self.identify(token) if token else None
+            if subject:
+                limit = rule["student"]
+                wait = max(wait, await self.buckets.take(f"student:{subject}:{method} {route}",
+                                                         limit["rate"], limit["burst"]))
+        if "ip" in rule:
+            limit = rule["ip"]
+            wait = max(wait, await self.buckets.take(f"ip:{client_ip(scope, self.trust_forwarded)}:{method} {route}",
+                                                     limit["rate"], limit["burst"]))
+        if wait > 0:
+            self.rejected["rate_limited"] += 1
+        return wait
+
+    async def identifier_wait(self, method: str, route: str, identifier: Optional[str]) -> float:
+        """Like rate_limit_wait, for the route's "identifier" limit (checked by the handler)."""
+        limit = self.limits.get(f"{method} {route}", {}).get("identifier")
+        if not limit or not identifier:
+            return 0.0
+        wait = await self.buckets.take(f"identifier:{identifier.lower()}:{method} {route}",
+                                       limit["rate"], limit["burst"])
+        if wait > 0:
+            self.rejected["rate_limited"] += 1
+        return wait
+
+    async def acquire_write_slot(self, method: str, route: str) -> Optional[bool]:
+        """None if no slot is needed, True once acquired, False if the request must be shed."""
+        if self._write_slots is None or method not in WRITE_METHODS or f"{method} {route}" in self.write_exempt:
+            return None
+        if self._admitted >= self.write_concurrency + self.write_queue:
+            self.rejected["write_queue_full"] += 1
+            return False
+        self._admitted += 1
+        try:
+            await asyncio.wait_for(self._write_slots.acquire(), self.write_queue_timeout)
+        except asyncio.TimeoutError:
+            self._admitted -= 1
+            self.rejected["write_queue_timeout"] += 1
+            return False
+        except BaseException:
+            self._admitted -= 1
+            raise
+        return True
+
+    def release_write_slot(self):
+        self._admitted -= 1
+        self._write_slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "write_concurrency": self.write_concurrency,
+            "write_queue": self.write_queue,
+            "writes_running": min(self._admitted, self.write_concurrency),
+            "writes_waiting": max(0, self._admitted - self.write_concurrency),
+            **self.rejected,
+        }
+
+
+def retry_after_header(wait: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(wait)))}
+
+
+async def _reject(scope, receive, send, status: int, detail: str, retry_after: float):
+    response = JSONResponse({"detail": detail}, status_code=status, headers=retry_after_header(retry_after))
+    await response(scope, receive, send)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, control: AdmissionControl, router=None):
+        self.app = app
+        self.control = control
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.router, scope)
+        wait = await self.control.rate_limit_wait(scope, method, route)
+        if wait > 0:
+            await _reject(scope, receive, send, 429, "Too many requests", wait)
+            return
+
+        slot = await self.control.acquire_write_slot(method, route)
+        if slot is False:
+            await _reject(scope, receive, send, 503, "Server busy, please retry", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if slot:
+                self.control.release_write_slot()
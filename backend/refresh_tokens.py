@@ -0,0 +1,59 @@
+"""
+Refresh-token rotation and revocation.
+
+Every refresh token is a signed JWT carrying a jti and a family id. The store
+keeps one document per jti (_id) in refresh_tokens, expired by a TTL index on
+expires_at. Renewing is a signature check plus one atomic find_one_and_update
+on _id that marks the presented token used; a token that was already used or
+revoked means it leaked, so its whole family is revoked.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+REFRESH_COLLECTION = "refresh_tokens"
+
+
+class RefreshTokenReused(Exception):
+    pass
+
+
+class RefreshTokenStore:
+    def __init__(self, db, ttl: timedelta):
+        self.collection = db[REFRESH_COLLECTION]
+        self.ttl = ttl
+
+    async def issue(self, email: str, family: Optional[str] = None) -> Tuple[str, str, datetime]:
+        """Record a new token; returns (jti, family, expires_at)."""
+        jti = str(uuid.uuid4())
+        family = family or jti
+        expires_at = datetime.utcnow() + self.ttl
+        await self.collection.insert_one({
+            "_id": jti,
+            "email": email,
+            "family": family,
+            "revoked": False,
+            "expires_at": expires_at,
+        })
+        return jti, family, expires_at
+
+    async def rotate(self, jti: str, email: str) -> Tuple[str, str, datetime]:
+        """Consume a refresh token and issue its successor in the same family."""
+        used = await self.collection.find_one_and_update(
+            {"_id": jti, "email": email, "revoked": False},
+            {"$set": {"revoked": True, "rotated_at": datetime.utcnow()}},
+            projection={"family": 1},
+        )
+        if used is None:
+            stale = await self.collection.find_one({"_id": jti}, {"family": 1})
+            if stale is not None:
+                await self.revoke_family(stale["family"])
+            raise RefreshTokenReused(jti)
+        return await self.issue(email, family=used["family"])
+
+    async def revoke_family(self, family: str):
+        await self.collection.update_many({"family": family, "revoked": False}, {"$set": {"revoked": True}})
+
+    async def revoke_user(self, email: str):
+        await self.collection.update_many({"email": email, "revoked": False}, {"$set": {"revoked": True}})
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained attendance rollups.
+
+mark_attendance bumps per-student, per-window and per-batch counters in the
+attendance_rollups collection with atomic $inc upserts, so analytics read
+O(#students) precomputed documents instead of scanning attendance_records.
+The rollups can be recomputed from the raw records while no attendance window
+is open for marking:
+
+    python rollups.py rebuild [--force]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from pymongo import InsertOne, UpdateOne
+
+from indexes import INDEXES
+
+ROLLUP_COLLECTION = "attendance_rollups"
+REBUILD_COLLECTION = "attendance_rollups_rebuild"
+REBUILD_CHUNK = 1000
+
+
+class MarkingOpen(RuntimeError):
+    pass
+
+
+def rollup_id(scope: str, key: str) -> str:
+    return f"{scope}:{key}"
+
+
+async def record_mark(db, record: dict):
+    """Count one accepted attendance record in every rollup it belongs to."""
+    marked_at = record["marked_at"]
+    updates = []
+    for scope, key in (
+        ("student", record["student_id"]),
+        ("window", record["attendance_window_id"]),
+        ("batch", record["batch_id"]),
+    ):
+        updates.append(UpdateOne(
+            {"_id": rollup_id(scope, key)},
+            {
+                "$inc": {"attended": 1},
+                "$max": {"last_marked_at": marked_at},
+                "$setOnInsert": {"scope": scope, "key": key, "batch_id": record["batch_id"]},
+            },
+            upsert=True,
+        ))
+    await db[ROLLUP_COLLECTION].bulk_write(updates, ordered=False)
+
+
+def _percentage(attended: int, total: int) -> float:
+    return round(100.0 * attended / total, 2) if total else 0.0
+
+
+async def windows_held(db, batch_id: str) -> int:
+    return await db.attendance_windows.count_documents({
+        "batch_id": batch_id,
+        "start_time": {"$lte": datetime.utcnow()},
+    })
+
+
+async def batch_summary(db, batch_id: str) -> dict:
+    held = await windows_held(db, batch_id)
+    roster = await db.users.find(
+        {"role": "student", "batch": batch_id},
+        {"_id": 0, "id": 1, "email": 1, "full_name": 1},
+    ).to_list(None)
+    counters = await db[ROLLUP_COLLECTION].find(
+        {"scope": "student", "batch_id": batch_id},
+        {"_id": 0, "key": 1, "attended": 1},
+    ).to_list(None)
+    attended_by_student = {c["key"]: c["attended"] for c in counters}
+
+    students = []
+    for student in roster:
+        attended = attended_by_student.get(student["id"], 0)
+        students.append({
+            "student_id": student["id"],
+            "email": student["email"],
+            "full_name": student["full_name"],
+            "attended": attended,
+            "percentage": _percentage(attended, held),
+        })
+
+    total_marks = sum(s["attended"] for s in students)
+    return {
+        "batch_id": batch_id,
+        "windows_held": held,
+        "total_marks": total_marks,
+        "average_percentage": _percentage(total_marks, held * len(students)),
+        "students": students,
+    }
+
+
+async def window_summary(db, window: dict) -> dict:
+    counter = await db[ROLLUP_COLLECTION].find_one({"_id": rollup_id("window", window["id"])})
+    attended = counter["attended"] if counter else 0
+    roster_size = await db.users.count_documents({"role": "student", "batch": window["batch_id"]})
+    return {
+        "window_id": window["id"],
+        "batch_id": window["batch_id"],
+        "hall_id": window["hall_id"],
+        "attended": attended,
+        "roster_size": roster_size,
+        "percentage": _percentage(attended, roster_size),
+    }
+
+
+async def student_summary(db, student: dict) -> dict:
+    counter = await db[ROLLUP_COLLECTION].find_one({"_id": rollup_id("student", student["id"])})
+    attended = counter["attended"] if counter else 0
+    held = await windows_held(db, student["batch"]) if student.get("batch") else 0
+    return {
+        "student_id": student["id"],
+        "batch_id": student.get("batch"),
+        "attended": attended,
+        "windows_held": held,
+        "percentage": _percentage(attended, held),
+        "last_marked_at": counter.get("last_marked_at") if counter else None,
+    }
+
+
+async def open_windows(db, now: Optional[datetime] = None) -> int:
+    """Attendance windows students can mark right now."""
+    now = now or datetime.utcnow()
+    return await db.attendance_windows.count_documents({
+        "is_active": True,
+        "start_time": {"$lte": now},
+        "end_time": {"$gte": now},
+    })
+
+
+async def rebuild_rollups(db, source=None, force: bool = False) -> dict:
+    """Recompute every rollup from the attendance records (source).
+
+    The counters are built in a scratch collection that replaces the live one
+    with a single renameCollection, so readers never see a half-built set and
+    stale counters go with the old collection. A mark accepted during the
+    rebuild increments the old collection and is lost unless the scan already
+    saw its record, so the rebuild raises MarkingOpen while any attendance
+    window is open; force skips that check.
+    """
+    source = source if source is not None else db.attendance_records
+    if not force:
+        count = await open_windows(db)
+        if count:
+            raise MarkingOpen(f"{count} attendance windows are open for marking; rebuild once they close")
+
+    rebuilt_at = datetime.utcnow()
+    scratch = db[REBUILD_COLLECTION]
+    await scratch.drop()
+    await scratch.create_indexes(INDEXES[ROLLUP_COLLECTION])
+    counts = {}
+    for scope, field in (("student", "$student_id"), ("window", "$attendance_window_id"), ("batch", "$batch_id")):
+        pipeline = [{"$group": {
+            "_id": field,
+            "batch_id": {"$first": "$batch_id"},
+            "attended": {"$sum": 1},
+            "last_marked_at": {"$max": "$marked_at"},
+        }}]
+        writes = []
+        counts[scope] = 0
+        async for group in source.aggregate(pipeline, allowDiskUse=True):
+            writes.append(InsertOne({
+                "_id": rollup_id(scope, group["_id"]),
+                "scope": scope,
+                "key": group["_id"],
+                "batch_id": group["batch_id"],
+                "attended": group["attended"],
+                "last_marked_at": group["last_marked_at"],
+                "rebuilt_at": rebuilt_at,
+            }))
+            if len(writes) >= REBUILD_CHUNK:
+                await scratch.bulk_write(writes, ordered=False)
+                counts[scope] += len(writes)
+                writes = []
+        if writes:
+            await scratch.bulk_write(writes, ordered=False)
+            counts[scope] += len(writes)
+
+    await scratch.rename(ROLLUP_COLLECTION, dropTarget=True)
+    return counts
+
+
+async def main(force: bool = False):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from attendance_buckets import attendance_source
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    started = time.perf_counter()
+    try:
+        counts = await rebuild_rollups(db, attendance_source(db), force=force)
+    except MarkingOpen as exc:
+        print(f"⚠️  {exc} (or pass --force)")
+        return
+    finally:
+        client.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Rebuilt rollups in {elapsed:.2f}s: "
+          f"{counts['student']} students, {counts['window']} windows, {counts['batch']} batches")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain AttendanceSync attendance rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild even while windows are open (marks made meanwhile may be missed)")
+    args = parser.parse_args()
+    asyncio.run(main(args.force))
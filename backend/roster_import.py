@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Bulk roster import for AttendanceSync.
+
+Reads a CSV of users (email, full_name, password, role, batch, department),
+hashes passwords through a PasswordHasher pool, writes users with unordered
+insert_many and keeps Batch.students in sync. Duplicate emails and invalid
+rows are reported per row instead of aborting the import.
+
+Usage:
+    python roster_import.py roster.csv [--workers 8]
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from email_validator import EmailNotValidError, validate_email
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from password_hashing import PasswordHasher
+
+ALLOWED_DOMAIN = "@iiitdm.ac.in"
+ROLES = ("student", "faculty")
+INSERT_CHUNK = 1000
+DUPLICATE_KEY_ERROR = 11000
+
+
+def normalize_email(email: str) -> str:
+    """Canonical form users are stored and looked up under; the unique email index is case-sensitive."""
+    return email.strip().lower()
+
+
+def parse_roster(text: str) -> Tuple[List[dict], List[dict]]:
+    """Validate CSV rows; returns (valid rows, per-row errors). Row numbers are 1-based data rows."""
+    rows, errors, seen = [], [], set()
+    for number, raw in enumerate(csv.DictReader(io.StringIO(text)), start=1):
+        row = {key.strip().lower(): (value or "").strip() for key, value in raw.items() if key}
+        email = normalize_email(row.get("email", ""))
+        role = row.get("role") or "student"
+
+        error = None
+        if not email or not row.get("full_name") or not row.get("password"):
+            error = "email, full_name and password are required"
+        elif not email.endswith(ALLOWED_DOMAIN):
+            error = "Only @iiitdm.ac.in email addresses are allowed"
+        elif role not in ROLES:
+            error = f"role must be one of {', '.join(ROLES)}"
+        elif email in seen:
+            error = "Duplicate email in file"
+        else:
+            try:
+                validate_email(email, check_deliverability=False)
+            except EmailNotValidError as exc:
+                error = str(exc)
+
+        if error:
+            errors.append({"row": number, "email": email, "error": error})
+            continue
+        seen.add(email)
+        rows.append({
+            "row": number,
+            "email": email,
+            "full_name": row["full_name"],
+            "password": row["password"],
+            "role": role,
+            "batch": row.get("batch") or None,
+            "department": row.get("department") or None,
+        })
+    return rows, errors
+
+
+async def import_roster(db, rows: List[dict], hasher: PasswordHasher) -> dict:
+    started = time.perf_counter()
+    duplicates = []
+
+    # One $in query per chunk instead of a find_one per user
+    existing = set()
+    emails = [row["email"] for row in rows]
+    for i in range(0, len(emails), INSERT_CHUNK):
+        async for user in db.users.find({"email": {"$in": emails[i:i + INSERT_CHUNK]}}, {"_id": 0, "email": 1}):
+            existing.add(user["email"])
+    for row in rows:
+        if row["email"] in existing:
+            duplicates.append({"row": row["row"], "email": row["email"], "error": "Email already registered"})
+    rows = [row for row in rows if row["email"] not in existing]
+
+    hashes = await hasher.hash_many([row["password"] for row in rows])
+    now = datetime.utcnow()
+    docs = [{
+        "id": str(uuid.uuid4()),
+        "email": row["email"],
+        "role": row["role"],
+        "full_name": row["full_name"],
+        "batch": row["batch"] if row["role"] == "student" else None,
+        "department": row["department"],
+        "is_active": True,
+        "created_at": now,
+        "hashed_password": hashed,
+    } for row, hashed in zip(rows, hashes)]
+
+    inserted = []
+    for i in range(0, len(docs), INSERT_CHUNK):
+        chunk = docs[i:i + INSERT_CHUNK]
+        failed = {}
+        try:
+            await db.users.insert_many(chunk, ordered=False)
+        except BulkWriteError as exc:
+            failed = {error["index"]: error for error in exc.details.get("writeErrors", [])}
+        for index, doc in enumerate(chunk):
+            error = failed.get(index)
+            if error is None:
+                inserted.append(doc)
+                continue
+            row = rows[i + index]
+            message = "Email already registered" if error.get("code") == DUPLICATE_KEY_ERROR else error.get("errmsg")
+            duplicates.append({"row": row["row"], "email": row["email"], "error": message})
+
+    members = {}
+    for doc in inserted:
+        if doc["role"] == "student" and doc["batch"]:
+            members.setdefault(doc["batch"], []).append(doc["id"])
+    missing_batches = []
+    if members:
+        updates = [UpdateOne({"id": batch_id}, {"$addToSet": {"students": {"$each": ids}}})
+                   for batch_id, ids in members.items()]
+        await db.batches.bulk_write(updates, ordered=False)
+        found = await db.batches.distinct("id", {"id": {"$in": list(members)}})
+        missing_batches = sorted(set(members) - set(found))
+
+    return {
+        "inserted": len(inserted),
+        "rejected": sorted(duplicates, key=lambda d: d["row"]),
+        "batches_updated": len(members) - len(missing_batches),
+        "unknown_batches": missing_batches,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def main(path: str, workers: Optional[int]):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    rows, errors = parse_roster(Path(path).read_text(encoding="utf-8-sig"))
+    hasher = PasswordHasher(executor="process", workers=workers or os.cpu_count() or 1)
+    try:
+        report = await import_roster(db, rows, hasher)
+    finally:
+        hasher.shutdown()
+        client.close()
+
+    print(f"✅ Imported {report['inserted']} users in {report['elapsed_seconds']}s "
+          f"({report['batches_updated']} batches updated)")
+    for problem in sorted(errors + report["rejected"], key=lambda d: d["row"]):
+        print(f"❌ row {problem['row']} {problem['email']}: {problem['error']}")
+    for batch_id in report["unknown_batches"]:
+        print(f"⚠️  unknown batch {batch_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import users from a CSV roster")
+    parser.add_argument("path", help="CSV with email, full_name, password, role, batch, department columns")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: CPU count)")
+    args = parser.parse_args()
+    asyncio.run(main(args.path, args.workers))
@@ -1,261 +1,363 @@
 #!/usr/bin/env python3
 """
-Seed script to populate IIITDM AttendanceSync database with sample data
+Seed script to populate IIITDM AttendanceSync database with sample data.
+
+By default it creates a small demo institution (the test accounts printed at
+the end). Every dimension is a parameter, so the same script generates
+capacity-planning datasets: batches, students per batch, halls, a weekly
+timetable materialized into a semester of attendance windows, and marks
+drawn from per-student attendance rates. All users share one precomputed
+password hash and every collection is written with large unordered
+insert_many chunks, several in flight at once.
+
+Usage:
+    python seed_data.py                                   # demo data
+    python seed_data.py --batches 200 --students-per-batch 50 \\
+        --halls 60 --weeks 52 --slots-per-week 10         # ~10k students, one year
 """
 
+import argparse
 import asyncio
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
-from pathlib import Path
+import time
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from dotenv import load_dotenv
+
+from attendance_buckets import attendance_source, bucket_doc, bucket_id
+from indexes import ensure_indexes
+from password_hashing import hash_password
+from rollups import rebuild_rollups
+from timetable import TIMETABLE_COLLECTION, occurrences
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Database connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Everything the generator owns; dropped before seeding
+SEEDED_COLLECTIONS = (
+    "users", "batches", "halls", TIMETABLE_COLLECTION, "attendance_windows", "attendance_records",
+    "attendance_buckets", "attendance_rollups", "attendance_summaries", "resource_versions",
+    "face_embeddings", "refresh_tokens", "idempotency_keys",
+)
+
+FACULTY = [
+    ("dr.sharma@iiitdm.ac.in", "Dr. Rajesh Sharma", "Computer Science"),
+    ("prof.kumar@iiitdm.ac.in", "Prof. Anita Kumar", "Electronics"),
+]
+DEPARTMENTS = ("Computer Science", "Electronics", "Mechanical", "Design")
+FIRST_NAMES = ("Arjun", "Priya", "Vikram", "Ananya", "Rohan", "Kavya", "Aditya", "Meera",
+               "Karthik", "Divya", "Rahul", "Sneha", "Nikhil", "Pooja", "Siddharth", "Lakshmi")
+LAST_NAMES = ("Patel", "Sharma", "Singh", "Reddy", "Iyer", "Nair", "Gupta", "Rao",
+              "Menon", "Das", "Joshi", "Kulkarni", "Pillai", "Verma", "Bose")
+
+# Local time of the first period; periods are slot_minutes long with a 10 minute break
+DAY_START_MINUTES = 9 * 60
+BREAK_MINUTES = 10
+# Students mark within this many seconds of a window opening
+MARK_SPREAD_SECONDS = 600
+
+
+class ChunkWriter:
+    """Unordered insert_many in fixed-size chunks with a bounded number in flight."""
+
+    def __init__(self, collection, name: str, chunk_size: int, concurrency: int):
+        self.collection = collection
+        self.name = name
+        self.chunk_size = chunk_size
+        self.written = 0
+        self._pending = []
+        self._tasks = []
+        self._slots = asyncio.Semaphore(concurrency)
+        self._started = time.perf_counter()
+
+    async def add_many(self, docs: list):
+        self._pending.extend(docs)
+        while len(self._pending) >= self.chunk_size:
+            chunk = self._pending[:self.chunk_size]
+            del self._pending[:self.chunk_size]
+            await self._flush(chunk)
+
+    async def _flush(self, chunk: list):
+        await self._slots.acquire()
+        self._tasks.append(asyncio.ensure_future(self._insert(chunk)))
+
+    async def _insert(self, chunk: list):
+        try:
+            await self.collection.insert_many(chunk, ordered=False)
+        finally:
+            self._slots.release()
+        self.written += len(chunk)
+        print(f"\r   {self.name}: {self.written:,} docs ({self.rate():,.0f} docs/s)", end="", flush=True)
+
+    def rate(self) -> float:
+        return self.written / max(time.perf_counter() - self._started, 1e-9)
+
+    async def close(self) -> int:
+        if self._pending:
+            chunk, self._pending = self._pending, []
+            await self._flush(chunk)
+        await asyncio.gather(*self._tasks)
+        elapsed = time.perf_counter() - self._started
+        print(f"\r✅ {self.name}: {self.written:,} docs in {elapsed:.1f}s ({self.rate():,.0f} docs/s)".ljust(79))
+        return self.written
+
+
+def batch_key(i: int) -> tuple:
+    if i < 26:
+        letter = chr(ord("a") + i)
+        return f"batch-{letter}", f"Batch {letter.upper()}", f"B{letter.upper()}2025"
+    return f"batch-{i + 1}", f"Batch {i + 1}", f"B{i + 1:03d}2025"
+
+
+def student_name(n: int) -> str:
+    return f"{FIRST_NAMES[n % len(FIRST_NAMES)]} {LAST_NAMES[(n + n // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+
+
+def clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def generate_timetable(batches: list, halls: list, faculty: list, slots_per_week: int, slot_minutes: int, now: datetime) -> list:
+    """slots_per_week periods per batch, spread Monday to Friday; halls rotate across batches."""
+    entries = []
+    for b, batch in enumerate(batches):
+        for slot in range(slots_per_week):
+            period = slot // 5
+            start = DAY_START_MINUTES + period * (slot_minutes + BREAK_MINUTES)
+            entries.append({
+                "id": f"slot-{batch['id']}-{slot + 1}",
+                "batch_id": batch["id"],
+                "hall_id": halls[(b + period) % len(halls)]["id"],
+                "weekday": slot % 5,
+                "start": clock(start),
+                "end": clock(start + slot_minutes),
+                "is_active": True,
+                "created_by": faculty[b % len(faculty)]["id"],
+                "created_at": now,
+            })
+    return entries
+
+
+def window_marks(window: dict, students: list, rates: np.ndarray, rng: np.random.Generator, now: datetime) -> list:
+    """Records for the students of one window who showed up before now."""
+    present = np.flatnonzero(rng.random(len(students)) < rates)
+    offsets = rng.integers(0, MARK_SPREAD_SECONDS, len(present)).tolist()
+    rssi = rng.normal(-60, 8, len(present)).round().astype(int).tolist()
+    confidence = rng.uniform(0.8, 0.99, len(present)).round(3).tolist()
+    start = window["start_time"]
+    records = []
+    for k, i in enumerate(present.tolist()):
+        marked_at = start + timedelta(seconds=offsets[k])
+        if marked_at > now:
+            continue
+        records.append({
+            "id": f"record-{window['id']}-{i}",
+            "student_id": students[i],
+            "hall_id": window["hall_id"],
+            "batch_id": window["batch_id"],
+            "attendance_window_id": window["id"],
+            "marked_at": marked_at,
+            "verification_method": "face_recognition",
+            "beacon_rssi": rssi[k],
+            "face_confidence": confidence[k],
+        })
+    return records
+
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+async def seed_database(args):
+    """Seed the database with a generated institution"""
+    from storage import open_storage
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+    client, db = open_storage()
+    rng = np.random.default_rng(args.seed)
+    tz = ZoneInfo(os.environ.get('TIMETABLE_TZ', 'Asia/Kolkata'))
+    storage = args.storage or os.environ.get('ATTENDANCE_STORAGE', 'records')
+    buckets_per_window = int(os.environ.get('ATTENDANCE_BUCKETS_PER_WINDOW', '4'))
+    write = lambda name: ChunkWriter(db[name], name, args.chunk_size, args.concurrency)
+    started = time.perf_counter()
+    now = datetime.utcnow()
 
-async def seed_database():
-    """Seed the database with sample data"""
-    
     print("🌱 Seeding IIITDM AttendanceSync database...")
-    
-    # Clear existing data
-    await db.users.delete_many({})
-    await db.batches.delete_many({})
-    await db.halls.delete_many({})
-    await db.attendance_windows.delete_many({})
-    await db.attendance_records.delete_many({})
+
+    # Clear existing data; indexes are rebuilt after the bulk load
+    for name in SEEDED_COLLECTIONS:
+        await db[name].drop()
     print("✅ Cleared existing data")
-    
-    # Create batches
-    batches = [
-        {
-            "id": "batch-a",
-            "name": "Batch A",
-            "code": "BA2025",
-            "students": [],
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": "batch-b",
-            "name": "Batch B",
-            "code": "BB2025",
-            "students": [],
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": "batch-c",
-            "name": "Batch C",
-            "code": "BC2025",
-            "students": [],
-            "created_at": datetime.utcnow()
-        }
-    ]
-    
-    await db.batches.insert_many(batches)
-    print("✅ Created batches")
-    
-    # Create halls
-    halls = [
-        {
-            "id": "hall-101",
-            "name": "Hall 101",
-            "code": "H101",
-            "mac_address": "AA:BB:CC:DD:EE:01",
-            "beacon_major": 101,
-            "beacon_minor": 1,
-            "capacity": 60,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": "hall-102",
-            "name": "Hall 102",
-            "code": "H102",
-            "mac_address": "AA:BB:CC:DD:EE:02",
-            "beacon_major": 102,
-            "beacon_minor": 1,
-            "capacity": 80,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": "hall-103",
-            "name": "Hall 103",
-            "code": "H103",
-            "mac_address": "AA:BB:CC:DD:EE:03",
-            "beacon_major": 103,
-            "beacon_minor": 1,
-            "capacity": 100,
-            "created_at": datetime.utcnow()
-        }
-    ]
-    
-    await db.halls.insert_many(halls)
-    print("✅ Created halls")
-    
-    # Create faculty users
-    faculty_users = [
-        {
-            "id": "faculty-1",
-            "email": "dr.sharma@iiitdm.ac.in",
-            "hashed_password": get_password_hash("password123"),
-            "role": "faculty",
-            "full_name": "Dr. Rajesh Sharma",
-            "department": "Computer Science",
-            "batch": None,
-            "is_active": True,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": "faculty-2",
-            "email": "prof.kumar@iiitdm.ac.in",
-            "hashed_password": get_password_hash("password123"),
+
+    # One bcrypt hash shared by every account
+    hashed_password = hash_password(args.password)
+
+    halls = [{
+        "id": f"hall-{101 + i}",
+        "name": f"Hall {101 + i}",
+        "code": f"H{101 + i}",
+        "mac_address": "AA:BB:" + ":".join(f"{byte:02X}" for byte in (i + 1).to_bytes(4, "big")),
+        "beacon_major": 101 + i,
+        "beacon_minor": 1,
+        "capacity": max(60, args.students_per_batch),
+        "created_at": now,
+    } for i in range(args.halls)]
+    writer = write("halls")
+    await writer.add_many(halls)
+    await writer.close()
+
+    faculty = []
+    for i in range(args.faculty):
+        email, full_name, department = FACULTY[i] if i < len(FACULTY) else (
+            f"faculty{i + 1}@iiitdm.ac.in", f"Faculty {i + 1}", DEPARTMENTS[i % len(DEPARTMENTS)]
+        )
+        faculty.append({
+            "id": f"faculty-{i + 1}",
+            "email": email,
+            "hashed_password": hashed_password,
             "role": "faculty",
-            "full_name": "Prof. Anita Kumar",
-            "department": "Electronics",
+            "full_name": full_name,
+            "department": department,
             "batch": None,
             "is_active": True,
-            "created_at": datetime.utcnow()
-        }
-    ]
-    
-    await db.users.insert_many(faculty_users)
-    print("✅ Created faculty users")
-    
-    # Create student users
-    student_users = [
-        {
-            "id": "student-1",
-            "email": "cs23i1001@iiitdm.ac.in",
-            "hashed_password": get_password_hash("password123"),
-            "role": "student",
-            "full_name": "Arjun Patel",
-            "department": None,
-            "batch": "batch-a",
-            "is_active": True,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": "student-2",
-            "email": "cs23i1002@iiitdm.ac.in",
-            "hashed_password": get_password_hash("password123"),
-            "role": "student",
-            "full_name": "Priya Sharma",
-            "department": None,
-            "batch": "batch-a",
-            "is_active": True,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": "student-3",
-            "email": "cs23i1003@iiitdm.ac.in",
-            "hashed_password": get_password_hash("password123"),
-            "role": "student",
-            "full_name": "Vikram Singh",
-            "department": None,
-            "batch": "batch-b",
-            "is_active": True,
-            "created_at": datetime.utcnow()
-        },
-        {
-            "id": "student-4",
-            "email": "cs23i1004@iiitdm.ac.in",
-            "hashed_password": get_password_hash("password123"),
-            "role": "student",
-            "full_name": "Ananya Reddy",
-            "department": None,
-            "batch": "batch-b",
-            "is_active": True,
-            "created_at": datetime.utcnow()
-        }
-    ]
-    
-    await db.users.insert_many(student_users)
-    print("✅ Created student users")
-    
-    # Create attendance windows
-    now = datetime.utcnow()
-    attendance_windows = [
-        {
-            "id": "window-1",
-            "hall_id": "hall-101",
-            "batch_id": "batch-a",
-            "start_time": now - timedelta(hours=1),
-            "end_time": now + timedelta(hours=2),
-            "is_active": True,
-            "created_by": "faculty-1",
-            "created_at": now
-        },
-        {
-            "id": "window-2",
-            "hall_id": "hall-102",
-            "batch_id": "batch-b",
+            "created_at": now,
+        })
+
+    batches, rosters, users = [], {}, write("users")
+    await users.add_many(faculty)
+    for b in range(args.batches):
+        batch_id, name, code = batch_key(b)
+        students = []
+        for k in range(args.students_per_batch):
+            n = b * args.students_per_batch + k
+            students.append({
+                "id": f"student-{n + 1}",
+                "email": f"cs23i{1001 + n}@iiitdm.ac.in",
+                "hashed_password": hashed_password,
+                "role": "student",
+                "full_name": student_name(n),
+                "department": None,
+                "batch": batch_id,
+                "is_active": True,
+                "created_at": now,
+            })
+        await users.add_many(students)
+        rosters[batch_id] = [s["id"] for s in students]
+        batches.append({"id": batch_id, "name": name, "code": code, "students": rosters[batch_id], "created_at": now})
+    await users.close()
+    writer = write("batches")
+    await writer.add_many(batches)
+    await writer.close()
+
+    # Per-student attendance rates around the mean; a few habitual absentees
+    rates = {
+        batch_id: np.clip(rng.beta(args.attendance_rate * 8, (1 - args.attendance_rate) * 8, len(ids)), 0, 1)
+        for batch_id, ids in rosters.items()
+    } if 0 < args.attendance_rate < 1 else {
+        batch_id: np.full(len(ids), args.attendance_rate) for batch_id, ids in rosters.items()
+    }
+
+    entries = generate_timetable(batches, halls, faculty, args.slots_per_week, args.slot_minutes, now)
+    writer = write(TIMETABLE_COLLECTION)
+    await writer.add_many(entries)
+    await writer.close()
+
+    # A semester of timetabled windows up to the scheduler's horizon, plus one live window per batch
+    semester_start = now - timedelta(weeks=args.weeks)
+    horizon = now + timedelta(hours=float(os.environ.get('TIMETABLE_HORIZON_HOURS', '48')))
+    windows = [window for entry in entries for window in occurrences(entry, semester_start, horizon, tz)]
+    if args.live_windows:
+        windows += [{
+            "id": f"window-live-{batch['id']}",
+            "hall_id": halls[b % len(halls)]["id"],
+            "batch_id": batch["id"],
             "start_time": now - timedelta(minutes=30),
-            "end_time": now + timedelta(hours=1),
+            "end_time": now + timedelta(minutes=90),
             "is_active": True,
-            "created_by": "faculty-2",
-            "created_at": now
-        }
-    ]
-    
-    await db.attendance_windows.insert_many(attendance_windows)
-    print("✅ Created attendance windows")
-    
-    # Create sample attendance records
-    attendance_records = [
-        {
-            "id": "record-1",
-            "student_id": "student-1",
-            "hall_id": "hall-101",
-            "batch_id": "batch-a",
-            "attendance_window_id": "window-1",
-            "marked_at": now - timedelta(minutes=45),
-            "verification_method": "face_recognition",
-            "beacon_rssi": -42,
-            "face_confidence": 0.97
-        },
-        {
-            "id": "record-2",
-            "student_id": "student-2",
-            "hall_id": "hall-101",
-            "batch_id": "batch-a",
-            "attendance_window_id": "window-1",
-            "marked_at": now - timedelta(minutes=40),
-            "verification_method": "face_recognition",
-            "beacon_rssi": -38,
-            "face_confidence": 0.95
-        }
-    ]
-    
-    await db.attendance_records.insert_many(attendance_records)
-    print("✅ Created attendance records")
-    
-    print("\n🎉 Database seeding completed successfully!")
-    print("\n📋 Test Accounts Created:")
+            "created_by": faculty[b % len(faculty)]["id"],
+        } for b, batch in enumerate(batches)]
+    windows.sort(key=lambda window: window["start_time"])
+    for window in windows:
+        window["created_at"] = min(window["start_time"], now)
+        if window["end_time"] < now:
+            window["is_active"] = False
+            window["closed_at"] = window["end_time"]
+
+    window_writer = write("attendance_windows")
+    mark_writer = write("attendance_buckets" if storage == "buckets" else "attendance_records")
+    marks = 0
+    for window in windows:
+        if window["start_time"] < now:
+            records = window_marks(window, rosters[window["batch_id"]], rates[window["batch_id"]], rng, now)
+            marks += len(records)
+            if storage == "buckets" and records:
+                by_bucket = {}
+                for record in records:
+                    by_bucket.setdefault(bucket_id(window["id"], record["student_id"], buckets_per_window), []).append(record)
+                await mark_writer.add_many([
+                    {"_id": _id, **bucket_doc(window["id"], bucket_marks)} for _id, bucket_marks in by_bucket.items()
+                ])
+            else:
+                await mark_writer.add_many(records)
+        await window_writer.add_many([window])
+    await window_writer.close()
+    await mark_writer.close()
+
+    index_started = time.perf_counter()
+    await ensure_indexes(db)
+    print(f"✅ Ensured indexes in {time.perf_counter() - index_started:.1f}s")
+
+    if not args.skip_rollups:
+        rollup_started = time.perf_counter()
+        # The demo data includes a window open right now, but nothing is marking yet
+        await rebuild_rollups(db, attendance_source(db, storage, buckets_per_window), force=True)
+        print(f"✅ Rebuilt rollups in {time.perf_counter() - rollup_started:.1f}s")
+
+    client.close()
+    elapsed = time.perf_counter() - started
+    print(f"\n🎉 Seeded {len(faculty) + sum(map(len, rosters.values())):,} users, {len(windows):,} windows and "
+          f"{marks:,} marks in {elapsed:.1f}s")
+    print(f"\n📋 Test Accounts (password: {args.password}):")
     print("👨‍🏫 Faculty Accounts:")
-    print("   📧 dr.sharma@iiitdm.ac.in / password123")
-    print("   📧 prof.kumar@iiitdm.ac.in / password123")
+    for user in faculty[:3]:
+        print(f"   📧 {user['email']}")
     print("\n👨‍🎓 Student Accounts:")
-    print("   📧 cs23i1001@iiitdm.ac.in / password123 (Batch A)")
-    print("   📧 cs23i1002@iiitdm.ac.in / password123 (Batch A)")
-    print("   📧 cs23i1003@iiitdm.ac.in / password123 (Batch B)")
-    print("   📧 cs23i1004@iiitdm.ac.in / password123 (Batch B)")
+    for batch in batches[:2]:
+        for student_id in rosters[batch["id"]][:2]:
+            print(f"   📧 cs23i{1000 + int(student_id.split('-')[1])}@iiitdm.ac.in ({batch['name']})")
     print("\n🏢 Halls Created:")
-    print("   🏛️ Hall 101 (MAC: AA:BB:CC:DD:EE:01)")
-    print("   🏛️ Hall 102 (MAC: AA:BB:CC:DD:EE:02)")
-    print("   🏛️ Hall 103 (MAC: AA:BB:CC:DD:EE:03)")
+    for hall in halls[:3]:
+        print(f"   🏛️ {hall['name']} (MAC: {hall['mac_address']})")
+    if len(halls) > 3:
+        print(f"   ... and {len(halls) - 3} more")
     print("\n✅ Ready to test the application!")
 
+
 if __name__ == "__main__":
-    asyncio.run(seed_database())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate an AttendanceSync institution")
+    parser.add_argument("--batches", type=int, default=3)
+    parser.add_argument("--students-per-batch", type=int, default=2)
+    parser.add_argument("--halls", type=int, default=3)
+    parser.add_argument("--faculty", type=int, default=2)
+    parser.add_argument("--weeks", type=float, default=1, help="weeks of past timetabled windows")
+    parser.add_argument("--slots-per-week", type=int, default=5, help="timetable periods per batch per week")
+    parser.add_argument("--slot-minutes", type=int, default=50)
+    parser.add_argument("--attendance-rate", type=float, default=0.85, help="mean share of classes attended")
+    parser.add_argument("--no-live-windows", dest="live_windows", action="store_false",
+                        help="skip the window per batch that is open right now")
+    parser.add_argument("--storage", choices=["records", "buckets"], default=None,
+                        help="attendance layout (default: ATTENDANCE_STORAGE or records)")
+    parser.add_argument("--skip-rollups", action="store_true", help="do not rebuild analytics rollups")
+    parser.add_argument("--password", default="password123", help="password of every generated account")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="documents per insert_many")
+    parser.add_argument("--concurrency", type=int, default=4, help="insert_many calls in flight")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    args = parser.parse_args()
+
+    periods = -(-args.slots_per_week // 5)
+    if not 0 <= args.attendance_rate <= 1:
+        parser.error("--attendance-rate must be between 0 and 1")
+    if args.faculty < 1 or args.batches < 1 or args.students_per_batch < 0 or args.halls < 1:
+        parser.error("need at least one faculty member, batch and hall")
+    if DAY_START_MINUTES + periods * (args.slot_minutes + BREAK_MINUTES) - BREAK_MINUTES > 24 * 60 - 1:
+        parser.error("--slots-per-week does not fit in a day at this --slot-minutes")
+    asyncio.run(seed_database(args))
@@ -1,36 +1,244 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, Header, Query, Response, UploadFile, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import json
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
+from pymongo.errors import DuplicateKeyError
 from typing import List, Optional
+import time
 import uuid
 from datetime import datetime, timedelta
 import jwt
-from passlib.context import CryptContext
+
+from attendance_buckets import attendance_source
+from beacon_presence import PRESENCE_COLLECTION, HallBeaconMap, PresenceTracker
+from exporter import MEDIA_TYPES, AttendanceExport, export_query, parquet_available
+from face_matching import EmbeddingError, FaceMatcher
+from finalization import SUMMARY_COLLECTION, WindowFinalizer
+from idempotency import MAX_KEY_LENGTH, IdempotencyConflict, IdempotencyStore
+from indexes import ensure_indexes, has_unique_index, verify_query_plans
+from live_feed import AttendanceFeed
+from metrics import MetricsMiddleware, MetricsRegistry, MongoCommandTimer
+from pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, fetch_page, fields_projection, ndjson_rows, sorted_find
+from password_hashing import HashingPoolSaturated, PasswordHasher
+from rate_limit import AdmissionControl, AdmissionMiddleware, MemoryBuckets, MongoBuckets, retry_after_header
+from refresh_tokens import RefreshTokenReused, RefreshTokenStore
+import rollups
+from roster_import import ALLOWED_DOMAIN, import_roster, normalize_email, parse_roster
+from storage import open_storage
+from timetable import TIMETABLE_COLLECTION, TimetableScheduler
+from user_cache import PrincipalCache
+from versions import ResourceVersions
+from window_index import ActiveWindowIndex
+from write_buffer import AttendanceWriteBuffer
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Request and Mongo command metrics, exposed at /metrics
+metrics = MetricsRegistry()
+SLOW_REQUEST_MS = os.environ.get('SLOW_REQUEST_MS')
+
+# Database connection (STORAGE_BACKEND=mongo|memory); the lifespan warm-up opens MONGO_MIN_POOL_SIZE connections
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
+client, db = open_storage(
+    event_listeners=[MongoCommandTimer(metrics)],
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+)
 
 # Security
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get('REFRESH_TOKEN_EXPIRE_DAYS', '30'))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-# Create the main app without a prefix
-app = FastAPI(title="IIITDM AttendanceSync API", version="2.0")
+def token_subject(token: str) -> Optional[str]:
+    """Subject of a valid access token, checked without a database read."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    return payload.get("sub") if payload.get("type", "access") == "access" else None
+
+# bcrypt runs in a bounded worker pool so it never blocks the event loop
+password_hasher = PasswordHasher(
+    executor=os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread'),
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '4')),
+    max_queue=int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '64')),
+)
+
+# Rotating refresh tokens so renewing a session skips bcrypt
+refresh_store = RefreshTokenStore(db, ttl=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
+# Cache of authenticated user documents keyed by token subject
+user_cache = PrincipalCache(
+    max_size=int(os.environ.get('USER_CACHE_SIZE', '10000')),
+    ttl_seconds=float(os.environ.get('USER_CACHE_TTL_SECONDS', '60')),
+    enabled=os.environ.get('USER_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+)
+
+# Fields returned by read endpoints; fetched with explicit projections
+BATCH_FIELDS = ("id", "name", "code", "students", "created_at")
+HALL_FIELDS = ("id", "name", "code", "mac_address", "beacon_major", "beacon_minor", "capacity", "created_at")
+WINDOW_FIELDS = ("id", "hall_id", "batch_id", "start_time", "end_time", "is_active", "created_by", "created_at")
+RECORD_FIELDS = ("id", "student_id", "hall_id", "batch_id", "attendance_window_id", "marked_at",
+                 "verification_method", "beacon_rssi", "face_confidence")
+STUDENT_FIELDS = ("email", "full_name", "batch")
+STATUS_CHECK_FIELDS = ("id", "client_name", "timestamp")
+
+# In-memory index of live attendance windows, reloaded every TTL seconds
+window_index = ActiveWindowIndex(
+    db.attendance_windows,
+    ttl_seconds=float(os.environ.get('WINDOW_INDEX_TTL_SECONDS', '30')),
+    projection=fields_projection(WINDOW_FIELDS),
+)
+
+# Index bootstrap at startup
+ENSURE_INDEXES_ON_STARTUP = os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+VERIFY_QUERY_PLANS_ON_STARTUP = os.environ.get('VERIFY_QUERY_PLANS_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+
+# Rows fetched and encoded per chunk when exporting attendance
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '5000'))
+
+# One app-wide process pool for bulk roster imports (defaults to half the CPUs),
+# kept apart from the login hasher so an import never queues logins
+roster_hasher = PasswordHasher(
+    executor="process",
+    workers=int(os.environ.get('ROSTER_IMPORT_WORKERS') or max(1, (os.cpu_count() or 2) // 2)),
+)
+
+# Live attendance feed ("local" publishes from this worker, "change_stream" tails Mongo)
+ATTENDANCE_FEED_SOURCE = os.environ.get('ATTENDANCE_FEED_SOURCE', 'local')
+attendance_feed = AttendanceFeed(
+    max_queue=int(os.environ.get('ATTENDANCE_FEED_MAX_QUEUE', '256')),
+    heartbeat_seconds=float(os.environ.get('ATTENDANCE_FEED_HEARTBEAT_SECONDS', '15')),
+)
+
+# Attendance storage: "records" (one document per mark) or "buckets" (marks grouped per window)
+ATTENDANCE_STORAGE = os.environ.get('ATTENDANCE_STORAGE', 'records')
+attendance_records = attendance_source(db, ATTENDANCE_STORAGE)
+
+# Attendance write-behind (group commit) settings
+ATTENDANCE_WRITE_BEHIND = os.environ.get('ATTENDANCE_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+attendance_buffer = AttendanceWriteBuffer(
+    db.attendance_records,
+    flush_interval_ms=float(os.environ.get('ATTENDANCE_FLUSH_INTERVAL_MS', '5')),
+    max_batch=int(os.environ.get('ATTENDANCE_FLUSH_MAX_BATCH', '500')),
+)
+
+# Server-side face verification against enrolled embeddings
+FACE_MATCH_REQUIRED = os.environ.get('FACE_MATCH_REQUIRED', 'false').lower() in ('1', 'true', 'yes')
+face_matcher = FaceMatcher(
+    db,
+    dim=int(os.environ.get('FACE_EMBEDDING_DIM', '128')),
+    threshold=float(os.environ.get('FACE_MATCH_THRESHOLD', '0.6')),
+    ttl_seconds=float(os.environ.get('FACE_MATRIX_TTL_SECONDS', '300')),
+)
+
+# BLE proximity: (major, minor) -> hall map and per-student presence. With
+# several workers presence must be shared, or a mark handled by another worker
+# than the scan upload is rejected as out of range
+BEACON_PROXIMITY_REQUIRED = os.environ.get('BEACON_PROXIMITY_REQUIRED', 'false').lower() in ('1', 'true', 'yes')
+BEACON_MAX_SCANS = int(os.environ.get('BEACON_MAX_SCANS', '500'))
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+BEACON_PRESENCE_BACKEND = os.environ.get('BEACON_PRESENCE_BACKEND', 'mongo' if WEB_CONCURRENCY > 1 else 'memory')
+hall_beacons = HallBeaconMap(db.halls, ttl_seconds=float(os.environ.get('HALL_MAP_TTL_SECONDS', '60')))
+presence_tracker = PresenceTracker(
+    rssi_threshold=float(os.environ.get('BEACON_RSSI_THRESHOLD', '-75')),
+    min_scans=int(os.environ.get('BEACON_MIN_SCANS', '3')),
+    scan_window_seconds=float(os.environ.get('BEACON_SCAN_WINDOW_SECONDS', '30')),
+    half_life_seconds=float(os.environ.get('BEACON_HALF_LIFE_SECONDS', '10')),
+    presence_ttl_seconds=float(os.environ.get('BEACON_PRESENCE_TTL_SECONDS', '120')),
+    collection=db[PRESENCE_COLLECTION] if BEACON_PRESENCE_BACKEND == 'mongo' else None,
+)
+
+# Timetable scheduler: materializes upcoming windows and closes expired ones
+TIMETABLE_SCHEDULER_ENABLED = os.environ.get('TIMETABLE_SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+timetable_scheduler = TimetableScheduler(
+    db,
+    window_index,
+    tz=os.environ.get('TIMETABLE_TZ', 'Asia/Kolkata'),
+    horizon_hours=float(os.environ.get('TIMETABLE_HORIZON_HOURS', '48')),
+    interval_seconds=float(os.environ.get('TIMETABLE_INTERVAL_SECONDS', '60')),
+)
+
+# Window finalization: per-window present/absent summaries once a window has ended.
+# Off by default; FINALIZE_SINCE (UTC, e.g. the rollout time) is required so
+# historical windows are not judged against today's rosters. Older windows are
+# backfilled explicitly with `python finalization.py`
+FINALIZER_ENABLED = os.environ.get('FINALIZER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+FINALIZE_SINCE = datetime.fromisoformat(os.environ['FINALIZE_SINCE']) if os.environ.get('FINALIZE_SINCE') else None
+window_finalizer = WindowFinalizer(
+    db,
+    attendance_records,
+    grace_seconds=float(os.environ.get('FINALIZER_GRACE_SECONDS', '60')),
+    chunk_size=int(os.environ.get('FINALIZER_CHUNK_SIZE', '200')),
+    interval_seconds=float(os.environ.get('FINALIZER_INTERVAL_SECONDS', '60')),
+    since=FINALIZE_SINCE,
+)
+
+# Admission control: per-route token buckets (RATE_LIMITS JSON overrides the
+# defaults; rate is tokens per second) and a global write concurrency cap.
+# Logins are limited per account; the per-IP limits are loose because a whole
+# campus can sit behind one NAT address. Routes bounded by a hashing pool skip
+# the write cap, so they never hold the slots attendance marks need
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+DEFAULT_RATE_LIMITS = {
+    "POST /api/student/mark-attendance": {"student": {"rate": 0.5, "burst": 5}},
+    "POST /api/student/beacon-scans": {"student": {"rate": 1, "burst": 10}},
+    "POST /api/auth/login": {"identifier": {"rate": 0.2, "burst": 10}, "ip": {"rate": 100, "burst": 1000}},
+    "POST /api/auth/refresh": {"ip": {"rate": 100, "burst": 1000}},
+}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.environ.get('RATE_LIMITS', '{}'))}
+WRITE_CAP_EXEMPT = (
+    "POST /api/auth/register",
+    "POST /api/auth/login",
+    "POST /api/auth/refresh",
+    "POST /api/admin/users/import",
+)
+admission = AdmissionControl(
+    MongoBuckets(db) if os.environ.get('RATE_LIMIT_BACKEND', 'memory') == 'mongo' else MemoryBuckets(),
+    limits=RATE_LIMITS if RATE_LIMIT_ENABLED else {},
+    identify=token_subject,
+    write_concurrency=int(os.environ.get('WRITE_CONCURRENCY', '64')),
+    write_queue=int(os.environ.get('WRITE_QUEUE_SIZE', '256')),
+    write_queue_timeout=float(os.environ.get('WRITE_QUEUE_TIMEOUT_SECONDS', '5')),
+    write_exempt=WRITE_CAP_EXEMPT,
+    trust_forwarded=os.environ.get('TRUST_X_FORWARDED_FOR', 'false').lower() in ('1', 'true', 'yes'),
+)
+
+# Responses to retried writes carrying an Idempotency-Key
+idempotency = IdempotencyStore(
+    db,
+    ttl_seconds=float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400')),
+    lease_seconds=float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '30')),
+)
+ALREADY_MARKED = "Attendance already marked"
+
+# Whether the unique (attendance_window_id, student_id) index is in place; checked
+# at startup, and until it is known to exist marks are pre-read for duplicates
+unique_mark_index = False
+
+# Version counters behind the ETags of polled list endpoints
+versions = ResourceVersions(
+    db,
+    ttl_seconds=float(os.environ.get('VERSION_CACHE_TTL_SECONDS', '1')),
+    coalesce_seconds=float(os.environ.get('VERSION_COALESCE_SECONDS', '1')),
+)
+
+# Worker warm-up before the app reports ready (time-to-ready is in /admin/stats)
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+startup_report = {}
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -62,6 +270,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: dict
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class Batch(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -90,6 +302,17 @@ class AttendanceWindow(BaseModel):
     created_by: str  # faculty_id
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class TimetableEntry(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    batch_id: str
+    hall_id: str
+    weekday: int = Field(ge=0, le=6)  # 0 = Monday
+    start: str = Field(pattern=r"^([01]\d|2[0-3]):[0-5]\d$")  # local HH:MM in TIMETABLE_TZ
+    end: str = Field(pattern=r"^([01]\d|2[0-3]):[0-5]\d$")
+    is_active: bool = True
+    created_by: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 class AttendanceRecord(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     student_id: str
@@ -97,16 +320,52 @@ class AttendanceRecord(BaseModel):
     batch_id: str
     attendance_window_id: str
     marked_at: datetime = Field(default_factory=datetime.utcnow)
-    verification_method: str  # "face_recognition", "manual", etc.
+    verification_method: str  # "face_recognition" (server-verified), "manual", "unverified", etc.
     beacon_rssi: Optional[int] = None
     face_confidence: Optional[float] = None
 
+class BeaconScan(BaseModel):
+    major: int
+    minor: int
+    rssi: int
+    timestamp: datetime
+
+class BeaconScanBatch(BaseModel):
+    scans: List[BeaconScan]
+
+class FaceEmbedding(BaseModel):
+    embedding: List[float]
+
+class FaceMatchRequest(BaseModel):
+    probes: List[List[float]]
+
+# Stable keyset sort orders for paginated list endpoints
+BATCH_SORT = ("created_at", "id")
+HALL_SORT = ("created_at", "id")
+STUDENT_SORT = ("email",)
+RECORD_SORT = ("marked_at", "id")
+STATUS_CHECK_SORT = ("timestamp", "id")
+
 # Utility functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except HashingPoolSaturated as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    try:
+        return await password_hasher.hash(password)
+    except HashingPoolSaturated as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -118,40 +377,99 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+async def create_session_tokens(email: str, family: Optional[str] = None, jti: Optional[str] = None):
+    """Access token plus a refresh token; rotates jti when given."""
+    access_token = create_access_token(
+        data={"sub": email, "type": "access"},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    if jti is None:
+        jti, family, expires_at = await refresh_store.issue(email, family)
+    else:
+        jti, family, expires_at = await refresh_store.rotate(jti, email)
+    refresh_token = jwt.encode(
+        {"sub": email, "type": "refresh", "jti": jti, "fam": family, "exp": expires_at},
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+    return access_token, refresh_token
+
+def decode_refresh_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("type", "access") != "access":
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         token_data = {"email": email}
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
-    user = await db.users.find_one({"email": email})
+    user = user_cache.get(email)
     if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
+        user = await db.users.find_one({"email": email})
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.put(email, user)
+    if not user.get("is_active", True):
+        raise HTTPException(status_code=401, detail="User account is deactivated")
     return user
 
+def json_page(rows: list, next_cursor: Optional[str] = None):
+    # Rows are our own projected documents, so they skip response_model validation
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(rows, headers=headers)
+
+def not_modified(etag: str):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def with_etag(response, etag: str):
+    # no-cache makes browsers revalidate every poll with If-None-Match
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def ndjson_response(collection, query: dict, sort_keys, cursor: Optional[str], fields):
+    return StreamingResponse(
+        ndjson_rows(sorted_find(collection, query, sort_keys, cursor, fields_projection(fields))),
+        media_type="application/x-ndjson",
+    )
+
 async def get_current_faculty(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "faculty":
         raise HTTPException(status_code=403, detail="Faculty access required")
     return current_user
 
+async def find_user_by_email(email: str, projection: Optional[dict] = None) -> Optional[dict]:
+    user = await db.users.find_one({"email": normalize_email(email)}, projection)
+    if user is None and email != normalize_email(email):
+        # Accounts registered before emails were normalized keep their original case
+        user = await db.users.find_one({"email": email}, projection)
+    return user
+
 # Authentication endpoints
 @api_router.post("/auth/register", response_model=Token)
 async def register(user: UserCreate):
+    user.email = normalize_email(user.email)
     # Check if user already exists
     existing_user = await db.users.find_one({"email": user.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Validate email domain for IIITDM
-    if not user.email.endswith("@iiitdm.ac.in"):
+    if not user.email.endswith(ALLOWED_DOMAIN):
         raise HTTPException(status_code=400, detail="Only @iiitdm.ac.in email addresses are allowed")
     
     # Create user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_data = UserRole(
         email=user.email,
         role=user.role,
@@ -163,15 +481,14 @@ async def register(user: UserCreate):
     user_dict["hashed_password"] = hashed_password
     
     await db.users.insert_one(user_dict)
+    user_cache.invalidate(user.email)
     
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    # Create access and refresh tokens
+    access_token, refresh_token = await create_session_tokens(user.email)
     
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "user": {
             "email": user.email,
@@ -184,17 +501,51 @@ async def register(user: UserCreate):
 
 @api_router.post("/auth/login", response_model=Token)
 async def login(user: UserLogin):
-    db_user = await db.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["hashed_password"]):
+    wait = await admission.identifier_wait("POST", "/api/auth/login", user.email)
+    if wait > 0:
+        raise HTTPException(status_code=429, detail="Too many login attempts", headers=retry_after_header(wait))
+    
+    db_user = await find_user_by_email(user.email)
+    if not db_user or not await verify_password(user.password, db_user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    access_token, refresh_token = await create_session_tokens(db_user["email"])
+    
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "user": {
+            "email": db_user["email"],
+            "role": db_user["role"],
+            "full_name": db_user["full_name"],
+            "batch": db_user.get("batch"),
+            "department": db_user.get("department")
+        }
+    }
+
+@api_router.post("/auth/refresh", response_model=Token)
+async def refresh_session(request: RefreshRequest):
+    payload = decode_refresh_token(request.refresh_token)
+    email = payload["sub"]
+    
+    db_user = user_cache.get(email)
+    if db_user is None:
+        db_user = await db.users.find_one({"email": email})
+        if db_user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.put(email, db_user)
+    if not db_user.get("is_active", True):
+        raise HTTPException(status_code=401, detail="User account is deactivated")
+    
+    try:
+        access_token, refresh_token = await create_session_tokens(email, jti=payload["jti"])
+    except RefreshTokenReused:
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
     
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "user": {
             "email": db_user["email"],
@@ -205,6 +556,12 @@ async def login(user: UserLogin):
         }
     }
 
+@api_router.post("/auth/logout")
+async def logout(request: RefreshRequest):
+    payload = decode_refresh_token(request.refresh_token)
+    await refresh_store.revoke_family(payload.get("fam") or payload["jti"])
+    return {"message": "Logged out"}
+
 @api_router.get("/auth/me")
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     return {
@@ -217,66 +574,319 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 
 # Admin endpoints (Faculty only)
 @api_router.get("/admin/batches", response_model=List[Batch])
-async def get_batches(current_user: dict = Depends(get_current_faculty)):
-    batches = await db.batches.find().to_list(1000)
-    return [Batch(**batch) for batch in batches]
+async def get_batches(
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_faculty)
+):
+    etag = await versions.etag("batches", limit, cursor, stream)
+    if versions.matches(if_none_match, etag):
+        return not_modified(etag)
+    if stream:
+        return with_etag(ndjson_response(db.batches, {}, BATCH_SORT, cursor, BATCH_FIELDS), etag)
+    batches, next_cursor = await fetch_page(
+        db.batches, {}, BATCH_SORT, limit, cursor, fields_projection(BATCH_FIELDS)
+    )
+    return with_etag(json_page([{
+        "id": b["id"],
+        "name": b["name"],
+        "code": b["code"],
+        "students": b.get("students", []),
+        "created_at": b["created_at"],
+    } for b in batches], next_cursor), etag)
 
 @api_router.post("/admin/batches", response_model=Batch)
 async def create_batch(batch: Batch, current_user: dict = Depends(get_current_faculty)):
     batch_dict = batch.dict()
     await db.batches.insert_one(batch_dict)
+    await versions.bump("batches")
     return batch
 
 @api_router.get("/admin/halls", response_model=List[Hall])
-async def get_halls(current_user: dict = Depends(get_current_faculty)):
-    halls = await db.halls.find().to_list(1000)
-    return [Hall(**hall) for hall in halls]
+async def get_halls(
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_faculty)
+):
+    etag = await versions.etag("halls", limit, cursor, stream)
+    if versions.matches(if_none_match, etag):
+        return not_modified(etag)
+    if stream:
+        return with_etag(ndjson_response(db.halls, {}, HALL_SORT, cursor, HALL_FIELDS), etag)
+    halls, next_cursor = await fetch_page(db.halls, {}, HALL_SORT, limit, cursor, fields_projection(HALL_FIELDS))
+    return with_etag(json_page([{
+        "id": h["id"],
+        "name": h["name"],
+        "code": h["code"],
+        "mac_address": h["mac_address"],
+        "beacon_major": h.get("beacon_major"),
+        "beacon_minor": h.get("beacon_minor"),
+        "capacity": h["capacity"],
+        "created_at": h["created_at"],
+    } for h in halls], next_cursor), etag)
 
 @api_router.post("/admin/halls", response_model=Hall)
 async def create_hall(hall: Hall, current_user: dict = Depends(get_current_faculty)):
     hall_dict = hall.dict()
     await db.halls.insert_one(hall_dict)
+    hall_beacons.invalidate()
+    await versions.bump("halls")
     return hall
 
 @api_router.get("/admin/students")
-async def get_students_by_batch(batch_id: str, current_user: dict = Depends(get_current_faculty)):
-    students = await db.users.find({"role": "student", "batch": batch_id}).to_list(1000)
-    return [{"email": s["email"], "full_name": s["full_name"], "batch": s["batch"]} for s in students]
+async def get_students_by_batch(
+    batch_id: str,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_faculty)
+):
+    query = {"role": "student", "batch": batch_id}
+    if stream:
+        return ndjson_response(db.users, query, STUDENT_SORT, cursor, STUDENT_FIELDS)
+    students, next_cursor = await fetch_page(
+        db.users, query, STUDENT_SORT, limit, cursor, fields_projection(STUDENT_FIELDS)
+    )
+    return json_page([{"email": s["email"], "full_name": s["full_name"], "batch": s["batch"]} for s in students], next_cursor)
+
+@api_router.patch("/admin/users/{email}/status")
+async def set_user_active(email: str, is_active: bool, current_user: dict = Depends(get_current_faculty)):
+    user = await find_user_by_email(email, {"_id": 0, "email": 1})
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    email = user["email"]
+    await db.users.update_one({"email": email}, {"$set": {"is_active": is_active}})
+    user_cache.invalidate(email)
+    if not is_active:
+        await refresh_store.revoke_user(email)
+    return {"email": email, "is_active": is_active}
+
+@api_router.post("/admin/users/import")
+async def import_users(file: UploadFile = File(...), current_user: dict = Depends(get_current_faculty)):
+    try:
+        text = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Roster must be a UTF-8 CSV file")
+    
+    rows, errors = parse_roster(text)
+    report = await import_roster(db, rows, roster_hasher)
+    await versions.bump("batches")
+    report["rejected"] = sorted(errors + report["rejected"], key=lambda r: r["row"])
+    return report
+
+@api_router.get("/admin/stats")
+async def get_runtime_stats(current_user: dict = Depends(get_current_faculty)):
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "roster_hashing": roster_hasher.stats(),
+        "attendance_feed": attendance_feed.stats(),
+        "face_matching": face_matcher.stats(),
+        "beacon_presence": presence_tracker.stats(),
+        "timetable": timetable_scheduler.stats(),
+        "finalizer": window_finalizer.stats(),
+        "admission": admission.stats(),
+        "idempotency": idempotency.stats(),
+        "versions": versions.stats(),
+        "startup": startup_report,
+    }
+
+@api_router.put("/admin/students/{student_id}/face-embedding")
+async def enroll_face(student_id: str, face: FaceEmbedding, current_user: dict = Depends(get_current_faculty)):
+    student = await db.users.find_one({"id": student_id, "role": "student"}, {"_id": 0, "id": 1, "batch": 1})
+    if student is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    if not student.get("batch"):
+        raise HTTPException(status_code=400, detail="Student is not assigned to a batch")
+    try:
+        await face_matcher.enroll(student_id, student["batch"], face.embedding)
+    except EmbeddingError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"student_id": student_id, "batch_id": student["batch"], "enrolled": True}
+
+@api_router.post("/admin/batches/{batch_id}/face-match")
+async def match_faces(batch_id: str, request: FaceMatchRequest, current_user: dict = Depends(get_current_faculty)):
+    try:
+        matches = await face_matcher.match_many(batch_id, request.probes)
+    except EmbeddingError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"batch_id": batch_id, "matches": matches}
 
 @api_router.get("/admin/attendance/today")
-async def get_today_attendance(current_user: dict = Depends(get_current_faculty)):
+async def get_today_attendance(
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_faculty)
+):
     today = datetime.now().date()
+    etag = await versions.etag("attendance", today, limit, cursor, stream)
+    if versions.matches(if_none_match, etag):
+        return not_modified(etag)
     start_of_day = datetime.combine(today, datetime.min.time())
     end_of_day = datetime.combine(today, datetime.max.time())
+    query = {"marked_at": {"$gte": start_of_day, "$lte": end_of_day}}
     
-    attendance = await db.attendance_records.find({
-        "marked_at": {"$gte": start_of_day, "$lte": end_of_day}
-    }).to_list(1000)
+    if stream:
+        return with_etag(ndjson_response(attendance_records, query, RECORD_SORT, cursor, RECORD_FIELDS), etag)
+    attendance, next_cursor = await fetch_page(
+        attendance_records, query, RECORD_SORT, limit, cursor, fields_projection(RECORD_FIELDS)
+    )
+    return with_etag(json_page(attendance, next_cursor), etag)
+
+@api_router.get("/admin/attendance/export")
+async def export_attendance(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_id: Optional[str] = None,
+    hall_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_faculty)
+):
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
     
-    return attendance
+    query = export_query(start=start, end=end, batch_id=batch_id, hall_id=hall_id)
+    cursor = attendance_records.find(query, fields_projection(RECORD_FIELDS)).sort(
+        [(key, 1) for key in RECORD_SORT]
+    ).batch_size(EXPORT_CHUNK_SIZE)
+    export = AttendanceExport(cursor, fmt=format, chunk_size=EXPORT_CHUNK_SIZE)
+    filename = f"attendance-{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        export.stream(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@api_router.get("/admin/attendance/live")
+async def stream_live_attendance(
+    batch_id: Optional[str] = None,
+    window_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_faculty)
+):
+    subscription = attendance_feed.subscribe(batch_id=batch_id, window_id=window_id)
+    return StreamingResponse(
+        attendance_feed.events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @api_router.post("/admin/attendance-window")
 async def create_attendance_window(window: AttendanceWindow, current_user: dict = Depends(get_current_faculty)):
     window_dict = window.dict()
     window_dict["created_by"] = current_user["id"]
     await db.attendance_windows.insert_one(window_dict)
+    window_index.invalidate()
+    await versions.bump("windows")
     return window
 
+# Timetable endpoints (Faculty only)
+@api_router.post("/admin/timetable", response_model=TimetableEntry)
+async def create_timetable_entry(entry: TimetableEntry, current_user: dict = Depends(get_current_faculty)):
+    if entry.end <= entry.start:
+        raise HTTPException(status_code=400, detail="Slot must end after it starts")
+    entry.created_by = current_user["id"]
+    await db[TIMETABLE_COLLECTION].insert_one(entry.dict())
+    await timetable_scheduler.run_once()
+    return entry
+
+@api_router.get("/admin/timetable")
+async def get_timetable(batch_id: Optional[str] = None, current_user: dict = Depends(get_current_faculty)):
+    query = {"is_active": True}
+    if batch_id:
+        query["batch_id"] = batch_id
+    entries = await db[TIMETABLE_COLLECTION].find(query, {"_id": 0}).sort(
+        [("batch_id", 1), ("weekday", 1), ("start", 1)]
+    ).to_list(None)
+    return json_page(entries)
+
+@api_router.delete("/admin/timetable/{entry_id}")
+async def delete_timetable_entry(entry_id: str, current_user: dict = Depends(get_current_faculty)):
+    result = await db[TIMETABLE_COLLECTION].update_one({"id": entry_id, "is_active": True}, {"$set": {"is_active": False}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Timetable entry not found")
+    # Drop materialized windows that have not opened yet
+    removed = await db.attendance_windows.delete_many({"timetable_id": entry_id, "start_time": {"$gt": datetime.utcnow()}})
+    window_index.invalidate()
+    await versions.bump("windows")
+    return {"id": entry_id, "windows_removed": removed.deleted_count}
+
+@api_router.post("/admin/timetable/materialize")
+async def materialize_timetable(current_user: dict = Depends(get_current_faculty)):
+    return await timetable_scheduler.run_once()
+
+# Analytics endpoints (Faculty only)
+@api_router.get("/admin/analytics/batches/{batch_id}")
+async def get_batch_analytics(batch_id: str, current_user: dict = Depends(get_current_faculty)):
+    return await rollups.batch_summary(db, batch_id)
+
+@api_router.get("/admin/analytics/windows/{window_id}")
+async def get_window_analytics(window_id: str, current_user: dict = Depends(get_current_faculty)):
+    window = await db.attendance_windows.find_one({"id": window_id}, {"_id": 0})
+    if window is None:
+        raise HTTPException(status_code=404, detail="Attendance window not found")
+    return await rollups.window_summary(db, window)
+
+@api_router.get("/admin/analytics/windows/{window_id}/final")
+async def get_window_final_summary(window_id: str, current_user: dict = Depends(get_current_faculty)):
+    summary = await db[SUMMARY_COLLECTION].find_one({"_id": window_id}, {"_id": 0, "present": 0})
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Attendance window not finalized yet")
+    absentees = await db.users.find(
+        {"id": {"$in": summary.pop("absent")}},
+        {"_id": 0, "id": 1, "email": 1, "full_name": 1},
+    ).sort("email", 1).to_list(None)
+    summary["absentees"] = [
+        {"student_id": s["id"], "email": s["email"], "full_name": s["full_name"]} for s in absentees
+    ]
+    return summary
+
+@api_router.post("/admin/analytics/finalize")
+async def finalize_windows(current_user: dict = Depends(get_current_faculty)):
+    if window_finalizer.since is None:
+        raise HTTPException(
+            status_code=409,
+            detail="FINALIZE_SINCE is not set; backfill past windows with `python finalization.py`",
+        )
+    return await window_finalizer.run_once()
+
+@api_router.get("/admin/analytics/students/{student_id}")
+async def get_student_analytics(student_id: str, current_user: dict = Depends(get_current_faculty)):
+    student = await db.users.find_one({"id": student_id, "role": "student"}, {"_id": 0, "id": 1, "batch": 1})
+    if student is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return await rollups.student_summary(db, student)
+
 # Student endpoints
 @api_router.get("/student/attendance-windows")
-async def get_active_attendance_windows(current_user: dict = Depends(get_current_user)):
+async def get_active_attendance_windows(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: dict = Depends(get_current_user)
+):
     if current_user["role"] != "student":
         raise HTTPException(status_code=403, detail="Student access required")
     
-    now = datetime.utcnow()
-    windows = await db.attendance_windows.find({
-        "batch_id": current_user["batch"],
-        "start_time": {"$lte": now},
-        "end_time": {"$gte": now},
-        "is_active": True
-    }).to_list(1000)
+    # Windows open and close with the clock, so the tag covers the live ids too
+    windows = await window_index.active_for_batch(current_user["batch"])
+    etag = await versions.etag("windows", current_user["batch"], *sorted(w["id"] for w in windows))
+    if versions.matches(if_none_match, etag):
+        return not_modified(etag)
+    return with_etag(json_page(windows), etag)
+
+@api_router.post("/student/beacon-scans")
+async def ingest_beacon_scans(batch: BeaconScanBatch, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "student":
+        raise HTTPException(status_code=403, detail="Student access required")
+    if len(batch.scans) > BEACON_MAX_SCANS:
+        raise HTTPException(status_code=413, detail=f"At most {BEACON_MAX_SCANS} scans per upload")
     
-    return windows
+    halls = await hall_beacons.resolver()
+    return await presence_tracker.ingest(current_user["id"], [scan.dict() for scan in batch.scans], halls)
 
 @api_router.post("/student/mark-attendance")
 async def mark_attendance(
@@ -285,30 +895,75 @@ async def mark_attendance(
     verification_method: str = "face_recognition",
     beacon_rssi: Optional[int] = None,
     face_confidence: Optional[float] = None,
+    probe: Optional[FaceEmbedding] = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user["role"] != "student":
         raise HTTPException(status_code=403, detail="Student access required")
     
+    async def mark():
+        return await record_attendance(
+            current_user, hall_id, attendance_window_id, verification_method, beacon_rssi, face_confidence, probe
+        )
+    
+    if not idempotency_key:
+        return await mark()
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    
+    # Repeats are replayed from the idempotency store without touching windows or records
+    try:
+        (status_code, body), replayed = await idempotency.run(
+            f"{current_user['id']}:{attendance_window_id}:{idempotency_key}",
+            mark,
+            # Other 4xx (window not active yet, face or beacon checks) may pass on retry
+            permanent=lambda exc: exc.detail == ALREADY_MARKED,
+        )
+    except IdempotencyConflict:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    return ORJSONResponse(body, status_code=status_code, headers={"Idempotency-Replayed": "true"} if replayed else None)
+
+async def record_attendance(
+    current_user: dict,
+    hall_id: str,
+    attendance_window_id: str,
+    verification_method: str,
+    beacon_rssi: Optional[int],
+    face_confidence: Optional[float],
+    probe: Optional[FaceEmbedding],
+) -> dict:
     # Check if attendance window is active
-    window = await db.attendance_windows.find_one({
-        "id": attendance_window_id,
-        "is_active": True,
-        "start_time": {"$lte": datetime.utcnow()},
-        "end_time": {"$gte": datetime.utcnow()}
-    })
+    window = await window_index.get_active(attendance_window_id)
     
     if not window:
         raise HTTPException(status_code=400, detail="Attendance window not active")
     
-    # Check if already marked
-    existing = await db.attendance_records.find_one({
-        "student_id": current_user["id"],
-        "attendance_window_id": attendance_window_id
-    })
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Attendance already marked")
+    # Confidence is computed here from the probe embedding, never taken from the client
+    if probe is not None:
+        try:
+            match = await face_matcher.verify(current_user["batch"], current_user["id"], probe.embedding)
+        except EmbeddingError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        if not match["enrolled"]:
+            raise HTTPException(status_code=400, detail="No face enrolled for this student")
+        if not match["verified"]:
+            raise HTTPException(status_code=400, detail="Face verification failed")
+        verification_method = "face_recognition"
+        face_confidence = match["confidence"]
+    elif FACE_MATCH_REQUIRED:
+        raise HTTPException(status_code=400, detail="Face probe required")
+    else:
+        # No probe, no server-side match: the client's claim of a face check is not stored
+        face_confidence = None
+        if verification_method == "face_recognition":
+            verification_method = "unverified"
+
+    if BEACON_PROXIMITY_REQUIRED:
+        rssi = await presence_tracker.presence(current_user["id"], window["hall_id"])
+        if hall_id != window["hall_id"] or rssi is None:
+            raise HTTPException(status_code=400, detail="Not in range of the hall's beacon")
+        beacon_rssi = round(rssi)
     
     # Create attendance record
     record = AttendanceRecord(
@@ -321,9 +976,37 @@ async def mark_attendance(
         face_confidence=face_confidence
     )
     
-    await db.attendance_records.insert_one(record.dict())
+    if attendance_buffer.enabled:
+        # Group commit: duplicates are rejected by the unique index on flush
+        inserted = await attendance_buffer.submit(record.dict())
+        if not inserted:
+            raise HTTPException(status_code=400, detail=ALREADY_MARKED)
+    else:
+        if not unique_mark_index and await attendance_records.find_one(
+            {"attendance_window_id": attendance_window_id, "student_id": current_user["id"]}, {"_id": 1}
+        ):
+            raise HTTPException(status_code=400, detail=ALREADY_MARKED)
+        # The unique (attendance_window_id, student_id) index rejects duplicates atomically
+        try:
+            await attendance_records.insert_one(record.dict())
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail=ALREADY_MARKED)
+    
+    try:
+        await rollups.record_mark(db, record.dict())
+    except Exception:
+        logger.exception("Failed to update attendance rollups for record %s", record.id)
+
+    try:
+        # Coalesced: one counter write per interval per worker, not one per mark
+        await versions.bump_soon("attendance")
+    except Exception:
+        logger.exception("Failed to bump the attendance version for record %s", record.id)
+
+    if ATTENDANCE_FEED_SOURCE == "local":
+        attendance_feed.publish(record.dict())
     
-    return {"message": "Attendance marked successfully", "record": record}
+    return {"message": "Attendance marked successfully", "record": record.dict()}
 
 # Legacy endpoints
 @api_router.get("/")
@@ -341,20 +1024,28 @@ async def create_status_check(current_user: dict = Depends(get_current_user)):
     return status_dict
 
 @api_router.get("/status")
-async def get_status_checks(current_user: dict = Depends(get_current_user)):
-    status_checks = await db.status_checks.find().to_list(1000)
-    return status_checks
-
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+async def get_status_checks(
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    if stream:
+        return ndjson_response(db.status_checks, {}, STATUS_CHECK_SORT, cursor, STATUS_CHECK_FIELDS)
+    status_checks, next_cursor = await fetch_page(
+        db.status_checks, {}, STATUS_CHECK_SORT, limit, cursor, fields_projection(STATUS_CHECK_FIELDS)
+    )
+    return json_page(status_checks, next_cursor)
+
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+metrics.add_gauge_source("user_cache", user_cache.stats)
+metrics.add_gauge_source("password_hashing", password_hasher.stats)
+metrics.add_gauge_source("feed", attendance_feed.stats)
+metrics.add_gauge_source("face_matching", face_matcher.stats)
+metrics.add_gauge_source("beacon_presence", presence_tracker.stats)
+metrics.add_gauge_source("admission", admission.stats)
 
 # Configure logging
 logging.basicConfig(
@@ -363,6 +1054,142 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def bootstrap_indexes():
+    if ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes(db)
+    if VERIFY_QUERY_PLANS_ON_STARTUP:
+        try:
+            plans = await verify_query_plans(db)
+        except Exception:
+            logger.exception("Query plan verification failed")
+        else:
+            collscans = [plan for plan in plans if plan["collscan"]]
+            logger.info("Verified %d query shapes, %d using COLLSCAN", len(plans), len(collscans))
+
+async def warm_up() -> dict:
+    """Open pool connections, load hot reference data and calibrate bcrypt; returns per-step ms."""
+    timings = {}
+    
+    started = time.perf_counter()
+    # Concurrent pings force the driver to open that many pooled connections now
+    await asyncio.gather(*(db.command("ping") for _ in range(max(1, MONGO_MIN_POOL_SIZE))))
+    timings["pool_ms"] = round(1000 * (time.perf_counter() - started), 1)
+    
+    started = time.perf_counter()
+    await asyncio.gather(
+        window_index.refresh(),
+        hall_beacons.refresh(),
+        fetch_page(db.batches, {}, BATCH_SORT, MAX_PAGE_SIZE, None, fields_projection(BATCH_FIELDS)),
+        fetch_page(db.halls, {}, HALL_SORT, MAX_PAGE_SIZE, None, fields_projection(HALL_FIELDS)),
+        *(versions.current(resource) for resource in ("batches", "halls", "windows", "attendance")),
+    )
+    timings["reference_data_ms"] = round(1000 * (time.perf_counter() - started), 1)
+    
+    # One hash per pool worker starts every thread/process and seeds the
+    # average run time the 503 Retry-After estimate is based on
+    started = time.perf_counter()
+    await asyncio.gather(*(password_hasher.hash("warm-up") for _ in range(password_hasher.workers)))
+    timings["bcrypt_ms"] = round(1000 * (time.perf_counter() - started), 1)
+    timings["bcrypt_hash_ms"] = round(password_hasher.stats()["avg_run_ms"], 1)
+    return timings
+
+async def check_unique_mark_index():
+    global unique_mark_index
+    if ATTENDANCE_STORAGE == "buckets":
+        # Bucket upserts are guarded by students: {$ne: ...} on the bucket _id
+        unique_mark_index = True
+        return
+    try:
+        unique_mark_index = await has_unique_index(db.attendance_records, ("attendance_window_id", "student_id"))
+    except Exception:
+        logger.exception("Could not inspect attendance_records indexes")
+        unique_mark_index = False
+    if not unique_mark_index:
+        logger.error("Unique (attendance_window_id, student_id) index missing; checking duplicate marks with a pre-read")
+
+async def start_background_tasks():
+    if ATTENDANCE_WRITE_BEHIND and ATTENDANCE_STORAGE == "buckets":
+        logger.warning("ATTENDANCE_WRITE_BEHIND only applies to record storage; writing buckets directly")
+    elif ATTENDANCE_WRITE_BEHIND:
+        await attendance_buffer.start()
+    
+    if ATTENDANCE_FEED_SOURCE == "change_stream":
+        if ATTENDANCE_STORAGE == "buckets":
+            logger.warning("The change_stream feed watches attendance_records; use ATTENDANCE_FEED_SOURCE=local with buckets")
+        attendance_feed.start_change_stream(db.attendance_records)
+    
+    if TIMETABLE_SCHEDULER_ENABLED:
+        timetable_scheduler.start()
+    if FINALIZER_ENABLED and FINALIZE_SINCE is None:
+        logger.error("FINALIZER_ENABLED needs FINALIZE_SINCE; not finalizing windows")
+    elif FINALIZER_ENABLED:
+        window_finalizer.start()
+
+async def stop_background_tasks():
+    await timetable_scheduler.stop()
+    await window_finalizer.stop()
+    await attendance_feed.stop()
+    await attendance_buffer.stop()
+    await versions.flush()
+    password_hasher.shutdown()
+    roster_hasher.shutdown()
+
+def check_config():
+    if BEACON_PROXIMITY_REQUIRED and presence_tracker.collection is None and WEB_CONCURRENCY > 1:
+        raise RuntimeError(
+            "BEACON_PROXIMITY_REQUIRED with WEB_CONCURRENCY > 1 needs BEACON_PRESENCE_BACKEND=mongo; "
+            "in-memory presence is not visible to the other workers"
+        )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_config()
+    started = time.perf_counter()
+    await bootstrap_indexes()
+    await check_unique_mark_index()
+    if WARMUP_ON_STARTUP:
+        try:
+            startup_report["warm_up"] = await warm_up()
+        except Exception:
+            # A cold worker is slower, not broken
+            logger.exception("Warm-up failed; serving cold")
+    await start_background_tasks()
+    startup_report["ready_ms"] = round(1000 * (time.perf_counter() - started), 1)
+    logger.info("Worker ready in %.0f ms %s", startup_report["ready_ms"], startup_report.get("warm_up", {}))
+    try:
+        yield
+    finally:
+        await stop_background_tasks()
+        client.close()
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title="IIITDM AttendanceSync API",
+        version="2.0",
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan,
+    )
+    app.add_api_route("/metrics", get_metrics, include_in_schema=False)
+    app.include_router(api_router)
+    
+    app.add_middleware(AdmissionMiddleware, control=admission, router=app.router)
+    
+    app.add_middleware(
+        MetricsMiddleware,
+        registry=metrics,
+        router=app.router,
+        slow_request_seconds=float(SLOW_REQUEST_MS) / 1000 if SLOW_REQUEST_MS else None,
+    )
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
+    )
+    return app
+
+# `uvicorn server:app`, or `uvicorn --factory server:create_app`
+app = create_app()
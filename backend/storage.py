@@ -0,0 +1,38 @@
+"""
+Pluggable storage backends.
+
+Handlers talk to collections through the Motor collection API. That API is
+the repository interface: users, batches, halls, attendance_windows,
+attendance_records and status_checks (plus derived collections) are reached
+as attributes of the object returned by open_storage(). Two backends
+implement it:
+
+    mongo   AsyncIOMotorClient against MONGO_URL (default)
+    memory  memory_db.MemoryClient, an indexed in-process engine for small
+            single-node deployments, benchmarks and test runs; data lives
+            only as long as the process
+"""
+
+import os
+from typing import Optional, Tuple
+
+BACKENDS = ("mongo", "memory")
+
+def open_storage(backend: Optional[str] = None, db_name: Optional[str] = None, **client_options) -> Tuple[object, object]:
+    """Return (client, database) for the configured STORAGE_BACKEND.
+
+    client_options (e.g. event_listeners, pool sizes) only apply to Mongo.
+    """
+    backend = backend or os.environ.get('STORAGE_BACKEND', 'mongo')
+    db_name = db_name or os.environ['DB_NAME']
+    if backend == "memory":
+        from memory_db import MemoryClient
+
+        client = MemoryClient()
+    elif backend == "mongo":
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'], **client_options)
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return client, client[db_name]
@@ -0,0 +1,147 @@
+"""
+Timetable-driven attendance windows.
+
+A timetable entry is a recurring slot: batch, hall, weekday and local
+start/end times. TimetableScheduler runs in the background and, every
+interval, materializes the windows of the next horizon_hours in one unordered
+bulk upsert and closes every expired window with a single update_many, so
+the active-window queries only ever see the few live windows.
+
+Window ids are derived from (entry id, local date), so several workers (or a
+restart) upserting the same slot converge on one window. Workers racing on
+the same upsert make the loser's write fail with a duplicate key error on the
+unique id index; those are expected and skipped.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+TIMETABLE_COLLECTION = "timetable"
+WINDOW_NAMESPACE = uuid.UUID("6f1c1d52-3f0e-4c1e-9a43-6a0d2b1f7e5a")
+DUPLICATE_KEY_ERROR = 11000
+
+
+def parse_clock(value: str) -> time:
+    return time.fromisoformat(value)
+
+
+def window_id(entry_id: str, day: date) -> str:
+    return str(uuid.uuid5(WINDOW_NAMESPACE, f"{entry_id}:{day.isoformat()}"))
+
+
+def occurrences(entry: dict, start: datetime, end: datetime, tz: ZoneInfo) -> List[dict]:
+    """Windows of one entry whose start falls in [start, end) or that are live at start (naive UTC)."""
+    opens, closes = parse_clock(entry["start"]), parse_clock(entry["end"])
+    windows = []
+    day = start.replace(tzinfo=timezone.utc).astimezone(tz).date() - timedelta(days=1)
+    last = end.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    while day <= last:
+        if day.weekday() == entry["weekday"]:
+            start_time = datetime.combine(day, opens, tz).astimezone(timezone.utc).replace(tzinfo=None)
+            end_time = datetime.combine(day, closes, tz).astimezone(timezone.utc).replace(tzinfo=None)
+            if end_time > start and start_time < end:
+                windows.append({
+                    "id": window_id(entry["id"], day),
+                    "hall_id": entry["hall_id"],
+                    "batch_id": entry["batch_id"],
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "is_active": True,
+                    "created_by": entry["created_by"],
+                    "timetable_id": entry["id"],
+                })
+        day += timedelta(days=1)
+    return windows
+
+
+class TimetableScheduler:
+    def __init__(self, db, window_index, tz: str = "UTC", horizon_hours: float = 48, interval_seconds: float = 60):
+        self.db = db
+        self.window_index = window_index
+        self.tz = ZoneInfo(tz)
+        self.horizon = timedelta(hours=horizon_hours)
+        self.interval_seconds = interval_seconds
+        self.last_run: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.utcnow()
+        entries = await self.db[TIMETABLE_COLLECTION].find(
+            {"is_active": True},
+            {"_id": 0, "id": 1, "batch_id": 1, "hall_id": 1, "weekday": 1, "start": 1, "end": 1, "created_by": 1},
+        ).to_list(None)
+
+        upserts = []
+        for entry in entries:
+            for window in occurrences(entry, now, now + self.horizon, self.tz):
+                upserts.append(UpdateOne(
+                    {"id": window["id"]},
+                    {"$setOnInsert": {**window, "created_at": now}},
+                    upsert=True,
+                ))
+        created = 0
+        failed = []
+        if upserts:
+            try:
+                result = await self.db.attendance_windows.bulk_write(upserts, ordered=False)
+                created = result.upserted_count
+            except BulkWriteError as exc:
+                # Another worker inserted the same window first
+                created = exc.details.get("nUpserted", 0)
+                failed = [error for error in exc.details.get("writeErrors", [])
+                          if error.get("code") != DUPLICATE_KEY_ERROR]
+
+        closed = await self.db.attendance_windows.update_many(
+            {"is_active": True, "end_time": {"$lt": now}},
+            {"$set": {"is_active": False, "closed_at": now}},
+        )
+        if created or closed.modified_count:
+            self.window_index.invalidate()
+
+        self.last_run = {
+            "ran_at": now,
+            "entries": len(entries),
+            "windows_created": created,
+            "windows_closed": closed.modified_count,
+            "write_errors": len(failed),
+        }
+        if failed:
+            raise BulkWriteError({"writeErrors": failed, "writeConcernErrors": [], "nUpserted": created})
+        return self.last_run
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Timetable scheduler run failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval_seconds,
+            "horizon_hours": self.horizon.total_seconds() / 3600,
+            **(self.last_run or {}),
+        }
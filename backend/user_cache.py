@@ -0,0 +1,69 @@
+"""
+Bounded LRU + TTL cache of authenticated user documents.
+
+get_current_user runs on every authenticated request; caching the user
+document by token subject removes one Mongo read per call. Entries are
+dropped explicitly when a user changes on this worker and expire after the
+TTL so changes made through other workers are picked up.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class PrincipalCache:
+    """LRU cache of user documents keyed by JWT subject (email)."""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 60, enabled: bool = True):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, subject: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(subject)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[subject]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return user
+
+    def put(self, subject: str, user: dict):
+        if not self.enabled:
+            return
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, subject: str):
+        self._entries.pop(subject, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,121 @@
+"""
+Per-resource version counters for conditional GETs.
+
+Writes bump a counter document in resource_versions ($inc on _id = resource
+name); list endpoints build a weak ETag from the counter plus whatever else
+shapes the response (query string, day, active window ids) and answer a
+matching If-None-Match with 304 before touching the data collections.
+
+Counters are read through a short local cache so a poll costs at most one
+_id lookup per resource per TTL on each worker; bumps made on this worker are
+visible immediately, bumps from other workers within ttl_seconds. Each
+counter carries a random generation set when it is created, so a dropped
+collection never reissues an old tag for different data.
+
+Hot write paths (every attendance mark) use bump_soon instead of bump: a
+worker writes the counter at most once per coalesce_seconds and folds the
+marks in between into one delayed bump, so the counter document is not a
+per-mark findAndModify hotspot. Their ETags lag by up to coalesce_seconds.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+VERSION_COLLECTION = "resource_versions"
+
+
+class ResourceVersions:
+    def __init__(self, db, ttl_seconds: float = 1.0, coalesce_seconds: float = 1.0):
+        self.collection = db[VERSION_COLLECTION]
+        self.ttl_seconds = ttl_seconds
+        self.coalesce_seconds = coalesce_seconds
+        self._cache: Dict[str, Tuple[float, str]] = {}
+        self._last_bump: Dict[str, float] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.not_modified = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _tag(doc: Optional[dict]) -> str:
+        return f"{doc['generation']}.{doc['version']}" if doc else "0.0"
+
+    async def bump(self, resource: str):
+        self._last_bump[resource] = time.monotonic()
+        doc = await self.collection.find_one_and_update(
+            {"_id": resource},
+            {"$inc": {"version": 1}, "$setOnInsert": {"generation": uuid.uuid4().hex[:8]}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._cache[resource] = (time.monotonic() + self.ttl_seconds, self._tag(doc))
+
+    async def bump_soon(self, resource: str):
+        """Bump now, or once at the end of the coalescing interval if this worker bumped recently."""
+        if resource in self._pending:
+            self.coalesced += 1
+            return
+        wait = self._last_bump.get(resource, float("-inf")) + self.coalesce_seconds - time.monotonic()
+        if wait <= 0:
+            await self.bump(resource)
+            return
+        self.coalesced += 1
+        self._pending[resource] = asyncio.ensure_future(self._delayed_bump(resource, wait))
+
+    async def _delayed_bump(self, resource: str, wait: float):
+        await asyncio.sleep(wait)
+        del self._pending[resource]
+        try:
+            await self.bump(resource)
+        except Exception:
+            logger.exception("Delayed bump of the %s version failed", resource)
+
+    async def flush(self):
+        """Write pending coalesced bumps now (on shutdown)."""
+        for resource, task in list(self._pending.items()):
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            self._pending.pop(resource, None)
+            try:
+                await self.bump(resource)
+            except Exception:
+                logger.exception("Flushing the %s version failed", resource)
+
+    async def current(self, resource: str) -> str:
+        cached = self._cache.get(resource)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        tag = self._tag(await self.collection.find_one({"_id": resource}))
+        self._cache[resource] = (time.monotonic() + self.ttl_seconds, tag)
+        return tag
+
+    async def etag(self, resource: str, *parts) -> str:
+        digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=8).hexdigest()
+        return f'W/"{resource}-{await self.current(resource)}-{digest}"'
+
+    def matches(self, if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        # Weak comparison, as If-None-Match requires
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        matched = "*" in candidates or etag.removeprefix("W/") in candidates
+        if matched:
+            self.not_modified += 1
+        return matched
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self._cache),
+            "ttl_seconds": self.ttl_seconds,
+            "coalesce_seconds": self.coalesce_seconds,
+            "pending": len(self._pending),
+            "coalesced": self.coalesced,
+            "not_modified": self.not_modified,
+        }
@@ -0,0 +1,74 @@
+"""
+In-process index of live attendance windows.
+
+Windows change rarely but are read on every student poll and every mark, so
+live and upcoming windows are kept in memory keyed by batch_id and ordered by
+start/end time. The index is reloaded when a TTL elapses (so several workers
+converge) or immediately after a local write invalidates it.
+"""
+
+import asyncio
+import bisect
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class ActiveWindowIndex:
+    """Answers "which windows are active" without a Mongo round trip."""
+
+    def __init__(self, collection, ttl_seconds: float = 30, projection: Optional[dict] = None):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.projection = projection if projection is not None else {"_id": 0}
+        self._by_batch: Dict[str, List[dict]] = {}
+        self._starts: Dict[str, List[datetime]] = {}
+        self._by_id: Dict[str, dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    async def refresh(self):
+        windows = await self.collection.find(
+            {"is_active": True, "end_time": {"$gte": datetime.utcnow()}},
+            self.projection,
+        ).to_list(None)
+
+        by_batch: Dict[str, List[dict]] = {}
+        for window in windows:
+            by_batch.setdefault(window["batch_id"], []).append(window)
+        for batch_windows in by_batch.values():
+            batch_windows.sort(key=lambda w: (w["start_time"], w["end_time"]))
+
+        self._by_batch = by_batch
+        self._starts = {batch_id: [w["start_time"] for w in ws] for batch_id, ws in by_batch.items()}
+        self._by_id = {w["id"]: w for w in windows}
+        self._loaded_at = time.monotonic()
+
+    async def _ensure_fresh(self):
+        if not self._is_stale():
+            return
+        async with self._lock:
+            if self._is_stale():
+                await self.refresh()
+
+    async def active_for_batch(self, batch_id: str, now: Optional[datetime] = None) -> List[dict]:
+        await self._ensure_fresh()
+        now = now or datetime.utcnow()
+        windows = self._by_batch.get(batch_id, [])
+        # Only windows that have already started can be active
+        started = bisect.bisect_right(self._starts.get(batch_id, []), now)
+        return [w for w in windows[:started] if w["end_time"] >= now]
+
+    async def get_active(self, window_id: str, now: Optional[datetime] = None) -> Optional[dict]:
+        await self._ensure_fresh()
+        now = now or datetime.utcnow()
+        window = self._by_id.get(window_id)
+        if window and window["start_time"] <= now <= window["end_time"]:
+            return window
+        return None
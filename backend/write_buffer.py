@@ -0,0 +1,93 @@
+"""
+Write-behind buffer for attendance records.
+
+Accepted marks are collected for a few milliseconds and flushed with a single
+unordered insert_many. Duplicates are rejected by the unique
+(attendance_window_id, student_id) index rather than a pre-read, and each
+caller is told whether its own record was inserted.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from indexes import has_unique_index
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class AttendanceWriteBuffer:
+    """Group-commits attendance records into batched insert_many calls."""
+
+    def __init__(self, collection, flush_interval_ms: float = 5, max_batch: int = 500):
+        self.collection = collection
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.enabled = False
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight = set()
+
+    async def start(self):
+        # Correctness depends on the unique index declared in indexes.py
+        if not await has_unique_index(self.collection, ("attendance_window_id", "student_id")):
+            logger.error("Unique (attendance_window_id, student_id) index missing; write-behind disabled")
+            return
+        self.enabled = True
+
+    async def stop(self):
+        self.enabled = False
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def submit(self, record: dict) -> bool:
+        """Queue a record; resolves to True if inserted, False if already marked."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((record, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._write(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]):
+        failures = {}
+        try:
+            await self.collection.insert_many([record for record, _ in batch], ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                failures[error["index"]] = error
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            error = failures.get(index)
+            if error is None:
+                future.set_result(True)
+            elif error.get("code") == DUPLICATE_KEY_ERROR:
+                future.set_result(False)
+            else:
+                future.set_exception(RuntimeError(error.get("errmsg", "Attendance write failed")))
+        logger.debug("Flushed %d attendance records (%d rejected)", len(batch), len(failures))
@@ -0,0 +1,74 @@
+// Authenticated API calls. A 401 refreshes the session once (rotating the
+// stored refresh token) and retries the request; the user is only sent back
+// to the login screen when the refresh itself is rejected.
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+export const API = `${BACKEND_URL}/api`;
+
+let refreshing = null;
+
+export const storeSession = (data) => {
+  localStorage.setItem('accessToken', data.access_token);
+  localStorage.setItem('refreshToken', data.refresh_token);
+  if (data.user) {
+    localStorage.setItem('userRole', data.user.role);
+    localStorage.setItem('userData', JSON.stringify(data.user));
+  }
+};
+
+export const clearSession = () => {
+  localStorage.removeItem('accessToken');
+  localStorage.removeItem('refreshToken');
+  localStorage.removeItem('userRole');
+  localStorage.removeItem('userData');
+};
+
+// Resolves true once new tokens are stored, false if the server rejected the
+// refresh token. Network errors reject so callers treat them as transient.
+const refreshSession = () => {
+  // Concurrent 401s share one refresh: presenting the same refresh token twice
+  // looks like token theft to the server and revokes the whole session
+  if (!refreshing) {
+    refreshing = (async () => {
+      const refreshToken = localStorage.getItem('refreshToken');
+      if (!refreshToken) return false;
+      const response = await fetch(`${API}/auth/refresh`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken })
+      });
+      if (!response.ok) return false;
+      storeSession(await response.json());
+      return true;
+    })().finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
+const send = (path, options, token) => fetch(`${API}${path}`, {
+  ...options,
+  headers: {
+    'Content-Type': 'application/json',
+    ...options.headers,
+    'Authorization': `Bearer ${token}`
+  }
+});
+
+export const authFetch = async (path, options = {}) => {
+  const token = localStorage.getItem('accessToken');
+  const response = await send(path, options, token);
+  if (response.status !== 401) return response;
+
+  // Another tab (or a concurrent request) may already have rotated the tokens
+  const current = localStorage.getItem('accessToken');
+  if (current && current !== token) return send(path, options, current);
+
+  if (await refreshSession()) {
+    return send(path, options, localStorage.getItem('accessToken'));
+  }
+  clearSession();
+  window.location.assign('/login');
+  return response;
+};
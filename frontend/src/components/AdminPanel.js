@@ -1,8 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { authFetch } from '../api';
 
 const AdminPanel = () => {
   const [user, setUser] = useState(null);
@@ -34,19 +32,90 @@ const AdminPanel = () => {
     fetchTodayAttendance();
   }, [navigate]);
 
-  const getAuthHeaders = () => {
-    const token = localStorage.getItem('accessToken');
-    return {
-      'Authorization': `Bearer ${token}`,
-      'Content-Type': 'application/json'
+  useEffect(() => {
+    // Subscribe to newly marked attendance instead of re-polling today's records.
+    // EventSource cannot send the Authorization header, so read the SSE stream via fetch
+    // and reconnect the way EventSource would: with backoff after an eviction, an error
+    // or the end of the stream, refetching today's snapshot once reconnected so marks
+    // made while disconnected are not lost.
+    const controller = new AbortController();
+    let retryMs = 1000;
+
+    const wait = (ms) => new Promise((resolve) => {
+      const timer = setTimeout(resolve, ms);
+      controller.signal.addEventListener('abort', () => {
+        clearTimeout(timer);
+        resolve();
+      }, { once: true });
+    });
+
+    const readStream = async (reconnecting) => {
+      const response = await authFetch('/admin/attendance/live', {
+        signal: controller.signal
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`Live attendance feed returned ${response.status}`);
+      }
+      if (reconnecting) {
+        fetchTodayAttendance();
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) return;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        frames.forEach((frame) => {
+          const lines = frame.split('\n');
+          const event = lines.find(l => l.startsWith('event: '));
+          const data = lines.find(l => l.startsWith('data: '));
+          const retry = lines.find(l => l.startsWith('retry: '));
+          if (retry) {
+            retryMs = parseInt(retry.slice(7), 10) || retryMs;
+          }
+          if (event === 'event: attendance' && data) {
+            const record = JSON.parse(data.slice(6));
+            // The snapshot refetched on reconnect may already hold this record
+            setTodayAttendance(prev => (prev.some(r => r.id === record.id) ? prev : [...prev, record]));
+          }
+          // 'event: evicted' is followed by the server closing the stream
+        });
+      }
+    };
+
+    const subscribe = async () => {
+      let failures = 0;
+      let reconnecting = false;
+      while (!controller.signal.aborted) {
+        const connectedAt = Date.now();
+        try {
+          await readStream(reconnecting);
+        } catch (err) {
+          if (err.name === 'AbortError') return;
+          console.error(err);
+        }
+        if (controller.signal.aborted) return;
+        // A stream that stayed up for a while starts the backoff over
+        failures = Date.now() - connectedAt > 60000 ? 1 : failures + 1;
+        const backoff = Math.min(30000, retryMs * 2 ** (failures - 1));
+        await wait(backoff / 2 + Math.random() * backoff / 2);
+        reconnecting = true;
+      }
     };
-  };
+
+    if (localStorage.getItem('userRole') === 'faculty') {
+      subscribe();
+    }
+    return () => controller.abort();
+  }, []);
 
   const fetchBatches = async () => {
     try {
-      const response = await fetch(`${API}/admin/batches`, {
-        headers: getAuthHeaders()
-      });
+      const response = await authFetch('/admin/batches');
       
       if (!response.ok) {
         throw new Error('Failed to fetch batches');
@@ -62,9 +131,7 @@ const AdminPanel = () => {
 
   const fetchHalls = async () => {
     try {
-      const response = await fetch(`${API}/admin/halls`, {
-        headers: getAuthHeaders()
-      });
+      const response = await authFetch('/admin/halls');
       
       if (!response.ok) {
         throw new Error('Failed to fetch halls');
@@ -83,9 +150,7 @@ const AdminPanel = () => {
     
     setLoading(true);
     try {
-      const response = await fetch(`${API}/admin/students?batch_id=${batchId}`, {
-        headers: getAuthHeaders()
-      });
+      const response = await authFetch(`/admin/students?batch_id=${batchId}`);
       
       if (!response.ok) {
         throw new Error('Failed to fetch students');
@@ -103,9 +168,7 @@ const AdminPanel = () => {
 
   const fetchTodayAttendance = async () => {
     try {
-      const response = await fetch(`${API}/admin/attendance/today`, {
-        headers: getAuthHeaders()
-      });
+      const response = await authFetch('/admin/attendance/today');
       
       if (!response.ok) {
         throw new Error('Failed to fetch attendance');
@@ -135,9 +198,8 @@ const AdminPanel = () => {
     
     if (batchName && batchCode) {
       try {
-        const response = await fetch(`${API}/admin/batches`, {
+        const response = await authFetch('/admin/batches', {
           method: 'POST',
-          headers: getAuthHeaders(),
           body: JSON.stringify({
             name: batchName,
             code: batchCode
@@ -165,9 +227,8 @@ const AdminPanel = () => {
     
     if (hallName && hallCode && macAddress && capacity) {
       try {
-        const response = await fetch(`${API}/admin/halls`, {
+        const response = await authFetch('/admin/halls', {
           method: 'POST',
-          headers: getAuthHeaders(),
           body: JSON.stringify({
             name: hallName,
             code: hallCode,
@@ -1,8 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { API, authFetch, clearSession } from '../api';
 
 const Home = () => {
   const [user, setUser] = useState(null);
@@ -53,19 +51,9 @@ const Home = () => {
     return () => clearInterval(timeInterval);
   }, [navigate]);
 
-  const getAuthHeaders = () => {
-    const token = localStorage.getItem('accessToken');
-    return {
-      'Authorization': `Bearer ${token}`,
-      'Content-Type': 'application/json'
-    };
-  };
-
   const fetchAttendanceWindows = async () => {
     try {
-      const response = await fetch(`${API}/student/attendance-windows`, {
-        headers: getAuthHeaders()
-      });
+      const response = await authFetch('/student/attendance-windows');
       
       if (response.ok) {
         const data = await response.json();
@@ -77,9 +65,15 @@ const Home = () => {
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('accessToken');
-    localStorage.removeItem('userRole');
-    localStorage.removeItem('userData');
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      fetch(`${API}/auth/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken })
+      }).catch(() => {});
+    }
+    clearSession();
     navigate('/login');
   };
 
@@ -106,9 +100,8 @@ const Home = () => {
       const window = attendanceWindows[0];
       
       // Mock attendance marking
-      const response = await fetch(`${API}/student/mark-attendance`, {
+      const response = await authFetch('/student/mark-attendance', {
         method: 'POST',
-        headers: getAuthHeaders(),
         body: JSON.stringify({
           hall_id: window.hall_id,
           attendance_window_id: window.id,
@@ -1,8 +1,6 @@
 import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { API, storeSession } from '../api';
 
 const Register = () => {
   const [formData, setFormData] = useState({
@@ -83,9 +81,7 @@ const Register = () => {
 
       if (response.ok) {
         // Store tokens and user data
-        localStorage.setItem('accessToken', data.access_token);
-        localStorage.setItem('userRole', data.user.role);
-        localStorage.setItem('userData', JSON.stringify(data.user));
+        storeSession(data);
         
         // Navigate based on role
         if (data.user.role === 'faculty') {
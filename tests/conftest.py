@@ -0,0 +1,71 @@
+import asyncio
+import importlib
+import inspect
+import sys
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import httpx
+import pytest
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from memory_db import MemoryClient  # noqa: E402
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Run `async def` tests on a fresh event loop."""
+    if inspect.iscoroutinefunction(pyfuncitem.obj):
+        kwargs = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+        asyncio.run(pyfuncitem.obj(**kwargs))
+        return True
+    return None
+
+
+@pytest.fixture
+def db():
+    """An empty in-memory database, private to the test."""
+    return MemoryClient()[f"test_{uuid.uuid4().hex}"]
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The API module on the memory backend.
+
+    It builds its storage at import time, so the environment is set just
+    for the import instead of by whichever test module is collected first.
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("STORAGE_BACKEND", "memory")
+        patch.setenv("DB_NAME", f"test_api_{uuid.uuid4().hex}")
+        patch.setenv("WARMUP_ON_STARTUP", "false")
+        patch.setenv("VERIFY_QUERY_PLANS_ON_STARTUP", "false")
+        module = importlib.import_module("server")
+    return module
+
+
+class ApiClient(httpx.AsyncClient):
+    async def register(self, email: str, role: str = "student", **extra) -> dict:
+        """Register a user; returns their Authorization header."""
+        response = await self.post("/auth/register", json={
+            "email": email, "password": "secret123", "full_name": email, "role": role, **extra,
+        })
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def app_client(server):
+    """`async with app_client() as api:` runs the app's lifespan around an ApiClient."""
+
+    @asynccontextmanager
+    async def start():
+        app = server.create_app()
+        async with app.router.lifespan_context(app):
+            async with ApiClient(transport=httpx.ASGITransport(app=app), base_url="http://test/api") as api:
+                yield api
+
+    return start
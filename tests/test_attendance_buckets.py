@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from attendance_buckets import BUCKET_COLLECTION, BucketedRecords, attendance_source, bucket_of, migrate
+from indexes import ensure_ttl_index
+
+START = datetime(2026, 2, 9, 9, 0)
+
+
+def _mark(window_id, student_id, minute=0, batch_id="b1"):
+    return {
+        "id": f"{window_id}-{student_id}",
+        "attendance_window_id": window_id,
+        "student_id": student_id,
+        "batch_id": batch_id,
+        "hall_id": "h1",
+        "marked_at": START + timedelta(minutes=minute),
+    }
+
+
+def test_bucket_assignment_is_stable():
+    # Not Python's salted hash(): every worker must pick the same bucket
+    assert bucket_of("student-42", 4) == bucket_of("student-42", 4)
+    assert {bucket_of(f"s{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+async def test_marks_read_back_as_records(db):
+    records = BucketedRecords(db, buckets_per_window=4)
+    for i in range(10):
+        await records.insert_one(_mark("w1", f"s{i}", minute=i, batch_id="b1" if i < 6 else "b2"))
+    await records.insert_one(_mark("w2", "s0"))
+
+    assert await db[BUCKET_COLLECTION].count_documents({}) <= 4 + 1
+    assert await records.count_documents({}) == 11
+    assert await records.count_documents({"attendance_window_id": "w1", "batch_id": "b2"}) == 4
+    mark = await records.find_one({"attendance_window_id": "w1", "student_id": "s3"}, {"_id": 0, "marked_at": 1})
+    assert mark == {"marked_at": START + timedelta(minutes=3)}
+
+    cursor = records.find({"student_id": "s0"}, {"_id": 0, "attendance_window_id": 1})
+    docs = await cursor.sort("attendance_window_id", 1).to_list(None)
+    assert docs == [{"attendance_window_id": "w1"}, {"attendance_window_id": "w2"}]
+
+
+async def test_duplicate_mark_is_rejected(db):
+    records = BucketedRecords(db, buckets_per_window=4)
+    await records.insert_one(_mark("w1", "s1"))
+    with pytest.raises(DuplicateKeyError):
+        await records.insert_one({**_mark("w1", "s1"), "id": "retry"})
+    assert await records.count_documents({"attendance_window_id": "w1"}) == 1
+
+
+async def test_migrate_merges_records_into_existing_buckets(db):
+    records = BucketedRecords(db, buckets_per_window=2)
+    await records.insert_one(_mark("w1", "s1"))
+    await db.attendance_records.insert_many([_mark("w1", "s1"), _mark("w1", "s2"), _mark("w2", "s3")])
+
+    report = await migrate(db, buckets_per_window=2, drop_records=True)
+    assert report["records"] == 3 and report["windows"] == 2
+    assert report["marks_in_buckets"] == 3 and report["records_dropped"]
+    assert await db.attendance_records.count_documents({}) == 0
+    # Re-running is idempotent
+    assert (await migrate(db, buckets_per_window=2))["marks_in_buckets"] == 3
+
+
+def test_attendance_source_modes(db):
+    assert attendance_source(db, "records") is db.attendance_records
+    assert isinstance(attendance_source(db, "buckets", 8), BucketedRecords)
+    with pytest.raises(ValueError):
+        attendance_source(db, "sharded")
+
+
+async def test_status_check_ttl_is_created_and_retuned(db):
+    assert await ensure_ttl_index(db, "status_checks", "timestamp", 60, "ttl_timestamp") == "created"
+    assert await ensure_ttl_index(db, "status_checks", "timestamp", 60, "ttl_timestamp") == "unchanged"
+    assert await ensure_ttl_index(db, "status_checks", "timestamp", 120, "ttl_timestamp") == "updated"
+    assert (await db.status_checks.index_information())["ttl_timestamp"]["expireAfterSeconds"] == 120
+    assert await ensure_ttl_index(db, "status_checks", "timestamp", 0, "ttl_timestamp") == "disabled"
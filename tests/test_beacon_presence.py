@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from beacon_presence import PRESENCE_COLLECTION, HallBeaconMap, PresenceTracker
+
+NOW = 1_770_000_000.0
+HALLS = {(1, 1): "h1", (1, 2): "h2", (1, 3): "h3"}
+
+
+def _scan(minor, rssi, age):
+    return {"major": 1, "minor": minor, "rssi": rssi,
+            "timestamp": datetime.fromtimestamp(NOW - age, tz=timezone.utc)}
+
+
+def _tracker(**kwargs):
+    return PresenceTracker(rssi_threshold=-75, min_scans=3, scan_window_seconds=30, half_life_seconds=10,
+                           presence_ttl_seconds=120, **kwargs)
+
+
+async def test_scans_are_smoothed_per_hall_by_recency():
+    tracker = _tracker()
+    result = await tracker.ingest("s1", [
+        # h1: the 10s old scan weighs half as much as the fresh ones
+        _scan(1, -60, 0), _scan(1, -60, 0), _scan(1, -90, 10),
+        # h2: enough scans, but too weak
+        _scan(2, -80, 0), _scan(2, -80, 1), _scan(2, -80, 2),
+        # h3: strong, but one scan is outside the window
+        _scan(3, -50, 0), _scan(3, -50, 1), _scan(3, -50, 40),
+        # Unknown beacon
+        {"major": 9, "minor": 9, "rssi": -40, "timestamp": datetime.utcnow()},
+    ], HALLS, now=NOW)
+
+    assert result == {"accepted": 9, "unknown": 1, "present_in": ["h1"]}
+    assert await tracker.presence("s1", "h1", now=NOW) == pytest.approx((-60 - 60 - 45) / 2.5, abs=0.05)
+    assert await tracker.presence("s1", "h2", now=NOW) is None
+    assert await tracker.presence("s1", "h3", now=NOW) is None
+    assert await tracker.presence("s2", "h1", now=NOW) is None
+
+
+async def test_presence_expires_after_the_newest_scan():
+    tracker = _tracker()
+    # Future timestamps from a skewed client clock count as now
+    await tracker.ingest("s1", [_scan(1, -60, 5), _scan(1, -60, 0), _scan(1, -60, -30)], HALLS, now=NOW)
+    assert await tracker.presence("s1", "h1", now=NOW + 120) is not None
+    assert await tracker.presence("s1", "h1", now=NOW + 121) is None
+
+    tracker.prune(NOW + 121)
+    assert tracker.stats()["students_tracked"] == 0
+
+
+async def test_presence_is_shared_between_workers(db):
+    uploads, marks = _tracker(collection=db[PRESENCE_COLLECTION]), _tracker(collection=db[PRESENCE_COLLECTION])
+    await uploads.ingest("s1", [_scan(1, -60, 0)] * 3, HALLS, now=NOW)
+    # Nothing is written for an upload that finds the student nowhere
+    await uploads.ingest("s2", [_scan(2, -90, 0)] * 3, HALLS, now=NOW)
+    assert await db[PRESENCE_COLLECTION].count_documents({}) == 1
+
+    assert await marks.presence("s1", "h1", now=NOW) == -60
+    assert await marks.presence("s1", "h1", now=NOW + 121) is None
+    assert await marks.presence("s1", "h2", now=NOW) is None
+    assert marks.stats()["shared_reads"] == 3
+    # Once copied locally, a live entry needs no read
+    await marks.presence("s1", "h1", now=NOW)
+    assert marks.stats()["shared_reads"] == 3
+
+
+async def test_hall_map_reloads_after_invalidation(db):
+    await db.halls.insert_one({"id": "h1", "beacon_major": 1, "beacon_minor": 1})
+    halls = HallBeaconMap(db.halls, ttl_seconds=3600)
+    assert await halls.resolver() == {(1, 1): "h1"}
+
+    await db.halls.insert_one({"id": "h2", "beacon_major": 1, "beacon_minor": 2})
+    await db.halls.insert_one({"id": "h3", "beacon_major": None, "beacon_minor": None})
+    assert len(await halls.resolver()) == 1
+    halls.invalidate()
+    assert await halls.resolver() == {(1, 1): "h1", (1, 2): "h2"}
@@ -0,0 +1,80 @@
+import asyncio
+
+from versions import VERSION_COLLECTION, ResourceVersions
+
+
+async def test_etag_changes_only_when_the_resource_is_bumped(db):
+    versions = ResourceVersions(db, ttl_seconds=0)
+    first = await versions.etag("batches", 50, None)
+    assert first.startswith('W/"batches-') and first == await versions.etag("batches", 50, None)
+    assert first != await versions.etag("batches", 10, None)
+
+    await versions.bump("batches")
+    bumped = await versions.etag("batches", 50, None)
+    assert bumped != first
+    await versions.bump("halls")
+    assert await versions.etag("batches", 50, None) == bumped
+
+
+async def test_recreated_counter_never_reissues_an_old_tag(db):
+    versions = ResourceVersions(db, ttl_seconds=0)
+    await versions.bump("batches")
+    old = await versions.etag("batches")
+    await db.drop_collection(VERSION_COLLECTION)
+    await versions.bump("batches")
+    # Same version number, new generation
+    assert await versions.etag("batches") != old
+
+
+def test_if_none_match_uses_weak_comparison(db):
+    versions = ResourceVersions(db)
+    tag = 'W/"batches-ab.1-00"'
+    assert versions.matches('"batches-ab.1-00"', tag)
+    assert versions.matches('W/"other", W/"batches-ab.1-00"', tag)
+    assert versions.matches("*", tag)
+    assert not versions.matches('W/"batches-ab.2-00"', tag)
+    assert not versions.matches(None, tag)
+    assert versions.stats()["not_modified"] == 3
+
+
+async def test_hot_path_bumps_are_coalesced(db):
+    versions = ResourceVersions(db, ttl_seconds=0, coalesce_seconds=0.05)
+    await versions.bump_soon("attendance")
+    after_first = await versions.current("attendance")
+    for _ in range(20):
+        await versions.bump_soon("attendance")
+    # The first bump is written at once, the rest fold into one delayed bump
+    assert await versions.current("attendance") == after_first
+    assert versions.stats()["pending"] == 1
+    await asyncio.sleep(0.1)
+    assert (await db[VERSION_COLLECTION].find_one({"_id": "attendance"}))["version"] == 2
+
+    # Pending bumps are written on shutdown
+    versions = ResourceVersions(db, ttl_seconds=0, coalesce_seconds=60)
+    for _ in range(3):
+        await versions.bump_soon("attendance")
+    assert (await db[VERSION_COLLECTION].find_one({"_id": "attendance"}))["version"] == 3
+    await versions.flush()
+    assert (await db[VERSION_COLLECTION].find_one({"_id": "attendance"}))["version"] == 4
+    assert versions.stats()["pending"] == 0
+
+
+async def test_list_endpoint_answers_304_until_a_write(app_client):
+    async with app_client() as api:
+        auth = await api.register("etag.faculty@iiitdm.ac.in", "faculty")
+
+        response = await api.get("/admin/batches", headers=auth)
+        etag = response.headers["etag"]
+        assert response.status_code == 200
+
+        response = await api.get("/admin/batches", headers={**auth, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        response = await api.post("/admin/batches", json={"name": "ETag batch", "code": "ET1"}, headers=auth)
+        assert response.status_code == 200, response.text
+        response = await api.get("/admin/batches", headers={**auth, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert any(batch["code"] == "ET1" for batch in response.json())
@@ -0,0 +1,88 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from exporter import EXPORT_COLUMNS, AttendanceExport, export_query, parquet_available
+
+START = datetime(2026, 2, 9, 9, 0)
+
+
+async def _seed(db, count):
+    await db.attendance_records.insert_many([{
+        "id": f"r{i:03d}",
+        "student_id": f"s{i}",
+        "batch_id": "b1" if i % 2 else "b2",
+        "hall_id": "h1",
+        "attendance_window_id": "w1",
+        # Sub-millisecond part, as Python datetimes have before BSON truncates them
+        "marked_at": START + timedelta(seconds=i, microseconds=1001),
+        "verification_method": "face_recognition",
+        "beacon_rssi": -40 - i if i % 3 else None,
+        "face_confidence": 0.9 if i % 3 else None,
+    } for i in range(count)])
+
+
+async def _export(db, fmt, query=None, chunk_size=4):
+    cursor = db.attendance_records.find(query or {}, {"_id": 0}).sort("id", 1)
+    export = AttendanceExport(cursor, fmt, chunk_size=chunk_size)
+    return b"".join([chunk async for chunk in export.stream()]), export
+
+
+def test_export_query():
+    end = START + timedelta(days=1)
+    assert export_query(START, end, batch_id="b1") == {"marked_at": {"$gte": START, "$lt": end}, "batch_id": "b1"}
+    assert export_query() == {}
+
+
+async def test_csv_export(db):
+    await _seed(db, 10)
+    data, export = await _export(db, "csv")
+    rows = list(csv.DictReader(io.StringIO(data.decode())))
+    assert export.rows == 10 and len(rows) == 10
+    assert list(rows[0]) == EXPORT_COLUMNS
+    assert [row["id"] for row in rows] == [f"r{i:03d}" for i in range(10)]
+    assert rows[1]["marked_at"] == "2026-02-09T09:00:01.001000"
+    # Missing optional values are empty, integers stay integers across chunks
+    assert rows[0]["beacon_rssi"] == "" and rows[1]["beacon_rssi"] == "-41"
+
+
+async def test_csv_export_of_nothing_is_just_the_header(db):
+    data, export = await _export(db, "csv")
+    assert data.decode() == ",".join(EXPORT_COLUMNS) + "\n"
+    assert export.rows == 0
+
+
+@pytest.mark.skipif(not parquet_available(), reason="pyarrow is not installed")
+async def test_parquet_export(db):
+    import pyarrow.parquet as pq
+
+    await _seed(db, 10)
+    data, export = await _export(db, "parquet", query={"batch_id": "b1"}, chunk_size=2)
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.num_rows == export.rows == 5
+    assert table.column("marked_at").to_pylist()[0] == START + timedelta(seconds=1, microseconds=1000)
+    assert table.column("beacon_rssi").to_pylist()[:2] == [-41, None]
+
+
+@pytest.mark.skipif(not parquet_available(), reason="pyarrow is not installed")
+async def test_parquet_export_floors_sub_millisecond_timestamps():
+    import pyarrow.parquet as pq
+
+    class Cursor:
+        """Rows as they look before reaching BSON storage."""
+
+        def __aiter__(self):
+            return self._rows()
+
+        async def _rows(self):
+            for i in range(3):
+                yield {"id": str(i), "marked_at": START + timedelta(microseconds=1001 * i)}
+
+    export = AttendanceExport(Cursor(), "parquet", chunk_size=2)
+    table = pq.read_table(io.BytesIO(b"".join([chunk async for chunk in export.stream()])))
+    assert table.column("marked_at").to_pylist() == [START + timedelta(milliseconds=i) for i in range(3)]
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from face_matching import EmbeddingError, FaceMatcher
+
+DIM = 8
+
+
+def _face(seed):
+    return np.random.default_rng(seed).normal(size=DIM).tolist()
+
+
+def _near(face, seed):
+    return (np.asarray(face) + np.random.default_rng(seed).normal(scale=0.05, size=DIM)).tolist()
+
+
+async def _enrolled(db):
+    matcher = FaceMatcher(db, dim=DIM, threshold=0.8)
+    for i in range(3):
+        await matcher.enroll(f"s{i}", "b1", _face(i))
+    return matcher
+
+
+async def test_probe_verifies_only_against_the_students_own_face(db):
+    matcher = await _enrolled(db)
+    match = await matcher.verify("b1", "s1", _near(_face(1), 10))
+    assert match["enrolled"] and match["verified"] and match["confidence"] > 0.9
+
+    # A classmate's face does not verify, whatever its score against s1
+    assert not (await matcher.verify("b1", "s1", _face(2)))["verified"]
+    assert await matcher.verify("b1", "s9", _face(1)) == {"enrolled": False, "verified": False, "confidence": None}
+
+
+async def test_match_many_and_reenrollment(db):
+    matcher = await _enrolled(db)
+    matches = await matcher.match_many("b1", [_near(_face(2), 11), _near(_face(0), 12), [1.0] * DIM])
+    assert [match["student_id"] for match in matches[:2]] == ["s2", "s0"]
+    assert await matcher.match_many("b2", [_face(0)]) == [{"student_id": None, "confidence": None}]
+
+    # Moving a student drops them from the old batch's cached matrix
+    await matcher.enroll("s2", "b2", _face(2))
+    assert (await matcher.match_many("b1", [_face(2)]))[0]["student_id"] != "s2"
+    assert (await matcher.match_many("b2", [_face(2)]))[0]["student_id"] == "s2"
+
+
+async def test_bad_embeddings_are_rejected(db):
+    matcher = await _enrolled(db)
+    with pytest.raises(EmbeddingError):
+        await matcher.verify("b1", "s0", [0.0] * DIM)
+    with pytest.raises(EmbeddingError):
+        await matcher.enroll("s0", "b1", _face(0)[:-1])
+
+
+async def test_client_claims_of_a_face_check_are_not_stored_without_a_probe(server, app_client):
+    async with app_client() as api:
+        faculty = await api.register("face.faculty@iiitdm.ac.in", "faculty")
+        batch = (await api.post("/admin/batches", json={"name": "Face", "code": "FC1"}, headers=faculty)).json()
+        hall = (await api.post("/admin/halls", json={
+            "name": "Face hall", "code": "FH1", "mac_address": "00:00:00:00:00:01", "capacity": 10,
+        }, headers=faculty)).json()
+        now = datetime.utcnow()
+        window = (await api.post("/admin/attendance-window", json={
+            "hall_id": hall["id"],
+            "batch_id": batch["id"],
+            "start_time": (now - timedelta(minutes=5)).isoformat(),
+            "end_time": (now + timedelta(minutes=30)).isoformat(),
+            "created_by": "face.faculty",
+        }, headers=faculty)).json()
+
+        student = await api.register("face.student@iiitdm.ac.in", batch=batch["id"])
+        response = await api.post("/student/mark-attendance", params={
+            "hall_id": hall["id"], "attendance_window_id": window["id"], "face_confidence": 0.99,
+        }, headers=student)
+        assert response.status_code == 200, response.text
+
+        record = await server.attendance_records.find_one(
+            {"attendance_window_id": window["id"]}, {"_id": 0, "face_confidence": 1, "verification_method": 1}
+        )
+        assert record == {"face_confidence": None, "verification_method": "unverified"}
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from attendance_buckets import BucketedRecords
+from finalization import SUMMARY_COLLECTION, WindowFinalizer
+
+NOW = datetime(2026, 3, 2, 12, 0)
+
+
+def _window(window_id, batch_id, ended_minutes_ago):
+    end = NOW - timedelta(minutes=ended_minutes_ago)
+    return {
+        "id": window_id,
+        "batch_id": batch_id,
+        "hall_id": "h1",
+        "start_time": end - timedelta(minutes=50),
+        "end_time": end,
+        "finalized_at": None,
+    }
+
+
+def _mark(window_id, student_id):
+    return {"id": f"{window_id}-{student_id}", "attendance_window_id": window_id, "student_id": student_id,
+            "batch_id": "b1", "hall_id": "h1", "marked_at": NOW}
+
+
+async def _seed(db, source):
+    await db.users.insert_many(
+        [{"id": f"s{i}", "role": "student", "batch": "b1"} for i in range(1, 5)]
+        + [{"id": "t1", "role": "student", "batch": "b2"}, {"id": "f1", "role": "faculty", "batch": None}]
+    )
+    await db.attendance_windows.insert_many([
+        _window("w1", "b1", ended_minutes_ago=120),
+        _window("w2", "b2", ended_minutes_ago=90),
+        _window("w3", "b1", ended_minutes_ago=60),
+        # Still inside the grace period
+        _window("w4", "b1", ended_minutes_ago=0.5),
+    ])
+    for window_id, student_id in [("w1", "s1"), ("w1", "s2"), ("w3", "s1"), ("w3", "s2"), ("w3", "s3"), ("w3", "s4")]:
+        await source.insert_one(_mark(window_id, student_id))
+
+
+@pytest.fixture(params=["records", "buckets"])
+def source(request, db):
+    return db.attendance_records if request.param == "records" else BucketedRecords(db)
+
+
+async def test_ended_windows_get_absentee_summaries(db, source):
+    await _seed(db, source)
+    finalizer = WindowFinalizer(db, source, grace_seconds=60, chunk_size=2)
+
+    result = await finalizer.run_once(NOW)
+    assert result["windows_finalized"] == 3
+    assert result["absentees"] == 2 + 1 + 0
+
+    summaries = {doc["window_id"]: doc for doc in await db[SUMMARY_COLLECTION].find({}).to_list(None)}
+    assert set(summaries) == {"w1", "w2", "w3"}
+    assert summaries["w1"]["present"] == ["s1", "s2"] and summaries["w1"]["absent"] == ["s3", "s4"]
+    assert summaries["w1"]["roster_size"] == 4 and summaries["w1"]["absent_count"] == 2
+    assert summaries["w2"]["absent"] == ["t1"] and summaries["w2"]["present_count"] == 0
+    assert summaries["w3"]["absent"] == []
+
+    stamped = await db.attendance_windows.distinct("id", {"finalized_at": NOW})
+    assert sorted(stamped) == ["w1", "w2", "w3"]
+
+
+async def test_finalizing_again_is_a_no_op(db, source):
+    await _seed(db, source)
+    finalizer = WindowFinalizer(db, source, grace_seconds=60)
+    await finalizer.run_once(NOW)
+    assert (await finalizer.run_once(NOW + timedelta(seconds=10)))["windows_finalized"] == 0
+    # w4 is picked up once its grace period is over
+    later = await finalizer.run_once(NOW + timedelta(minutes=5))
+    assert later["windows_finalized"] == 1 and later["absentees"] == 4
+    assert await db[SUMMARY_COLLECTION].count_documents({}) == 4
+
+
+async def test_recomputing_a_window_replaces_its_summary(db, source):
+    await _seed(db, source)
+    finalizer = WindowFinalizer(db, source, grace_seconds=60)
+    windows = await db.attendance_windows.find({"id": "w1"}, {"_id": 0}).to_list(None)
+    await finalizer.finalize(windows, NOW)
+    await source.insert_one(_mark("w1", "s3"))
+    await finalizer.finalize(windows, NOW)
+
+    summary = await db[SUMMARY_COLLECTION].find_one({"_id": "w1"})
+    assert summary["absent"] == ["s4"]
+    assert await db[SUMMARY_COLLECTION].count_documents({}) == 1
+
+
+async def test_windows_ended_before_the_cutoff_are_left_alone(db, source):
+    await _seed(db, source)
+    finalizer = WindowFinalizer(db, source, grace_seconds=60, since=NOW - timedelta(minutes=100))
+    result = await finalizer.run_once(NOW)
+    assert result["windows_finalized"] == 2
+    assert sorted(await db[SUMMARY_COLLECTION].distinct("window_id")) == ["w2", "w3"]
+    assert (await db.attendance_windows.find_one({"id": "w1"}))["finalized_at"] is None
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from idempotency import IDEMPOTENCY_COLLECTION, IdempotencyConflict, IdempotencyStore
+
+
+def _counting(result=None, exc=None):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0)
+        if exc is not None:
+            raise exc
+        return result
+
+    return handler, calls
+
+
+async def test_repeat_is_replayed_without_running_the_handler(db):
+    store = IdempotencyStore(db)
+    handler, calls = _counting({"ok": True})
+    assert await store.run("k", handler) == ((200, {"ok": True}), False)
+    assert await store.run("k", handler) == ((200, {"ok": True}), True)
+    assert len(calls) == 1
+
+
+async def test_concurrent_repeats_on_one_worker_share_the_first_run(db):
+    store = IdempotencyStore(db)
+    handler, calls = _counting({"ok": True})
+    results = await asyncio.gather(*(store.run("k", handler) for _ in range(5)))
+    assert [replayed for _, replayed in results].count(False) == 1
+    assert len(calls) == 1
+
+
+async def test_permanent_errors_are_replayed(db):
+    store = IdempotencyStore(db)
+    handler, calls = _counting(exc=HTTPException(status_code=400, detail="Attendance already marked"))
+    permanent = lambda exc: exc.detail == "Attendance already marked"  # noqa: E731
+    assert await store.run("k", handler, permanent) == ((400, {"detail": "Attendance already marked"}), False)
+    assert await store.run("k", handler, permanent) == ((400, {"detail": "Attendance already marked"}), True)
+    assert len(calls) == 1
+
+
+async def test_transient_errors_release_the_key(db):
+    store = IdempotencyStore(db)
+    failing, _ = _counting(exc=HTTPException(status_code=400, detail="Attendance window not active"))
+    assert (await store.run("k", failing))[0][0] == 400
+    assert await db[IDEMPOTENCY_COLLECTION].count_documents({}) == 0
+
+    handler, calls = _counting({"ok": True})
+    assert await store.run("k", handler) == ((200, {"ok": True}), False)
+    assert len(calls) == 1
+
+
+async def test_server_errors_are_raised_and_not_stored(db):
+    store = IdempotencyStore(db)
+    failing, _ = _counting(exc=RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        await store.run("k", failing)
+    assert await db[IDEMPOTENCY_COLLECTION].count_documents({}) == 0
+
+
+async def test_live_claim_from_another_worker_conflicts(db):
+    await db[IDEMPOTENCY_COLLECTION].insert_one(
+        {"_id": "k", "state": "pending", "expires_at": datetime.utcnow() + timedelta(seconds=30)}
+    )
+    handler, calls = _counting({"ok": True})
+    with pytest.raises(IdempotencyConflict):
+        await IdempotencyStore(db).run("k", handler)
+    assert calls == []
+
+
+async def test_expired_claim_is_taken_over(db):
+    await db[IDEMPOTENCY_COLLECTION].insert_one(
+        {"_id": "k", "state": "pending", "expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    store = IdempotencyStore(db)
+    handler, calls = _counting({"ok": True})
+    assert await store.run("k", handler) == ((200, {"ok": True}), False)
+    assert len(calls) == 1
+    assert store.stats()["taken_over"] == 1
+    doc = await db[IDEMPOTENCY_COLLECTION].find_one({"_id": "k"})
+    assert doc["state"] == "done" and doc["expires_at"] > datetime.utcnow() + timedelta(hours=1)
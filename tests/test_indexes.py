@@ -0,0 +1,31 @@
+import asyncio
+
+from indexes import INDEXES, ensure_indexes, has_unique_index, verify_query_plans
+
+
+class Unreachable:
+    """A database whose server never answers."""
+
+    async def command(self, name):
+        await asyncio.sleep(3600)
+
+    def __getitem__(self, name):
+        raise AssertionError("no index work without a reachable server")
+
+
+async def test_indexes_are_created_and_hot_queries_use_them(db):
+    report = await ensure_indexes(db)
+    assert all(not result["failed"] for result in report.values())
+    assert "ttl_timestamp" in report["status_checks"]["created"]
+    assert await has_unique_index(db.attendance_records, ("attendance_window_id", "student_id"))
+    assert not await has_unique_index(db.attendance_records, ("student_id", "attendance_window_id"))
+
+    assert not [plan for plan in await verify_query_plans(db) if plan["collscan"]]
+
+
+async def test_unreachable_server_skips_every_index():
+    report = await asyncio.wait_for(ensure_indexes(Unreachable(), ping_timeout=0.05), timeout=1)
+    for collection, models in INDEXES.items():
+        assert report[collection]["created"] == []
+        assert set(report[collection]["failed"]) >= {model.document["name"] for model in models}
+    assert "no reply to ping" in report["users"]["failed"]["uniq_email"]
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from memory_db import MemoryCollection
+
+
+async def _seed(collection, count=10):
+    await collection.insert_many([
+        {"id": f"u{i}", "batch": "a" if i % 2 else "b", "score": i, "tags": ["x"] if i < 3 else []}
+        for i in range(count)
+    ])
+
+
+async def test_query_operators(db):
+    await _seed(db.users)
+
+    async def ids(query):
+        return sorted(doc["id"] for doc in await db.users.find(query).to_list(None))
+
+    assert await ids({"batch": "a", "score": {"$gte": 5}}) == ["u5", "u7", "u9"]
+    assert await ids({"score": {"$in": [1, 2]}}) == ["u1", "u2"]
+    assert await ids({"score": {"$nin": list(range(1, 10))}}) == ["u0"]
+    assert await ids({"$or": [{"score": 0}, {"score": 9}]}) == ["u0", "u9"]
+    assert await ids({"tags": "x"}) == ["u0", "u1", "u2"]
+    assert await ids({"missing": {"$exists": False}, "score": {"$lt": 1}}) == ["u0"]
+    assert await db.users.count_documents({"batch": {"$ne": "a"}}) == 5
+
+
+async def test_sort_skip_limit_and_projection(db):
+    await _seed(db.users)
+    docs = await db.users.find({}, {"_id": 0, "id": 1}).sort([("batch", 1), ("score", -1)]).skip(1).limit(3).to_list(None)
+    assert docs == [{"id": "u7"}, {"id": "u5"}, {"id": "u3"}]
+
+    await db.presence.insert_one({"_id": "s1", "halls": {"h1": {"rssi": -60}, "h2": {"rssi": -70}}})
+    assert await db.presence.find_one({}, {"_id": 0, "halls.h2": 1}) == {"halls": {"h2": {"rssi": -70}}}
+
+
+async def test_updates_and_upsert(db):
+    await db.counters.update_one({"_id": "c"}, {"$inc": {"n": 2}, "$setOnInsert": {"created": True}}, upsert=True)
+    await db.counters.update_one({"_id": "c"}, {"$inc": {"n": 3}, "$setOnInsert": {"created": False}}, upsert=True)
+    await db.counters.update_one({"_id": "c"}, {"$addToSet": {"ids": {"$each": ["a", "b", "a"]}}})
+    assert await db.counters.find_one({"_id": "c"}) == {"_id": "c", "n": 5, "created": True, "ids": ["a", "b"]}
+
+
+async def test_index_plans(db):
+    await _seed(db.users)
+    await db.users.create_index([("batch", 1), ("score", 1)], name="batch_score")
+
+    plan = await db.users.find({"batch": "a", "score": {"$gt": 3}}).explain()
+    assert plan["queryPlanner"]["winningPlan"]["inputStage"]["indexName"] == "batch_score"
+    plan = await db.users.find({"score": 3}).explain()
+    assert plan["queryPlanner"]["winningPlan"]["stage"] == "COLLSCAN"
+
+
+async def test_array_values_make_an_index_multikey(db):
+    await _seed(db.users)
+    await db.users.create_index("tags")
+    # Not used for planning once it has seen arrays, so array matches stay correct
+    plan = await db.users.find({"tags": "x"}).explain()
+    assert plan["queryPlanner"]["winningPlan"]["stage"] == "COLLSCAN"
+    assert await db.users.count_documents({"tags": "x"}) == 3
+
+
+async def test_unique_index(db):
+    await db.users.create_index("email", unique=True)
+    await db.users.insert_one({"email": "a@x"})
+    with pytest.raises(DuplicateKeyError):
+        await db.users.insert_one({"email": "a@x"})
+    await db.users.insert_one({"email": "b@x", "name": "a"})
+    await db.users.insert_one({"email": "c@x", "name": "a"})
+    with pytest.raises(DuplicateKeyError):
+        await db.users.create_index("name", unique=True)
+
+    info = await db.users.index_information()
+    assert info["email_1"]["unique"] is True
+    assert "name_1" not in info
+
+
+async def test_ttl_index_expires_documents(db, monkeypatch):
+    monkeypatch.setattr(MemoryCollection, "ttl_monitor_seconds", 0)
+    await db.status_checks.create_index("timestamp", expireAfterSeconds=60)
+    now = datetime.utcnow()
+    await db.status_checks.insert_many([
+        {"_id": "old", "timestamp": now - timedelta(minutes=5)},
+        {"_id": "new", "timestamp": now},
+    ])
+    assert [doc["_id"] for doc in await db.status_checks.find({}).to_list(None)] == ["new"]
+
+
+async def test_datetimes_are_stored_at_millisecond_precision(db):
+    marked_at = datetime(2026, 1, 5, 9, 30, 0, 123456)
+    await db.records.insert_one({"_id": 1, "marked_at": marked_at})
+    await db.records.update_one({"_id": 1}, {"$set": {"seen_at": marked_at}})
+
+    doc = await db.records.find_one({"_id": 1})
+    assert doc["marked_at"] == doc["seen_at"] == datetime(2026, 1, 5, 9, 30, 0, 123000)
+    # Query operands are compared at the same precision
+    assert await db.records.count_documents({"marked_at": {"$gte": marked_at}}) == 1
+
+
+async def test_rename_replaces_the_target_under_existing_handles(db):
+    live, scratch = db.live, db.scratch
+    await live.insert_one({"_id": "old"})
+    await scratch.create_index("n", name="n")
+    await scratch.insert_one({"_id": "new", "n": 1})
+    with pytest.raises(OperationFailure):
+        await scratch.rename("live")
+
+    await scratch.rename("live", dropTarget=True)
+    assert await live.find({}).to_list(None) == [{"_id": "new", "n": 1}]
+    assert "n" in await live.index_information()
+    assert await scratch.count_documents({}) == 0
@@ -0,0 +1,85 @@
+import logging
+from types import SimpleNamespace
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from metrics import Histogram, MetricsMiddleware, MetricsRegistry, MongoCommandTimer, query_shape
+
+
+def test_histogram_buckets_are_upper_bounds():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.01, 0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    # The bound itself falls in its bucket; values past the last bound only count in +Inf
+    assert histogram.counts == [1, 2, 1]
+    assert histogram.total == 5 and histogram.sum == 3.66
+
+    registry = MetricsRegistry()
+    registry.request_latency[("GET", "/api/x")] = histogram
+    lines = registry.render().splitlines()
+    buckets = [line for line in lines if line.startswith("http_request_duration_seconds_bucket")]
+    assert buckets == [
+        'http_request_duration_seconds_bucket{method="GET",route="/api/x",le="0.01"} 1',
+        'http_request_duration_seconds_bucket{method="GET",route="/api/x",le="0.1"} 3',
+        'http_request_duration_seconds_bucket{method="GET",route="/api/x",le="1.0"} 4',
+        'http_request_duration_seconds_bucket{method="GET",route="/api/x",le="+Inf"} 5',
+    ]
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/x"} 5' in lines
+
+
+def test_gauges_and_label_escaping():
+    registry = MetricsRegistry()
+    registry.add_gauge_source("cache", lambda: {"hits": 3, "enabled": True, "name": "lru"})
+    registry.observe_mongo('we"ird', "find", 0.002, failed=True)
+    text = registry.render()
+    assert "attendance_cache_hits 3.0" in text and "attendance_cache_enabled 1.0" in text
+    assert "attendance_cache_name" not in text
+    assert 'mongo_command_failures_total{collection="we\\"ird",command="find"} 1' in text
+
+
+def test_query_shapes_keep_keys_not_values():
+    assert query_shape("find", {"find": "users", "filter": {"email": "a@x", "role": "student"}}) == \
+        "find users ['email', 'role']"
+    update = {"update": "attendance_windows", "updates": [{"q": {"is_active": True, "end_time": {"$lt": 1}}}]}
+    assert query_shape("update", update) == "update attendance_windows ['end_time', 'is_active']"
+    assert query_shape("getMore", {"getMore": 1, "collection": "halls"}) == "getMore halls []"
+
+
+def _event(request_id, name, command, micros=2000):
+    return SimpleNamespace(request_id=request_id, connection_id=("db", 27017), command_name=name,
+                           command=command, duration_micros=micros)
+
+
+async def test_slow_requests_are_logged_with_their_queries(caplog):
+    registry = MetricsRegistry()
+    timer = MongoCommandTimer(registry)
+
+    async def item(request):
+        # What pymongo reports for the query issued by this handler
+        event = _event(1, "find", {"find": "items", "filter": {"id": request.path_params["item_id"]}})
+        timer.started(event)
+        timer.succeeded(event)
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/items/{item_id}", item)])
+    app.add_middleware(MetricsMiddleware, registry=registry, router=app.router, slow_request_seconds=0)
+
+    # Commands outside any request are timed but not attributed
+    background = _event(2, "delete", {"delete": "rate_limits"})
+    timer.started(background)
+    timer.failed(background)
+
+    with caplog.at_level(logging.WARNING, logger="metrics"):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            assert (await client.get("/items/42")).status_code == 200
+            assert (await client.get("/nowhere")).status_code == 404
+
+    assert "Slow request GET /items/{item_id} 200" in caplog.text and "find items ['id'] 2.0ms" in caplog.text
+    assert registry.request_status[("GET", "/items/{item_id}", 200)] == 1
+    assert registry.request_status[("GET", "unmatched", 404)] == 1
+    assert registry.in_flight[("GET", "/items/{item_id}")] == 0
+    assert registry.mongo_latency[("items", "find")].total == 1
+    assert registry.mongo_failures[("rate_limits", "delete")] == 1
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from pagination import decode_cursor, encode_cursor, fetch_page, fields_projection, ndjson_rows
+
+SORT = ("created_at", "id")
+
+
+async def _seed(collection, count):
+    start = datetime(2026, 1, 5, 9, 0)
+    # Pairs of rows share a created_at so the id tiebreaker matters
+    await collection.insert_many([
+        {"id": f"b{i:03d}", "created_at": start + timedelta(minutes=i // 2), "name": f"Batch {i}"}
+        for i in range(count)
+    ])
+
+
+def test_cursor_round_trip():
+    doc = {"created_at": datetime(2026, 1, 5, 9, 30, 15, 250000), "id": "b007"}
+    assert decode_cursor(encode_cursor(doc, SORT), SORT) == [doc["created_at"], doc["id"]]
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "WzFd", encode_cursor({"id": "x"}, ("id",))])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, SORT)
+    assert exc.value.status_code == 400
+
+
+async def test_pages_cover_every_row_once(db):
+    await _seed(db.batches, 25)
+    seen, cursor, pages = [], None, 0
+    while True:
+        docs, cursor = await fetch_page(db.batches, {}, SORT, 4, cursor, fields_projection(["id", "created_at"]))
+        seen.extend(doc["id"] for doc in docs)
+        pages += 1
+        if cursor is None:
+            break
+    assert seen == [f"b{i:03d}" for i in range(25)]
+    assert pages == 7
+
+
+async def test_exact_multiple_of_the_page_size_has_no_empty_last_page(db):
+    await _seed(db.batches, 8)
+    docs, cursor = await fetch_page(db.batches, {}, SORT, 4)
+    docs, cursor = await fetch_page(db.batches, {}, SORT, 4, cursor)
+    assert len(docs) == 4 and cursor is None
+
+
+async def test_ndjson_rows(db):
+    await _seed(db.batches, 3)
+    lines = [line async for line in ndjson_rows(db.batches.find({}, {"_id": 0}).sort("id", 1))]
+    assert [orjson.loads(line)["id"] for line in lines] == ["b000", "b001", "b002"]
+    assert orjson.loads(lines[0])["created_at"] == "2026-01-05T09:00:00"
+    assert all(line.endswith(b"\n") for line in lines)
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+
+import password_hashing
+from password_hashing import HashingPoolSaturated, PasswordHasher, check_password
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(executor="thread", workers=1, max_queue=1)
+    yield hasher
+    hasher.shutdown()
+
+
+async def test_hashes_verify(hasher):
+    hashed = await hasher.hash("secret123")
+    assert await hasher.verify("secret123", hashed) and not await hasher.verify("wrong", hashed)
+    assert check_password("secret123", hashed)
+    assert hasher.stats()["completed"] == 3 and hasher.stats()["avg_run_ms"] > 0
+
+
+async def test_full_queue_is_rejected_with_a_retry_estimate(hasher, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(password_hashing, "hash_password", lambda password: release.wait(5) and password)
+
+    running = asyncio.ensure_future(hasher.hash("a"))
+    await asyncio.sleep(0.02)
+    waiting = asyncio.ensure_future(hasher.hash("b"))
+    await asyncio.sleep(0.02)
+    assert hasher.stats()["running"] == 1 and hasher.stats()["waiting"] == 1
+
+    with pytest.raises(HashingPoolSaturated) as rejected:
+        await hasher.hash("c")
+    assert rejected.value.retry_after >= 1
+    assert hasher.stats()["rejected"] == 1
+
+    release.set()
+    assert await asyncio.gather(running, waiting) == ["a", "b"]
+    assert hasher.stats()["waiting"] == 0 and hasher.stats()["completed"] == 2
+    assert await hasher.hash("d") == "d"
+
+
+def test_retry_after_covers_the_queue_ahead():
+    hasher = PasswordHasher(workers=2)
+    hasher.completed, hasher.total_run_seconds = 10, 5.0
+    hasher.running, hasher.waiting = 2, 6
+    # 8 hashes of 0.5s each over 2 workers
+    assert hasher._retry_after() == 2
+    hasher.running = hasher.waiting = 0
+    assert hasher._retry_after() == 1
+
+
+async def _saturated(*args):
+    raise HashingPoolSaturated(7)
+
+
+async def test_saturation_is_a_503_with_retry_after(server, app_client, monkeypatch):
+    async with app_client() as api:
+        await api.register("busy.student@iiitdm.ac.in")
+        monkeypatch.setattr(server.password_hasher, "hash", _saturated)
+        monkeypatch.setattr(server.password_hasher, "verify", _saturated)
+
+        register = {"email": "busy.other@iiitdm.ac.in", "password": "x", "full_name": "B", "role": "student"}
+        login = {"email": "busy.student@iiitdm.ac.in", "password": "secret123"}
+        for path, body in (("/auth/register", register), ("/auth/login", login)):
+            response = await api.post(path, json=body)
+            assert response.status_code == 503
+            assert response.headers["retry-after"] == "7"
@@ -0,0 +1,137 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import rate_limit
+from rate_limit import AdmissionControl, AdmissionMiddleware, MemoryBuckets, MongoBuckets, retry_after_header
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only rate_limit sees the fake clock; the event loop keeps the real one
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock, time=clock))
+    return clock
+
+
+async def test_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    buckets = MemoryBuckets()
+    assert [await buckets.take("k", rate=2, burst=3) for _ in range(3)] == [0, 0, 0]
+    assert await buckets.take("k", rate=2, burst=3) == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert await buckets.take("k", rate=2, burst=3) == 0
+    assert await buckets.take("k", rate=2, burst=3) > 0
+
+    # Refill is capped at the burst size
+    clock.now += 60
+    assert [await buckets.take("k", rate=2, burst=3) for _ in range(4)].count(0) == 3
+
+
+async def test_buckets_are_per_key_and_least_recently_used_keys_are_evicted(clock):
+    buckets = MemoryBuckets(max_keys=2)
+    await buckets.take("a", rate=1, burst=1)
+    assert await buckets.take("b", rate=1, burst=1) == 0
+    await buckets.take("c", rate=1, burst=1)
+    # "a" was evicted, so it starts again with a full bucket
+    assert await buckets.take("a", rate=1, burst=1) == 0
+    assert await buckets.take("c", rate=1, burst=1) > 0
+
+
+async def test_mongo_buckets_use_fixed_windows(db, clock):
+    clock.now = 1_000_000.0
+    buckets = MongoBuckets(db)
+    assert [await buckets.take("k", rate=1, burst=2) for _ in range(2)] == [0, 0]
+    assert await buckets.take("k", rate=1, burst=2) == pytest.approx(2)
+    clock.now += 2
+    assert await buckets.take("k", rate=1, burst=2) == 0
+
+
+def _scope(ip="10.0.0.1", token=None):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return {"type": "http", "client": (ip, 1234), "headers": headers}
+
+
+async def test_admission_limits_students_and_ips_separately(clock):
+    control = AdmissionControl(
+        MemoryBuckets(),
+        limits={"POST /api/student/mark-attendance": {"student": {"rate": 1, "burst": 1}}},
+        identify=lambda token: token,
+    )
+    route = "/api/student/mark-attendance"
+    assert await control.rate_limit_wait(_scope(token="s1"), "POST", route) == 0
+    assert await control.rate_limit_wait(_scope(token="s1"), "POST", route) > 0
+    # Another student behind the same address is unaffected
+    assert await control.rate_limit_wait(_scope(token="s2"), "POST", route) == 0
+    assert await control.rate_limit_wait(_scope(token="s1"), "GET", route) == 0
+    assert control.stats()["rate_limited"] == 1
+
+
+async def test_login_is_limited_per_identifier(clock):
+    control = AdmissionControl(
+        MemoryBuckets(),
+        limits={"POST /api/auth/login": {"identifier": {"rate": 0.2, "burst": 2}, "ip": {"rate": 100, "burst": 1000}}},
+        identify=lambda token: None,
+    )
+    waits = [await control.identifier_wait("POST", "/api/auth/login", "S1@iiitdm.ac.in") for _ in range(3)]
+    assert waits[:2] == [0, 0] and waits[2] == pytest.approx(5)
+    assert await control.identifier_wait("POST", "/api/auth/login", "s1@IIITDM.ac.in") > 0
+    assert await control.identifier_wait("POST", "/api/auth/login", "s2@iiitdm.ac.in") == 0
+    # The shared NAT address still has plenty of headroom
+    assert await control.rate_limit_wait(_scope(), "POST", "/api/auth/login") == 0
+
+
+async def test_slow_logins_do_not_hold_the_write_slots():
+    release = asyncio.Event()
+
+    async def login(request):
+        # Stuck behind the hashing pool
+        await release.wait()
+        return PlainTextResponse("token")
+
+    async def mark(request):
+        return PlainTextResponse("marked")
+
+    app = Starlette(routes=[
+        Route("/api/auth/login", login, methods=["POST"]),
+        Route("/api/student/mark-attendance", mark, methods=["POST"]),
+    ])
+    control = AdmissionControl(
+        MemoryBuckets(), limits={}, identify=lambda token: None,
+        write_concurrency=2, write_queue=0, write_queue_timeout=0.05,
+        write_exempt=["POST /api/auth/login"],
+    )
+    app.add_middleware(AdmissionMiddleware, control=control, router=app.router)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        logins = [asyncio.create_task(client.post("/api/auth/login")) for _ in range(10)]
+        await asyncio.sleep(0.05)
+        marks = [await client.post("/api/student/mark-attendance") for _ in range(3)]
+        assert [response.status_code for response in marks] == [200] * 3
+        assert control.stats()["writes_running"] == 0
+        release.set()
+        assert all(response.status_code == 200 for response in await asyncio.gather(*logins))
+
+    # Marks themselves still take slots and are shed once those run out
+    assert await control.acquire_write_slot("POST", "/api/student/mark-attendance")
+    assert await control.acquire_write_slot("POST", "/api/student/mark-attendance")
+    assert await control.acquire_write_slot("POST", "/api/student/mark-attendance") is False
+    assert await control.acquire_write_slot("POST", "/api/auth/login") is None
+
+
+def test_retry_after_is_a_whole_number_of_seconds():
+    assert retry_after_header(0.2) == {"Retry-After": "1"}
+    assert retry_after_header(2.5) == {"Retry-After": "3"}
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+import pytest
+
+from refresh_tokens import RefreshTokenReused, RefreshTokenStore
+
+EMAIL = "s1@iiitdm.ac.in"
+
+
+@pytest.fixture
+def store(db):
+    return RefreshTokenStore(db, ttl=timedelta(days=7))
+
+
+async def test_rotation_keeps_the_family(store):
+    jti, family, _ = await store.issue(EMAIL)
+    assert family == jti
+    next_jti, next_family, _ = await store.rotate(jti, EMAIL)
+    assert next_jti != jti and next_family == family
+    third_jti, _, _ = await store.rotate(next_jti, EMAIL)
+    assert third_jti not in (jti, next_jti)
+
+
+async def test_reusing_a_rotated_token_revokes_the_family(store):
+    jti, _, _ = await store.issue(EMAIL)
+    successor, _, _ = await store.rotate(jti, EMAIL)
+
+    with pytest.raises(RefreshTokenReused):
+        await store.rotate(jti, EMAIL)
+    # The legitimate successor is revoked too
+    with pytest.raises(RefreshTokenReused):
+        await store.rotate(successor, EMAIL)
+
+
+async def test_token_is_bound_to_its_user(store):
+    jti, _, _ = await store.issue(EMAIL)
+    with pytest.raises(RefreshTokenReused):
+        await store.rotate(jti, "other@iiitdm.ac.in")
+
+
+async def test_unknown_token_is_rejected(store):
+    with pytest.raises(RefreshTokenReused):
+        await store.rotate("missing", EMAIL)
+
+
+async def test_revocation_leaves_other_sessions_alone(store):
+    phone, phone_family, _ = await store.issue(EMAIL)
+    laptop, _, _ = await store.issue(EMAIL)
+    other, _, _ = await store.issue("s2@iiitdm.ac.in")
+
+    await store.revoke_family(phone_family)
+    with pytest.raises(RefreshTokenReused):
+        await store.rotate(phone, EMAIL)
+    laptop, _, _ = await store.rotate(laptop, EMAIL)
+
+    await store.revoke_user(EMAIL)
+    with pytest.raises(RefreshTokenReused):
+        await store.rotate(laptop, EMAIL)
+    await store.rotate(other, "s2@iiitdm.ac.in")
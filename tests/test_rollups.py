@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from rollups import ROLLUP_COLLECTION, MarkingOpen, rebuild_rollups, record_mark
+
+START = datetime(2026, 3, 2, 9, 0)
+
+
+def _records():
+    records = []
+    for window in range(3):
+        for student in range(4 - window):
+            records.append({
+                "id": f"w{window}-s{student}",
+                "attendance_window_id": f"w{window}",
+                "student_id": f"s{student}",
+                "batch_id": "b1" if student < 2 else "b2",
+                "marked_at": START + timedelta(days=window, minutes=student),
+            })
+    return records
+
+
+async def _counters(db):
+    docs = await db[ROLLUP_COLLECTION].find({}, {"rebuilt_at": 0}).sort("_id", 1).to_list(None)
+    return {doc.pop("_id"): doc for doc in docs}
+
+
+async def test_incremental_counts_match_a_rebuild(db):
+    for record in _records():
+        await db.attendance_records.insert_one(record)
+        await record_mark(db, record)
+    incremental = await _counters(db)
+    assert incremental["student:s0"] == {"scope": "student", "key": "s0", "batch_id": "b1", "attended": 3,
+                                         "last_marked_at": START + timedelta(days=2)}
+    assert incremental["window:w0"]["attended"] == 4 and incremental["batch:b2"]["attended"] == 3
+
+    # A stale counter disappears with the old collection
+    await db[ROLLUP_COLLECTION].insert_one({"_id": "student:gone", "scope": "student", "key": "gone", "attended": 9})
+    counts = await rebuild_rollups(db)
+    assert counts == {"student": 4, "window": 3, "batch": 2}
+    assert await _counters(db) == incremental
+    assert "scope_batch" in await db[ROLLUP_COLLECTION].index_information()
+
+    # Live marks keep counting on top of the rebuilt collection
+    await record_mark(db, {**_records()[0], "marked_at": START + timedelta(days=3)})
+    assert (await db[ROLLUP_COLLECTION].find_one({"_id": "student:s0"}))["attended"] == 4
+
+
+async def test_rebuild_refuses_while_a_window_is_open(db):
+    now = datetime.utcnow()
+    await db.attendance_windows.insert_one({"id": "w", "is_active": True, "start_time": now - timedelta(minutes=5),
+                                            "end_time": now + timedelta(minutes=5)})
+    with pytest.raises(MarkingOpen):
+        await rebuild_rollups(db)
+    assert await rebuild_rollups(db, force=True) == {"student": 0, "window": 0, "batch": 0}
@@ -0,0 +1,86 @@
+import pytest
+
+from password_hashing import PasswordHasher, check_password
+from roster_import import import_roster, parse_roster
+
+ROSTER = """email,full_name,password,role,batch
+a@iiitdm.ac.in,A,pw-a,student,b1
+b@iiitdm.ac.in,B,pw-b,,b1
+taken@iiitdm.ac.in,T,pw-t,student,b1
+bad@gmail.com,Bad,pw,student,b1
+a@iiitdm.ac.in,A again,pw,student,b1
+f@iiitdm.ac.in,F,pw-f,faculty,b1
+x@iiitdm.ac.in,X,pw-x,student,nope
+"""
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(executor="thread", workers=2, max_queue=1)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_parse_roster_reports_bad_rows():
+    rows, errors = parse_roster(ROSTER)
+    assert [row["email"] for row in rows] == [
+        "a@iiitdm.ac.in", "b@iiitdm.ac.in", "taken@iiitdm.ac.in", "f@iiitdm.ac.in", "x@iiitdm.ac.in",
+    ]
+    assert rows[1]["role"] == "student"
+    assert [(error["row"], error["error"]) for error in errors] == [
+        (4, "Only @iiitdm.ac.in email addresses are allowed"),
+        (5, "Duplicate email in file"),
+    ]
+
+
+async def test_hash_many_keeps_order_and_ignores_the_queue_bound(hasher):
+    passwords = [f"pw-{i}" for i in range(5)]
+    hashes = await hasher.hash_many(passwords, chunk_size=2)
+    assert all(check_password(password, hashed) for password, hashed in zip(passwords, hashes))
+    # Three chunks over two workers, despite max_queue=1
+    assert hasher.stats()["completed"] == 3 and hasher.stats()["rejected"] == 0
+
+
+async def test_import_roster(db, hasher):
+    await db.users.create_index("email", unique=True)
+    await db.users.insert_one({"id": "u0", "email": "taken@iiitdm.ac.in"})
+    await db.batches.insert_one({"id": "b1", "students": []})
+
+    rows, _ = parse_roster(ROSTER)
+    report = await import_roster(db, rows, hasher)
+
+    assert report["inserted"] == 4
+    assert report["rejected"] == [{"row": 3, "email": "taken@iiitdm.ac.in", "error": "Email already registered"}]
+    assert report["unknown_batches"] == ["nope"]
+    batch = await db.batches.find_one({"id": "b1"})
+    students = await db.users.find({"email": {"$in": ["a@iiitdm.ac.in", "b@iiitdm.ac.in"]}}).to_list(None)
+    assert sorted(batch["students"]) == sorted(student["id"] for student in students)
+
+    faculty = await db.users.find_one({"email": "f@iiitdm.ac.in"})
+    assert faculty["batch"] is None and check_password("pw-f", faculty["hashed_password"])
+
+
+async def test_emails_are_matched_case_insensitively(server, app_client):
+    async with app_client() as api:
+        await api.register("Case.Student@IIITDM.ac.in")
+        response = await api.post("/auth/register", json={
+            "email": "case.student@iiitdm.ac.in", "password": "x", "full_name": "Twin", "role": "student",
+        })
+        assert response.status_code == 400
+
+        # Imported rows land on the same key, so the unique index rejects them too
+        rows, _ = parse_roster("email,full_name,password\nCASE.student@iiitdm.ac.in,Twin,pw\n")
+        assert rows[0]["email"] == "case.student@iiitdm.ac.in"
+
+        for email in ("case.student@iiitdm.ac.in", "CASE.STUDENT@iiitdm.ac.in"):
+            response = await api.post("/auth/login", json={"email": email, "password": "secret123"})
+            assert response.status_code == 200, response.text
+            assert response.json()["user"]["email"] == "case.student@iiitdm.ac.in"
+
+        # Accounts stored before normalization still log in as typed
+        await server.db.users.insert_one({
+            "id": "legacy", "email": "Legacy.User@iiitdm.ac.in", "role": "student", "full_name": "Legacy",
+            "hashed_password": await server.get_password_hash("secret123"),
+        })
+        response = await api.post("/auth/login", json={"email": "Legacy.User@iiitdm.ac.in", "password": "secret123"})
+        assert response.status_code == 200, response.text
@@ -0,0 +1,27 @@
+async def test_warm_up_is_timed_and_reported(server, app_client, monkeypatch):
+    monkeypatch.setattr(server, "WARMUP_ON_STARTUP", True)
+    monkeypatch.setattr(server, "startup_report", {})
+    async with app_client() as api:
+        report = server.startup_report
+        assert report["ready_ms"] >= 0
+        assert set(report["warm_up"]) == {"pool_ms", "reference_data_ms", "bcrypt_ms", "bcrypt_hash_ms"}
+        # The warm-up hashes seeded the Retry-After estimate
+        assert report["warm_up"]["bcrypt_hash_ms"] > 0
+
+        faculty = await api.register("startup.faculty@iiitdm.ac.in", "faculty")
+        response = await api.get("/admin/stats", headers=faculty)
+        assert response.status_code == 200
+        assert response.json()["startup"] == report
+
+
+async def _failing_warm_up():
+    raise ConnectionError("no route to host")
+
+
+async def test_failed_warm_up_still_serves(server, app_client, monkeypatch):
+    monkeypatch.setattr(server, "WARMUP_ON_STARTUP", True)
+    monkeypatch.setattr(server, "startup_report", {})
+    monkeypatch.setattr(server, "warm_up", _failing_warm_up)
+    async with app_client() as api:
+        assert "warm_up" not in server.startup_report and server.startup_report["ready_ms"] >= 0
+        await api.register("cold.student@iiitdm.ac.in")
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from timetable import TIMETABLE_COLLECTION, TimetableScheduler, occurrences, window_id
+
+# Monday, 05:30 in Kolkata
+NOW = datetime(2026, 3, 2, 0, 0)
+
+
+def _entry(weekday=0, start="09:00", end="09:50", entry_id="t1"):
+    return {"id": entry_id, "batch_id": "b1", "hall_id": "h1", "weekday": weekday,
+            "start": start, "end": end, "created_by": "f1", "is_active": True}
+
+
+def _span(windows):
+    return [(window["start_time"], window["end_time"]) for window in windows]
+
+
+def test_local_slots_are_stored_in_utc():
+    windows = occurrences(_entry(), NOW - timedelta(days=1), NOW + timedelta(days=8), ZoneInfo("Asia/Kolkata"))
+    assert _span(windows) == [
+        (datetime(2026, 3, 2, 3, 30), datetime(2026, 3, 2, 4, 20)),
+        (datetime(2026, 3, 9, 3, 30), datetime(2026, 3, 9, 4, 20)),
+    ]
+    assert windows[0]["id"] == window_id("t1", datetime(2026, 3, 2).date())
+    assert windows[0]["timetable_id"] == "t1" and windows[0]["is_active"]
+
+    # 02:00 on a Monday in Kolkata is still Sunday in UTC
+    early = occurrences(_entry(start="02:00", end="02:50"), NOW - timedelta(days=1), NOW, ZoneInfo("Asia/Kolkata"))
+    assert _span(early) == [(datetime(2026, 3, 1, 20, 30), datetime(2026, 3, 1, 21, 20))]
+
+
+def test_slots_follow_daylight_saving_time():
+    # Clocks go forward in London on Sunday 29 March 2026
+    london = ZoneInfo("Europe/London")
+    windows = occurrences(_entry(weekday=6, start="09:00", end="10:00"),
+                          datetime(2026, 3, 21), datetime(2026, 4, 1), london)
+    assert _span(windows) == [
+        (datetime(2026, 3, 22, 9, 0), datetime(2026, 3, 22, 10, 0)),
+        (datetime(2026, 3, 29, 8, 0), datetime(2026, 3, 29, 9, 0)),
+    ]
+
+
+def test_horizon_edges():
+    utc = ZoneInfo("UTC")
+    opens, closes = datetime(2026, 3, 2, 9, 0), datetime(2026, 3, 2, 9, 50)
+    # Starts at the end of the horizon: excluded, the range is half-open
+    assert occurrences(_entry(), NOW, opens, utc) == []
+    assert _span(occurrences(_entry(), NOW, opens + timedelta(seconds=1), utc)) == [(opens, closes)]
+    # Live at the start of the range: included; already over: excluded
+    live = occurrences(_entry(), opens + timedelta(minutes=10), closes + timedelta(hours=1), utc)
+    assert _span(live) == [(opens, closes)]
+    assert occurrences(_entry(), closes, closes + timedelta(hours=1), utc) == []
+
+
+class WindowIndex:
+    def __init__(self):
+        self.invalidations = 0
+
+    def invalidate(self):
+        self.invalidations += 1
+
+
+async def test_running_twice_creates_each_window_once(db):
+    await db.attendance_windows.create_index("id", unique=True)
+    await db[TIMETABLE_COLLECTION].insert_many([_entry(), _entry(weekday=1, entry_id="t2")])
+    scheduler = TimetableScheduler(db, WindowIndex(), tz="Asia/Kolkata", horizon_hours=48)
+
+    first = await scheduler.run_once(NOW)
+    assert first["entries"] == 2 and first["windows_created"] == 2
+    again = await scheduler.run_once(NOW + timedelta(minutes=1))
+    assert again["windows_created"] == 0
+    assert await db.attendance_windows.count_documents({}) == 2
+
+    # Once over, windows are closed
+    later = await scheduler.run_once(NOW + timedelta(hours=5))
+    assert later["windows_closed"] == 1
+    assert await db.attendance_windows.count_documents({"is_active": True}) == 1
+    assert scheduler.window_index.invalidations == 2
+
+
+class RacingDatabase:
+    """Another worker upserts the first window just before this one."""
+
+    def __init__(self, db, error_code=11000):
+        self.db = db
+        self.error_code = error_code
+        self.attendance_windows = self
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+    async def bulk_write(self, requests, ordered=True):
+        result = await self.db.attendance_windows.bulk_write(requests[1:], ordered=ordered)
+        raise BulkWriteError({
+            "writeErrors": [{"index": 0, "code": self.error_code, "errmsg": "E11000 duplicate key error"}],
+            "writeConcernErrors": [], "nUpserted": result.upserted_count, "upserted": [],
+        })
+
+    async def update_many(self, *args, **kwargs):
+        return await self.db.attendance_windows.update_many(*args, **kwargs)
+
+
+async def test_losing_an_upsert_race_is_not_an_error(db):
+    await db[TIMETABLE_COLLECTION].insert_many([_entry(), _entry(weekday=1, entry_id="t2")])
+    await db.attendance_windows.insert_one({"id": "stale", "is_active": True, "end_time": NOW - timedelta(hours=1)})
+    scheduler = TimetableScheduler(RacingDatabase(db), WindowIndex(), tz="Asia/Kolkata", horizon_hours=48)
+
+    result = await scheduler.run_once(NOW)
+    assert result["windows_created"] == 1 and result["windows_closed"] == 1
+    assert result["write_errors"] == 0
+
+    # Other write errors still surface, after the close step has run
+    await db.attendance_windows.update_one({"id": "stale"}, {"$set": {"is_active": True}})
+    scheduler = TimetableScheduler(RacingDatabase(db, error_code=2), WindowIndex(), tz="Asia/Kolkata")
+    with pytest.raises(BulkWriteError):
+        await scheduler.run_once(NOW)
+    assert not (await db.attendance_windows.find_one({"id": "stale"}))["is_active"]
+    assert scheduler.stats()["write_errors"] == 1
@@ -0,0 +1,59 @@
+import user_cache
+from user_cache import PrincipalCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PrincipalCache(max_size=2)
+    cache.put("a", {"id": "a"})
+    cache.put("b", {"id": "b"})
+    assert cache.get("a") == {"id": "a"}
+    cache.put("c", {"id": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_entries_expire_and_can_be_dropped(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(user_cache, "time", clock)
+    cache = PrincipalCache(ttl_seconds=60)
+    cache.put("a", {"id": "a"})
+    clock.now += 60
+    assert cache.get("a")
+    clock.now += 1
+    assert cache.get("a") is None and cache.stats()["size"] == 0
+
+    cache.put("a", {"id": "a"})
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+    disabled = PrincipalCache(enabled=False)
+    disabled.put("a", {"id": "a"})
+    assert disabled.get("a") is None and disabled.stats()["misses"] == 0
+
+
+async def test_deactivation_takes_effect_on_the_next_request(server, app_client):
+    async with app_client() as api:
+        faculty = await api.register("cache.faculty@iiitdm.ac.in", "faculty")
+        student = await api.register("cache.student@iiitdm.ac.in")
+        assert (await api.get("/auth/me", headers=student)).status_code == 200
+        assert server.user_cache.get("cache.student@iiitdm.ac.in") is not None
+
+        response = await api.patch("/admin/users/cache.student@iiitdm.ac.in/status", params={"is_active": False},
+                                   headers=faculty)
+        assert response.status_code == 200, response.text
+        # Not served from the cached, still active, user document
+        assert (await api.get("/auth/me", headers=student)).status_code == 401
+
+        await api.patch("/admin/users/cache.student@iiitdm.ac.in/status", params={"is_active": True}, headers=faculty)
+        assert (await api.get("/auth/me", headers=student)).status_code == 200
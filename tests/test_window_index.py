@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import window_index
+from window_index import ActiveWindowIndex
+
+NOW = datetime.utcnow()
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+def _window(window_id, batch_id, starts_in, minutes=50, is_active=True):
+    start = NOW + timedelta(minutes=starts_in)
+    return {"id": window_id, "batch_id": batch_id, "hall_id": "h1", "is_active": is_active,
+            "start_time": start, "end_time": start + timedelta(minutes=minutes)}
+
+
+async def _seed(db):
+    await db.attendance_windows.insert_many([
+        _window("live", "b1", starts_in=-10),
+        _window("later", "b1", starts_in=60),
+        _window("overlap", "b1", starts_in=-5, minutes=10),
+        _window("ended", "b1", starts_in=-120),
+        _window("closed", "b1", starts_in=-10, is_active=False),
+        _window("other", "b2", starts_in=-10),
+    ])
+
+
+async def test_only_started_unfinished_windows_are_active(db):
+    await _seed(db)
+    index = ActiveWindowIndex(db.attendance_windows)
+
+    active = await index.active_for_batch("b1", NOW)
+    assert [window["id"] for window in active] == ["live", "overlap"]
+    assert await index.active_for_batch("b3", NOW) == []
+    # Upcoming windows are loaded, and become active once started
+    assert [window["id"] for window in await index.active_for_batch("b1", NOW + timedelta(minutes=61))] == ["later"]
+
+    assert (await index.get_active("live", NOW))["id"] == "live"
+    assert await index.get_active("later", NOW) is None
+    assert await index.get_active("closed", NOW) is None
+    # The window's own bounds are inclusive
+    live = await index.get_active("live", NOW)
+    assert await index.get_active("live", live["end_time"]) is not None
+    assert await index.get_active("live", live["end_time"] + timedelta(microseconds=1)) is None
+
+
+async def test_reloads_after_the_ttl_or_an_invalidation(db, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(window_index, "time", clock)
+    await _seed(db)
+    index = ActiveWindowIndex(db.attendance_windows, ttl_seconds=30)
+    assert await index.get_active("live", NOW)
+
+    await db.attendance_windows.update_one({"id": "live"}, {"$set": {"is_active": False}})
+    await db.attendance_windows.insert_one(_window("new", "b2", starts_in=-1))
+    # Served from memory until the TTL elapses
+    assert await index.get_active("live", NOW)
+    clock.now += 31
+    assert await index.get_active("live", NOW) is None
+    assert [window["id"] for window in await index.active_for_batch("b2", NOW)] == ["other", "new"]
+
+    await db.attendance_windows.delete_many({"batch_id": "b2"})
+    assert await index.active_for_batch("b2", NOW)
+    index.invalidate()
+    assert await index.active_for_batch("b2", NOW) == []
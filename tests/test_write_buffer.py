@@ -0,0 +1,45 @@
+import asyncio
+
+from indexes import ensure_indexes
+from write_buffer import AttendanceWriteBuffer
+
+
+def _mark(student_id, window_id="w1"):
+    return {"id": f"{window_id}-{student_id}", "attendance_window_id": window_id, "student_id": student_id}
+
+
+async def test_duplicates_in_one_flush_map_to_their_callers(db):
+    await ensure_indexes(db)
+    buffer = AttendanceWriteBuffer(db.attendance_records, flush_interval_ms=5)
+    await buffer.start()
+    assert buffer.enabled
+
+    results = await asyncio.gather(
+        buffer.submit(_mark("s1")),
+        buffer.submit(_mark("s2")),
+        buffer.submit({**_mark("s1"), "id": "retry"}),
+        buffer.submit(_mark("s1", window_id="w2")),
+    )
+    assert results == [True, True, False, True]
+    # A later flush still sees marks stored by an earlier one
+    assert await buffer.submit({**_mark("s2"), "id": "again"}) is False
+    await buffer.stop()
+    assert await db.attendance_records.count_documents({}) == 3
+
+
+async def test_full_batch_flushes_without_waiting_for_the_timer(db):
+    await ensure_indexes(db)
+    buffer = AttendanceWriteBuffer(db.attendance_records, flush_interval_ms=60000, max_batch=3)
+    await buffer.start()
+    results = await asyncio.wait_for(
+        asyncio.gather(*(buffer.submit(_mark(f"s{i}")) for i in range(3))),
+        timeout=1,
+    )
+    assert results == [True, True, True]
+    await buffer.stop()
+
+
+async def test_disabled_without_the_unique_index(db):
+    buffer = AttendanceWriteBuffer(db.attendance_records)
+    await buffer.start()
+    assert not buffer.enabled